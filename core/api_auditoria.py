@@ -2,12 +2,65 @@ from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods, require_GET, require_POST
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
-from django.db.models import Avg, Count, Q
+from django.db import connection
+from django.db.models import Q
 from django.utils import timezone
 from datetime import datetime, timedelta
+from functools import lru_cache
 import json
 
-from .models import AuditoriaAtendimento, ConfiguracaoAuditoria, User, Department
+from .models import AuditoriaAtendimento, ConfiguracaoAuditoria, User
+from .auditoria_stats import audit_stats, criterios_report, dashboard_summary, ranking, ultima_auditoria
+from .pagination import capped_count, keyset_page, page_size
+
+# Campos da listagem (o restante - critérios, descrições e imagens - só no detalhe)
+AUDITORIA_LIST_FIELDS = (
+    'id', 'data_atendimento', 'id_conversa', 'link_conversa', 'tipo_atendimento',
+    'pontuacao', 'nota', 'classificacao', 'requer_acao', 'feedback_data', 'created_at',
+    'analista_auditado__id', 'analista_auditado__username',
+    'analista_auditado__first_name', 'analista_auditado__last_name',
+    'auditor__id', 'auditor__username',
+    'feedback_gestor__id', 'feedback_gestor__first_name', 'feedback_gestor__last_name',
+)
+CIENTE_FIELDS = ('ciente_analista', 'data_ciente')
+
+
+@lru_cache(maxsize=None)
+def auditoria_has_ciente_columns():
+    """
+    Verifica uma única vez por processo se as colunas de ciente (migration 0059)
+    existem no banco. Usa a introspecção do schema em vez de uma query que falha,
+    para não abortar a transação corrente.
+    """
+    table = AuditoriaAtendimento._meta.db_table
+    with connection.cursor() as cursor:
+        columns = {col.name for col in connection.introspection.get_table_description(cursor, table)}
+    return all(field in columns for field in CIENTE_FIELDS)
+
+
+def get_department(request, fallback=True):
+    """
+    Departamento das auditorias: o selecionado na sessão ou o do usuário; com
+    fallback, o NRS (id 1) ou o primeiro. Sem query (request.departments).
+    """
+    departments = request.departments
+    department = request.session.get('current_department_obj')
+    if isinstance(department, dict):
+        department = departments.by_id(department['id'])
+    department = department or request.user.department
+    if not department and fallback:
+        department = departments.by_id(1) or departments.first()
+    return department
+
+
+def get_department_id(request):
+    department = request.session.get('current_department_obj')
+    if isinstance(department, dict):
+        return department['id']
+    if request.user.department_id:
+        return request.user.department_id
+    department = get_department(request)
+    return department.id if department else None
 
 
 # ========================================
@@ -57,13 +110,7 @@ def api_auditoria_create(request):
         data = json.loads(request.body)
         
         # Obter departamento com fallback para ID 1 (NRS Suporte)
-        department = request.session.get('current_department_obj') or request.user.department
-        if isinstance(department, dict):
-            department = Department.objects.get(id=department['id'])
-        
-        if not department:
-            # Fallback: Tentar pegar NRS Suporte (ID 1) ou o primeiro disponível
-            department = Department.objects.filter(id=1).first() or Department.objects.first()
+        department = get_department(request)
             
         if not department:
             return JsonResponse({'error': 'Nenhum departamento encontrado no sistema'}, status=400)
@@ -171,30 +218,17 @@ def api_auditoria_create(request):
 def api_auditoria_list(request):
     """Lista auditorias com filtros opcionais"""
     try:
-        # Obter departamento
-        department = request.session.get('current_department_obj') or request.user.department
-        if isinstance(department, dict):
-            department = Department.objects.get(id=department['id'])
-            
-        if not department:
-            department = Department.objects.filter(id=1).first() or Department.objects.first()
-            
-        if not department:
+        department_id = get_department_id(request)
+        if not department_id:
             return JsonResponse({'error': 'Nenhum departamento encontrado'}, status=400)
         
-        # Testar se as colunas novas existem no banco
-        has_new_columns = True
-        try:
-            # Uma query simples que tenta acessar uma das colunas novas
-            AuditoriaAtendimento.objects.only('id', 'ciente_analista').first()
-        except Exception:
-            has_new_columns = False
-        
-        # Base queryset
-        queryset = AuditoriaAtendimento.objects.filter(department=department).select_related('analista_auditado', 'auditor')
+        has_new_columns = auditoria_has_ciente_columns()
+        fields = AUDITORIA_LIST_FIELDS + (CIENTE_FIELDS if has_new_columns else ())
 
-        if not has_new_columns:
-            queryset = queryset.defer('ciente_analista', 'data_ciente')
+        # Base queryset
+        queryset = AuditoriaAtendimento.objects.filter(department_id=department_id).select_related(
+            'analista_auditado', 'auditor', 'feedback_gestor'
+        ).only(*fields)
 
         # Se for analista, filtrar apenas as suas próprias auditorias
         if request.user.is_analista():
@@ -226,17 +260,13 @@ def api_auditoria_list(request):
         if apenas_alertas == 'true':
             queryset = queryset.filter(requer_acao=True)
         
-        # Ordenar por data de criação da auditoria (mais recentes primeiro)
-        queryset = queryset.order_by('-created_at')
-        
-        # Paginação
-        page = int(request.GET.get('page', 1))
-        per_page = int(request.GET.get('per_page', 20))
-        start = (page - 1) * per_page
-        end = start + per_page
-        
-        total = queryset.count()
-        auditorias = queryset[start:end]
+        # Paginação por keyset: mais recentes primeiro (created_at, id)
+        limit = page_size(request, default=20)
+        try:
+            auditorias, next_cursor = keyset_page(queryset, request.GET.get('cursor'), limit)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        total, total_exact = capped_count(queryset)
         
         data = []
         for aud in auditorias:
@@ -272,10 +302,10 @@ def api_auditoria_list(request):
         return JsonResponse({
             'success': True,
             'auditorias': data,
+            'next_cursor': next_cursor,
             'total': total,
-            'page': page,
-            'per_page': per_page,
-            'total_pages': (total + per_page - 1) // per_page,
+            'total_exact': total_exact,
+            'limit': limit,
         })
         
     except Exception as e:
@@ -286,20 +316,12 @@ def api_auditoria_list(request):
 @require_GET
 def api_auditoria_detail(request, pk):
     """Detalhes de uma auditoria específica"""
-    print(f"[AUDIT DEBUG] detail context: user={request.user.username}, pk={pk}, method={request.method}")
     try:
-        # Verificar se as colunas novas existem
-        has_new_columns = True
-        try:
-            # Tentar um fetch simples com as colunas novas
-            AuditoriaAtendimento.objects.only('id', 'ciente_analista').get(id=pk)
-        except Exception:
-            has_new_columns = False
+        has_new_columns = auditoria_has_ciente_columns()
 
-        # Buscar a auditoria (com ou sem as colunas novas)
         queryset = AuditoriaAtendimento.objects.select_related('analista_auditado', 'auditor', 'feedback_gestor')
         if not has_new_columns:
-            queryset = queryset.defer('ciente_analista', 'data_ciente')
+            queryset = queryset.defer(*CIENTE_FIELDS)
             
         auditoria = queryset.get(id=pk)
             
@@ -309,9 +331,7 @@ def api_auditoria_detail(request, pk):
                 return JsonResponse({'error': 'Acesso negado'}, status=403)
             
             # Verificar departamento para analista
-            department = request.session.get('current_department_obj') or request.user.department
-            if isinstance(department, dict):
-                department = Department.objects.filter(id=department['id']).first()
+            department = get_department(request, fallback=False)
             
             if auditoria.department != department:
                 return JsonResponse({'error': 'Acesso negado (departamento)'}, status=403)
@@ -380,12 +400,8 @@ def api_auditoria_detail(request, pk):
         return JsonResponse({'success': True, 'auditoria': data})
         
     except AuditoriaAtendimento.DoesNotExist:
-        print(f"[AUDIT DEBUG] detail: auditoria {pk} not found")
         return JsonResponse({'error': 'Auditoria não encontrada'}, status=404)
     except Exception as e:
-        print(f"[AUDIT DEBUG] detail: error {str(e)}")
-        import traceback
-        traceback.print_exc()
         return JsonResponse({'error': str(e)}, status=500)
 
 
@@ -494,81 +510,14 @@ def api_auditoria_delete(request, pk):
 @gestor_or_admin_required
 @require_GET
 def api_ranking_analistas(request):
-    """Ranking de analistas por nota média (Otimizado)"""
+    """Ranking de analistas por nota média"""
     try:
-        department = request.session.get('current_department_obj') or request.user.department
-        if isinstance(department, dict):
-            department = Department.objects.get(id=department['id'])
-            
-        if not department:
-             department = Department.objects.filter(id=1).first() or Department.objects.first()
-        
+        department_id = get_department_id(request)
+
         # Período opcional
-        data_inicio = request.GET.get('data_inicio')
-        data_fim = request.GET.get('data_fim')
-        
-        queryset = AuditoriaAtendimento.objects.filter(department=department)
-        
-        if data_inicio:
-            queryset = queryset.filter(data_atendimento__gte=data_inicio)
-        if data_fim:
-            queryset = queryset.filter(data_atendimento__lte=data_fim)
-        
-        # Agrupar por analista e calcular médias
-        ranking = queryset.values(
-            'analista_auditado__id',
-            'analista_auditado__username',
-            'analista_auditado__first_name',
-            'analista_auditado__last_name'
-        ).annotate(
-            total_auditorias=Count('id'),
-            nota_media=Avg('nota'),
-            pontuacao_media=Avg('pontuacao')
-        ).order_by('-nota_media')
-
-        # OTIMIZAÇÃO: Buscar classificações agrupadas em uma única query
-        # Em vez de fazer uma query para cada analista no loop
-        classificacoes_raw = queryset.values(
-            'analista_auditado__id', 'classificacao'
-        ).annotate(count=Count('id'))
-        
-        # Processar em memória para acesso rápido (dict of dicts ou dict of lists)
-        from collections import defaultdict
-        classificacoes_map = defaultdict(list)
-        for item in classificacoes_raw:
-            classificacoes_map[item['analista_auditado__id']].append({
-                'classificacao': item['classificacao'],
-                'count': item['count']
-            })
-        
-        # Formatar resposta com posição
-        data = []
-        for idx, item in enumerate(ranking, 1):
-            analista_id = item['analista_auditado__id']
-            
-            # Determinar classificação predominante via Python (já carregado)
-            class_list = classificacoes_map.get(analista_id, [])
-            # Ordenar por count decrescente para pegar a moda
-            class_list.sort(key=lambda x: x['count'], reverse=True)
-            
-            classificacao_predominante = class_list[0]['classificacao'] if class_list else 'N/A'
-            
-            nome_completo = f"{item['analista_auditado__first_name']} {item['analista_auditado__last_name']}".strip()
-            if not nome_completo:
-                nome_completo = item['analista_auditado__username']
-            
-            data.append({
-                'posicao': idx,
-                'analista_id': str(analista_id),
-                'analista_username': item['analista_auditado__username'],
-                'analista_nome': nome_completo,
-                'total_auditorias': item['total_auditorias'],
-                'nota_media': round(float(item['nota_media']), 2),
-                'pontuacao_media': round(float(item['pontuacao_media']), 1),
-                'classificacao_predominante': classificacao_predominante,
-            })
-        
-        return JsonResponse({'success': True, 'ranking': data})
+        analistas = audit_stats(department_id, request.GET.get('data_inicio'), request.GET.get('data_fim'))
+
+        return JsonResponse({'success': True, 'ranking': ranking(analistas)})
         
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
@@ -579,23 +528,11 @@ def api_ranking_analistas(request):
 def api_estatisticas_analista(request, analista_id):
     """Estatísticas detalhadas de um analista específico"""
     try:
-        department = request.session.get('current_department_obj') or request.user.department
-        if isinstance(department, dict):
-            department = Department.objects.get(id=department['id'])
-            
-        if not department:
-             department = Department.objects.filter(id=1).first() or Department.objects.first()
-        
-        analista = User.objects.get(id=analista_id)
-        
-        auditorias = AuditoriaAtendimento.objects.filter(
-            department=department,
-            analista_auditado=analista
-        )
-        
-        total_auditorias = auditorias.count()
-        
-        if total_auditorias == 0:
+        department_id = get_department_id(request)
+        stats = audit_stats(department_id).get(int(analista_id))
+
+        if not stats:
+            analista = User.objects.get(id=analista_id)
             return JsonResponse({
                 'success': True,
                 'analista': {
@@ -610,39 +547,25 @@ def api_estatisticas_analista(request, analista_id):
                 'tem_alertas': False,
             })
         
-        # Calcular estatísticas
-        nota_media = auditorias.aggregate(Avg('nota'))['nota__avg']
-        
-        # Distribuição por classificação — OTIMIZADO: 1 query em vez de 4
-        dist_data = auditorias.values('classificacao').annotate(count=Count('id'))
-        distribuicao = {'excelente': 0, 'bom': 0, 'regular': 0, 'insatisfatorio': 0}
-        for item in dist_data:
-            if item['classificacao'] in distribuicao:
-                distribuicao[item['classificacao']] = item['count']
-        
-        # Última auditoria
-        ultima = auditorias.order_by('-created_at').first()
-        
-        # Verificar alertas ativos
-        tem_alertas = auditorias.filter(requer_acao=True).exists()
+        ultima = ultima_auditoria(department_id, stats['id'])
         
         return JsonResponse({
             'success': True,
             'analista': {
-                'id': str(analista.id),
-                'username': analista.username,
-                'nome_completo': analista.get_full_name() or analista.username,
+                'id': str(stats['id']),
+                'username': stats['username'],
+                'nome_completo': f"{stats['first_name']} {stats['last_name']}".strip() or stats['username'],
             },
-            'total_auditorias': total_auditorias,
-            'nota_media': round(float(nota_media), 2),
-            'distribuicao': distribuicao,
+            'total_auditorias': stats['total'],
+            'nota_media': round(stats['nota_media'], 2),
+            'distribuicao': stats['distribuicao'],
             'ultima_auditoria': {
                 'id': ultima.id,
                 'data': timezone.localtime(ultima.created_at).date().isoformat(),
                 'nota': float(ultima.nota),
                 'classificacao': ultima.get_classificacao_display(),
             } if ultima else None,
-            'tem_alertas': tem_alertas,
+            'tem_alertas': stats['alertas'] > 0,
         })
         
     except User.DoesNotExist:
@@ -656,12 +579,7 @@ def api_estatisticas_analista(request, analista_id):
 def api_dashboard_auditoria(request):
     """Dashboard geral de auditorias"""
     try:
-        department = request.session.get('current_department_obj') or request.user.department
-        if isinstance(department, dict):
-            department = Department.objects.get(id=department['id'])
-            
-        if not department:
-             department = Department.objects.filter(id=1).first() or Department.objects.first()
+        department_id = get_department_id(request)
         
         # Período opcional (padrão: último mês)
         data_fim = timezone.now().date()
@@ -672,75 +590,53 @@ def api_dashboard_auditoria(request):
         if request.GET.get('data_fim'):
             data_fim = datetime.strptime(request.GET.get('data_fim'), '%Y-%m-%d').date()
         
-        auditorias = AuditoriaAtendimento.objects.filter(
-            department=department,
-            data_atendimento__gte=data_inicio,
-            data_atendimento__lte=data_fim
-        )
+        analistas = audit_stats(department_id, data_inicio.isoformat(), data_fim.isoformat())
 
-        # Se for analista, filtrar apenas as suas próprias auditorias
+        # Se for analista, considerar apenas as suas próprias auditorias
         if request.user.is_analista():
-            auditorias = auditorias.filter(analista_auditado=request.user)
+            analistas = {k: v for k, v in analistas.items() if k == request.user.id}
 
-        
-        total = auditorias.count()
-        nota_media_geral = auditorias.aggregate(Avg('nota'))['nota__avg'] or 0
-        
-        # Distribuição por classificação
-        # Distribuição por classificação - Otimizado (1 query em vez de 4)
-        dist_data = auditorias.values('classificacao').annotate(total=Count('id'))
-        distribuicao = {
-            'excelente': 0,
-            'bom': 0,
-            'regular': 0,
-            'insatisfatorio': 0
-        }
-        for item in dist_data:
-            if item['classificacao'] in distribuicao:
-                distribuicao[item['classificacao']] = item['total']
-        
-        # Analistas com alertas
-        analistas_com_alertas = auditorias.filter(requer_acao=True).values(
-            'analista_auditado__id',
-            'analista_auditado__username'
-        ).distinct()
-        
-        # Top 3 analistas
-        top_3 = auditorias.values(
-            'analista_auditado__id',
-            'analista_auditado__username',
-            'analista_auditado__first_name',
-            'analista_auditado__last_name'
-        ).annotate(
-            nota_media=Avg('nota')
-        ).order_by('-nota_media')[:3]
-        
         return JsonResponse({
             'success': True,
             'periodo': {
                 'inicio': data_inicio.isoformat(),
                 'fim': data_fim.isoformat(),
             },
-            'total_auditorias': total,
-            'nota_media_geral': round(float(nota_media_geral), 2),
-            'distribuicao': distribuicao,
-            'total_alertas': auditorias.filter(requer_acao=True).count(),
-            'analistas_com_alertas': [{'id': str(a['analista_auditado__id']), 'username': a['analista_auditado__username']} for a in analistas_com_alertas],
-            'top_3': [
-                {
-                    'id': str(item['analista_auditado__id']),
-                    'username': item['analista_auditado__username'],
-                    'nome': f"{item['analista_auditado__first_name']} {item['analista_auditado__last_name']}".strip() or item['analista_auditado__username'],
-                    'nota_media': round(float(item['nota_media']), 2),
-                }
-                for item in top_3
-            ],
+            **dashboard_summary(analistas),
         })
         
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
 
+@gestor_or_admin_required
+@require_GET
+def api_criterios_auditoria(request):
+    """Taxa de falha por critério, por analista e por semana (padrão: últimas 12 semanas)"""
+    try:
+        department_id = get_department_id(request)
+
+        analista_id = request.GET.get('analista_id') or None
+        if analista_id is not None and not analista_id.isdigit():
+            return JsonResponse({'error': 'analista_id inválido'}, status=400)
+
+        data_fim = timezone.now().date()
+        data_inicio = data_fim - timedelta(weeks=12)
+
+        if request.GET.get('data_inicio'):
+            data_inicio = datetime.strptime(request.GET.get('data_inicio'), '%Y-%m-%d').date()
+        if request.GET.get('data_fim'):
+            data_fim = datetime.strptime(request.GET.get('data_fim'), '%Y-%m-%d').date()
+
+        report = criterios_report(department_id, data_inicio, data_fim, analista_id)
+        return JsonResponse({'success': True, **report})
+
+    except ValueError:
+        return JsonResponse({'error': 'Data inválida (use AAAA-MM-DD)'}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
 # ========================================
 # CONFIGURAÇÕES
 # ========================================
@@ -750,13 +646,7 @@ def api_dashboard_auditoria(request):
 def api_configuracao_get(request):
     """Obter configuração atual de auditoria"""
     try:
-        department = request.session.get('current_department_obj') or request.user.department
-        if isinstance(department, dict):
-            department = Department.objects.get(id=department['id'])
-        
-        if not department:
-            department = Department.objects.filter(id=1).first() or Department.objects.first()
-            
+        department = get_department(request)
         if not department:
             return JsonResponse({'error': 'Nenhum departamento encontrado'}, status=400)
         
@@ -785,9 +675,7 @@ def api_configuracao_update(request):
     try:
         data = json.loads(request.body)
         
-        department = request.session.get('current_department_obj') or request.user.department
-        if isinstance(department, dict):
-            department = Department.objects.get(id=department['id'])
+        department = get_department(request, fallback=False)
         
         config, created = ConfiguracaoAuditoria.objects.get_or_create(department=department)
         
@@ -824,13 +712,7 @@ def api_configuracao_update(request):
 def api_analistas_list(request):
     """Lista de analistas do departamento para seleção"""
     try:
-        department = request.session.get('current_department_obj') or request.user.department
-        if isinstance(department, dict):
-            department = Department.objects.get(id=department['id'])
-            
-        if not department:
-             department = Department.objects.filter(id=1).first() or Department.objects.first()
-             
+        department = get_department(request)
         if not department:
              return JsonResponse({'error': 'Nenhum departamento encontrado'}, status=400)
         
@@ -891,9 +773,7 @@ def api_check_conversation_id(request):
     if not id_conversa:
         return JsonResponse({'error': 'ID não informado'}, status=400)
     
-    department = request.session.get('current_department_obj') or request.user.department
-    if isinstance(department, dict):
-        department = Department.objects.get(id=department['id'])
+    department = get_department(request, fallback=False)
         
     exists = AuditoriaAtendimento.objects.filter(
         id_conversa=id_conversa,
@@ -5,6 +5,7 @@ from django.utils import timezone
 from django.db.models import Q
 import json
 from .models import ChatInactivityRequest, User
+from .fanout import fan_out
 
 @login_required
 def api_chat_inactivity_list(request):
@@ -68,19 +69,20 @@ def api_chat_inactivity_create(request):
         if not chat_ids or not chat_date:
             return JsonResponse({'error': 'IDs e Data são obrigatórios'}, status=400)
             
-        created_count = 0
         # Garante que temos o mesmo número de links que de IDs ou usa link vazio
-        for i, cid in enumerate(chat_ids):
-            link = chat_links[i] if i < len(chat_links) else ""
-            
-            ChatInactivityRequest.objects.create(
+        chats = [(cid, chat_links[i] if i < len(chat_links) else "") for i, cid in enumerate(chat_ids)]
+        created_ids = fan_out(
+            ChatInactivityRequest,
+            chats,
+            lambda chat: ChatInactivityRequest(
                 analyst=request.user,
-                chat_id=cid.strip(),
-                chat_link=link.strip(),
+                chat_id=chat[0].strip(),
+                chat_link=chat[1].strip(),
                 chat_date=chat_date,
                 was_inactivity=was_inactivity
-            )
-            created_count += 1
+            ),
+        )
+        created_count = len(created_ids)
             
         return JsonResponse({
             'success': True, 
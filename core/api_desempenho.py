@@ -1,66 +1,88 @@
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from decimal import Decimal, InvalidOperation
+import io
 import json
 
-from .models import IndicadorDesempenho, User, Department, MetaMensalGlobal
+from .desempenho_stats import MAX_TEAM_MONTHS, invalidate, kpi_usuarios, team_comparison
+from .models import IndicadorDesempenho, User, MetaMensalGlobal
 
+# Colunas aceitas na importação (cabeçalho da planilha/CSV ou chaves do JSON)
+KPI_IMPORT_FIELDS = ('nps', 'tme', 'chats', 'meta_tme', 'meta_nps', 'meta_chats')
+KPI_IMPORT_MAX_ROWS = 1000
 
-def get_nrs_department(user=None):
-    """Obtém o departamento com fallback robusto (NRS Suporte -> Dept do Usuário -> Primeiro Dept) Ratio"""
-    dept = Department.objects.filter(name='NRS Suporte').first()
-    if not dept:
-        dept = Department.objects.filter(slug='nrs-suporte').first()
-    if not dept and user and hasattr(user, 'department') and user.department:
-        dept = user.department
-    if not dept:
-        dept = Department.objects.first()
-    return dept
+
+def get_nrs_department(request):
+    """Obtém o departamento com fallback robusto (NRS Suporte -> Dept do Usuário -> Primeiro Dept)"""
+    return request.departments.nrs or request.user.department or request.departments.first()
+
+
+def kpi_analistas(department):
+    """Analistas do departamento (importação em massa; o cadastro individual usa kpi_usuarios)"""
+    return User.objects.filter(role='analista', department=department)
+
+
+def parse_year_month(value):
+    """Converte 'AAAA-MM' em (ano, mes). Lança ValueError se inválido."""
+    ano, mes = (int(part) for part in value.split('-'))
+    if not 1 <= mes <= 12:
+        raise ValueError(value)
+    return ano, mes
 
 
 @login_required
 @require_http_methods(["GET"])
 def api_kpis_list(request):
-    """Lista KPIs - filtrado por analista se for um analista"""
+    """
+    Lista KPIs - filtrado por analista se for um analista.
+    Janela opcional: ?inicio=AAAA-MM&fim=AAAA-MM (inclusivos).
+    """
     user = request.user
     
     # Obter departamento NRS Suporte
-    try:
-        nrs_dept = Department.objects.get(name='NRS Suporte')
-    except Department.DoesNotExist:
+    nrs_dept = request.departments.by_name('NRS Suporte')
+    if nrs_dept is None:
         return JsonResponse({'error': 'Departamento NRS Suporte não encontrado'}, status=404)
     
-    # Filtrar analista específico (se solicitado)
-    analista_id = request.GET.get('analista_id')
-    
+    kpis = IndicadorDesempenho.objects.filter(department=nrs_dept)
+
     if user.role == 'analista':
         # Analista só vê seus próprios KPIs
-        kpis = IndicadorDesempenho.objects.filter(
-            analista=user,
-            department=nrs_dept
-        ).order_by('ano', 'mes')
-    elif analista_id:
+        kpis = kpis.filter(analista=user)
+    elif request.GET.get('analista_id'):
         # Gestor/Admin filtrando por analista específico
-        kpis = IndicadorDesempenho.objects.filter(
-            analista_id=analista_id,
-            department=nrs_dept
-        ).order_by('ano', 'mes')
-    else:
-        # Gestor/Admin vê todos
-        kpis = IndicadorDesempenho.objects.filter(
-            department=nrs_dept
-        ).order_by('ano', 'mes')
-    
+        kpis = kpis.filter(analista_id=request.GET.get('analista_id'))
+
+    try:
+        if request.GET.get('inicio'):
+            ano, mes = parse_year_month(request.GET['inicio'])
+            kpis = kpis.filter(Q(ano__gt=ano) | Q(ano=ano, mes__gte=mes))
+        if request.GET.get('fim'):
+            ano, mes = parse_year_month(request.GET['fim'])
+            kpis = kpis.filter(Q(ano__lt=ano) | Q(ano=ano, mes__lte=mes))
+    except ValueError:
+        return JsonResponse({'error': 'Período inválido (use AAAA-MM)'}, status=400)
+
+    # Uma única query com o nome do analista via JOIN
+    rows = kpis.order_by('ano', 'mes', 'analista_id').values(
+        'id', 'analista_id', 'analista__username', 'analista__first_name', 'analista__last_name',
+        'mes', 'ano', 'nps', 'tme', 'chats',
+    )
+
     data = [{
-        'id': k.id,
-        'analista_id': k.analista_id,
-        'analista_nome': k.analista.get_full_name() or k.analista.username,
-        'mes': k.mes,
-        'ano': k.ano,
-        'nps': float(k.nps) if k.nps else None,
-        'tme': k.tme,
-        'chats': k.chats,
-    } for k in kpis]
+        'id': k['id'],
+        'analista_id': k['analista_id'],
+        'analista_nome': f"{k['analista__first_name']} {k['analista__last_name']}".strip() or k['analista__username'],
+        'mes': k['mes'],
+        'ano': k['ano'],
+        'nps': float(k['nps']) if k['nps'] else None,
+        'tme': k['tme'],
+        'chats': k['chats'],
+    } for k in rows]
     
     return JsonResponse(data, safe=False)
 
@@ -95,17 +117,16 @@ def api_kpi_save(request):
     if not all([analista_id, mes, ano]):
         return JsonResponse({'error': 'Campos obrigatórios: analista_id, mes, ano'}, status=400)
     
-    try:
-        analista = User.objects.get(id=analista_id)
-    except User.DoesNotExist:
-        return JsonResponse({'error': 'Analista não encontrado'}, status=404)
-    
     # Obter departamento NRS Suporte
-    try:
-        nrs_dept = Department.objects.get(name='NRS Suporte')
-    except Department.DoesNotExist:
+    nrs_dept = request.departments.by_name('NRS Suporte')
+    if nrs_dept is None:
         return JsonResponse({'error': 'Departamento NRS Suporte não encontrado'}, status=404)
     
+    try:
+        analista = kpi_usuarios(nrs_dept).get(id=analista_id)
+    except (User.DoesNotExist, ValueError):
+        return JsonResponse({'error': 'Analista não encontrado'}, status=404)
+    
     # Criar ou atualizar
     kpi, created = IndicadorDesempenho.objects.update_or_create(
         analista=analista,
@@ -129,6 +150,161 @@ def api_kpi_save(request):
     })
 
 
+def _parse_tme(value):
+    """TME em segundos: aceita inteiro ou H:MM:SS / MM:SS (formato da tela)"""
+    text = str(value).strip()
+    if ':' in text:
+        seconds = 0
+        for part in text.split(':'):
+            seconds = seconds * 60 + int(part)
+        return seconds
+    return int(float(text))
+
+
+def _parse_kpi_value(field, value):
+    """Normaliza uma célula; vazio vira None. Lança ValueError se inválida."""
+    if value is None or str(value).strip() == '':
+        return None
+    if field in ('tme', 'meta_tme'):
+        return _parse_tme(value)
+    if field in ('nps', 'meta_nps'):
+        try:
+            nps = Decimal(str(value).strip().replace(',', '.')).quantize(Decimal('0.01'))
+        except InvalidOperation:
+            raise ValueError(value)
+        if not Decimal('0') <= nps <= Decimal('10'):
+            raise ValueError(value)
+        return nps
+    return int(float(str(value).strip()))
+
+
+def _read_kpi_rows(request):
+    """
+    Lê as linhas da importação: arquivo (campo 'arquivo', .csv ou .xlsx) ou
+    corpo JSON (lista, ou objeto com 'kpis'). Retorna (linhas, mes/ano do corpo).
+    """
+    upload = request.FILES.get('arquivo')
+    if upload:
+        name = upload.name.lower()
+        if name.endswith('.xlsx'):
+            from openpyxl import load_workbook
+            ws = load_workbook(upload, read_only=True, data_only=True).active
+            values = ws.iter_rows(values_only=True)
+            header = [str(h or '').strip().lower() for h in next(values, [])]
+            rows = [dict(zip(header, row)) for row in values if any(c not in (None, '') for c in row)]
+        elif name.endswith('.csv'):
+            import csv
+            text = upload.read().decode('utf-8-sig')
+            dialect = csv.Sniffer().sniff(text[:2048], delimiters=',;')
+            reader = csv.DictReader(io.StringIO(text), dialect=dialect)
+            rows = [{(k or '').strip().lower(): v for k, v in row.items()} for row in reader]
+        else:
+            raise ValueError('Formato não suportado (use .csv ou .xlsx)')
+        return rows, request.POST.get('periodo')
+
+    body = json.loads(request.body)
+    if isinstance(body, dict):
+        return body.get('kpis', []), body.get('periodo')
+    return body, request.GET.get('periodo')
+
+
+@login_required
+@require_http_methods(["POST"])
+def api_kpis_import(request):
+    """
+    Importa os KPIs de um mês para vários analistas de uma vez (upsert).
+
+    Período em 'periodo' (AAAA-MM). Cada linha identifica um analista do
+    departamento por analista_id, username ou email (sem diferenciar
+    maiúsculas) e traz nps, tme, chats, meta_tme, meta_nps e/ou meta_chats.
+    Só as colunas presentes são gravadas: um KPI existente mantém as que a
+    importação não trouxe. Se alguma linha for inválida nada é gravado.
+    """
+    user = request.user
+    if user.role not in ['gestor', 'administrador']:
+        return JsonResponse({'error': 'Sem permissão'}, status=403)
+
+    try:
+        rows, periodo = _read_kpi_rows(request)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': f'Erro ao ler arquivo: {e}'}, status=400)
+
+    try:
+        ano, mes = parse_year_month(periodo or '')
+    except ValueError:
+        return JsonResponse({'error': 'Período obrigatório (periodo=AAAA-MM)'}, status=400)
+
+    if not rows:
+        return JsonResponse({'error': 'Nenhuma linha para importar'}, status=400)
+    if len(rows) > KPI_IMPORT_MAX_ROWS:
+        return JsonResponse({'error': f'Máximo de {KPI_IMPORT_MAX_ROWS} linhas por importação'}, status=400)
+
+    nrs_dept = get_nrs_department(request)
+    if not nrs_dept:
+        return JsonResponse({'error': 'Nenhum departamento disponível'}, status=404)
+
+    # Analistas do departamento em uma query; a comparação é em minúsculas dos dois lados
+    refs = [str(r.get('analista_id') or r.get('username') or r.get('email') or '').strip() for r in rows]
+    analistas = {}
+    for a in kpi_analistas(nrs_dept).values('id', 'username', 'email'):
+        analistas[str(a['id'])] = a['id']
+        analistas[a['username'].lower()] = a['id']
+        if a['email']:
+            analistas[a['email'].lower()] = a['id']
+
+    errors = []
+    kpis = {}
+    for line, (row, ref) in enumerate(zip(rows, refs), start=2):
+        analista_id = analistas.get(ref.lower())
+        if not analista_id:
+            errors.append(f'Linha {line}: analista "{ref}" não encontrado no {nrs_dept.name}')
+            continue
+        fields = tuple(field for field in KPI_IMPORT_FIELDS if field in row)
+        values = {}
+        for field in fields:
+            try:
+                values[field] = _parse_kpi_value(field, row.get(field))
+            except (TypeError, ValueError):
+                errors.append(f'Linha {line}: valor inválido em {field} ("{row.get(field)}")')
+        if 'chats' in values:
+            values['chats'] = values['chats'] or 0
+        # Linhas repetidas do mesmo analista: vale a última
+        kpis[analista_id] = (fields, IndicadorDesempenho(
+            analista_id=analista_id, mes=mes, ano=ano, department=nrs_dept, **values,
+        ))
+
+    if errors:
+        return JsonResponse({'error': 'Importação não realizada', 'errors': errors[:50]}, status=400)
+
+    with transaction.atomic():
+        existing = set(IndicadorDesempenho.objects.filter(
+            mes=mes, ano=ano, analista_id__in=kpis.keys(),
+        ).values_list('analista_id', flat=True))
+        # Um upsert por conjunto de colunas (no CSV/XLSX é um só)
+        by_fields = {}
+        for fields, kpi in kpis.values():
+            by_fields.setdefault(fields, []).append(kpi)
+        for fields, objs in by_fields.items():
+            IndicadorDesempenho.objects.bulk_create(
+                objs,
+                update_conflicts=True,
+                unique_fields=['analista', 'mes', 'ano'],
+                update_fields=[*fields, 'department', 'updated_at'],
+            )
+        # bulk_create não dispara signals
+        invalidate(nrs_dept.id)
+
+    return JsonResponse({
+        'success': True,
+        'mes': mes,
+        'ano': ano,
+        'created': len(kpis) - len(existing),
+        'updated': len(existing),
+    })
+
+
 @login_required
 @require_http_methods(["DELETE"])
 def api_kpi_delete(request, pk):
@@ -151,9 +327,8 @@ def api_kpi_delete(request, pk):
 @require_http_methods(["GET"])
 def api_global_metas_list(request):
     """Lista todas as metas globais do departamento"""
-    try:
-        nrs_dept = Department.objects.get(name='NRS Suporte')
-    except Department.DoesNotExist:
+    nrs_dept = request.departments.by_name('NRS Suporte')
+    if nrs_dept is None:
         return JsonResponse({'error': 'Departamento não encontrado'}, status=404)
         
     metas = MetaMensalGlobal.objects.filter(department=nrs_dept).order_by('-ano', '-mes')
@@ -187,11 +362,7 @@ def api_global_meta_save(request):
             return JsonResponse({'error': 'Mês e Ano são obrigatórios'}, status=400)
             
         # Obter departamento (prioridade: 'NRS Suporte', senão o do usuário, senão o primeiro disponível)
-        nrs_dept = Department.objects.filter(name='NRS Suporte').first()
-        if not nrs_dept and user.department:
-            nrs_dept = user.department
-        if not nrs_dept:
-            nrs_dept = Department.objects.first()
+        nrs_dept = request.departments.by_name('NRS Suporte') or user.department or request.departments.first()
             
         if not nrs_dept:
             return JsonResponse({'error': 'Nenhum departamento disponível'}, status=404)
@@ -243,9 +414,8 @@ def api_ranking(request):
         return JsonResponse({'error': 'Sem permissão'}, status=403)
     
     # Verificar se é do departamento NRS Suporte
-    try:
-        nrs_dept = Department.objects.get(name='NRS Suporte')
-    except Department.DoesNotExist:
+    nrs_dept = request.departments.by_name('NRS Suporte')
+    if nrs_dept is None:
         return JsonResponse({'error': 'Departamento não encontrado'}, status=404)
     
     if user.department != nrs_dept and user.role != 'administrador':
@@ -340,6 +510,35 @@ def api_ranking(request):
     })
 
 
+@login_required
+@require_http_methods(["GET"])
+def api_team_comparison(request):
+    """
+    Comparativo do time: NPS/TME/chats de todos os analistas nos últimos N meses,
+    atingimento das metas globais e percentis do time.
+    Parâmetros: ?meses=N (padrão 6, máx. 24) e ?fim=AAAA-MM (padrão: mês atual).
+    """
+    user = request.user
+    if user.role not in ['gestor', 'administrador']:
+        return JsonResponse({'error': 'Sem permissão'}, status=403)
+
+    nrs_dept = get_nrs_department(request)
+    if not nrs_dept:
+        return JsonResponse({'error': 'Departamento não encontrado'}, status=404)
+
+    try:
+        meses = max(1, min(int(request.GET.get('meses', 6)), MAX_TEAM_MONTHS))
+        if request.GET.get('fim'):
+            ano, mes = parse_year_month(request.GET['fim'])
+        else:
+            today = timezone.localdate()
+            ano, mes = today.year, today.month
+    except ValueError:
+        return JsonResponse({'error': 'Parâmetros inválidos (meses=N, fim=AAAA-MM)'}, status=400)
+
+    return JsonResponse({'success': True, **team_comparison(nrs_dept.id, ano, mes, meses)})
+
+
 @login_required
 @require_http_methods(["GET"])
 def api_podium(request):
@@ -347,9 +546,8 @@ def api_podium(request):
     user = request.user
     
     # Verificar se é do departamento NRS Suporte
-    try:
-        nrs_dept = Department.objects.get(name='NRS Suporte')
-    except Department.DoesNotExist:
+    nrs_dept = request.departments.by_name('NRS Suporte')
+    if nrs_dept is None:
         return JsonResponse({'error': 'Departamento não encontrado'}, status=404)
     
     # Todos do NRS Suporte podem ver o pódio
@@ -4,9 +4,13 @@ from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from .models import Turno, AnalistaEscala, FolgaManual
+from .escala import (
+    MAX_COVERAGE_DAYS, MAX_WINDOW_MONTHS, escala_analistas, parse_month,
+    schedule_window, staffing_coverage,
+)
 
 
 from functools import wraps
@@ -227,6 +231,72 @@ def api_folgas_list(request):
     return JsonResponse(data)
 
 
+@login_required
+@require_http_methods(["GET"])
+@check_nrs_permission
+def api_escala_schedule(request):
+    """
+    Escala de uma janela de meses (?inicio=AAAA-MM&meses=N): turnos, analistas
+    e, por mês, a matriz de status por analista com as folgas manuais do mês.
+    """
+    try:
+        inicio = parse_month(request.GET.get('inicio') or datetime.now().strftime('%Y-%m'))
+        meses = int(request.GET.get('meses', 1))
+    except ValueError:
+        return JsonResponse({'error': 'Parâmetros inválidos. Use inicio=AAAA-MM e meses numérico.'}, status=400)
+    if not 1 <= meses <= MAX_WINDOW_MONTHS:
+        return JsonResponse({'error': f'A janela deve ter entre 1 e {MAX_WINDOW_MONTHS} meses.'}, status=400)
+
+    # Se for RH, apenas analistas que PERTENCEM ao NRS Suporte
+    only_nrs = not request.user.is_administrador() and request.user.department and request.user.department.name == 'RH'
+
+    version, months = schedule_window(inicio, meses, only_nrs=bool(only_nrs))
+    turnos = Turno.objects.filter(ativo=True).order_by('ordem', 'nome').values('id', 'nome', 'horario', 'cor', 'ordem')
+    analistas = (
+        escala_analistas(bool(only_nrs))
+        .order_by('turno__ordem', 'ordem', 'nome')
+        .values('id', 'nome', 'turno_id', 'turno__nome', 'pausa', 'data_primeira_folga', 'ordem')
+    )
+    return JsonResponse({
+        'version': version,
+        'turnos': list(turnos),
+        'analistas': [{
+            'id': a['id'],
+            'nome': a['nome'],
+            'turno': a['turno__nome'],
+            'turno_id': a['turno_id'],
+            'pausa': a['pausa'],
+            'data_primeira_folga': a['data_primeira_folga'].isoformat() if a['data_primeira_folga'] else None,
+            'ordem': a['ordem'],
+        } for a in analistas],
+        'months': months,
+    })
+
+
+@login_required
+@require_http_methods(["GET"])
+@check_nrs_permission
+def api_escala_coverage(request):
+    """
+    Cobertura por turno (?inicio=AAAA-MM-DD&fim=AAAA-MM-DD): quantidade de
+    analistas trabalhando em cada turno por dia e quem está de folga, férias
+    ou atestado. Padrão: mês atual; até 6 meses (planejamento).
+    Vem do cache da escala: uma alteração feita em outro worker aparece em
+    até VERSION_CHECK_SECONDS (a versão retornada muda junto).
+    """
+    try:
+        today = datetime.now().date()
+        inicio = datetime.strptime(request.GET['inicio'], '%Y-%m-%d').date() if request.GET.get('inicio') else today.replace(day=1)
+        fim = datetime.strptime(request.GET['fim'], '%Y-%m-%d').date() if request.GET.get('fim') else (inicio.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    except ValueError:
+        return JsonResponse({'error': 'Datas inválidas. Use o formato AAAA-MM-DD.'}, status=400)
+    if fim < inicio or (fim - inicio).days >= MAX_COVERAGE_DAYS:
+        return JsonResponse({'error': f'O período deve ter entre 1 e {MAX_COVERAGE_DAYS} dias.'}, status=400)
+
+    only_nrs = not request.user.is_administrador() and request.user.department and request.user.department.name == 'RH'
+    return JsonResponse(staffing_coverage(inicio, fim, only_nrs=bool(only_nrs)))
+
+
 @login_required
 @require_http_methods(["POST"])
 @check_nrs_permission
@@ -9,6 +9,7 @@ from django.utils import timezone
 from django.db.models import Q
 
 from .models import Evento, User
+from .fanout import fan_out
 
 @login_required
 def api_eventos_users_list(request):
@@ -86,8 +87,7 @@ def api_evento_create(request):
         if request.user.is_administrador():
             selected_dept_id = request.session.get('selected_department_id')
             if selected_dept_id:
-                from .models import Department
-                dept = get_object_or_404(Department, id=selected_dept_id)
+                dept = request.departments.by_id(selected_dept_id)
         else:
             dept = request.user.department
             
@@ -108,33 +108,35 @@ def api_evento_create(request):
                 ativo=True,
                 role='analista'
             )
-            created_ids = []
-            last_event = None
-            
-            for user_target in users_to_assign:
-                specific_analyst_name = f"{user_target.first_name} {user_target.last_name}".strip() or user_target.username
-                
-                evento = Evento.objects.create(
+            # Um evento por analista, criados em lote, com notificação para cada um
+            created_ids = fan_out(
+                Evento,
+                users_to_assign,
+                lambda user_target: Evento(
                     titulo=data.get('titulo'),
                     descricao=data.get('descricao'),
                     data_inicio=data.get('data_inicio'),
                     horario=data.get('horario'),
                     tipo=data.get('tipo', 'agendamento'),
                     codigo_loja=data.get('codigo_loja'),
-                    analista_nome=specific_analyst_name,
+                    analista_nome=f"{user_target.first_name} {user_target.last_name}".strip() or user_target.username,
                     observacao=data.get('observacao'),
                     department=dept,
                     usuario=request.user # Quem criou foi o gestor
-                )
-                created_ids.append(evento.id)
-                last_event = evento
+                ),
+                notify=lambda user_target, evento: {
+                    'type': 'new_event',
+                    'title': evento.titulo,
+                    'message': f"Novo evento na agenda: {evento.titulo}",
+                },
+            )
             
             # Retorna o ID do último só para compatibilidade ou lista? 
             # O frontend espera 'id' e 'titulo'. Vamos retornar o último.
             return JsonResponse({
                 'status': 'success',
-                'id': last_event.id if last_event else 0,
-                'titulo': last_event.titulo if last_event else ''
+                'id': created_ids[-1] if created_ids else 0,
+                'titulo': data.get('titulo') if created_ids else ''
             })
 
         evento = Evento.objects.create(
@@ -3,18 +3,31 @@ API REST para Kanban Board
 Endpoints para gerenciar quadros, listas, cartões, labels, checklists e comentários
 """
 import json
+import logging
+from contextvars import ContextVar
 from functools import wraps
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, Max
+from django.db.models import Count, Max, OuterRef, Prefetch, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 from .models import (
     User, KanbanBoard, BoardMembership, KanbanList, KanbanCard,
     CardLabel, Checklist, ChecklistItem, CardComment, CardAttachment, CardActivity
 )
+from .pagination import keyset_page
+
+logger = logging.getLogger(__name__)
+
+# Tamanho padrão/máximo das páginas do feed de comentários e atividades
+FEED_PAGE_SIZE = 20
+FEED_MAX_PAGE_SIZE = 100
+
+# Buffer de atividades da request atual (None = gravação imediata)
+_activity_buffer = ContextVar('kanban_activity_buffer', default=None)
 
 
 def api_login_required(view_func):
@@ -27,6 +40,24 @@ def api_login_required(view_func):
     return wrapper
 
 
+def buffered_activities(view_func):
+    """
+    Acumula as atividades registradas durante a view e grava todas
+    com um único bulk_create ao final da request.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        token = _activity_buffer.set([])
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            try:
+                flush_activities()
+            finally:
+                _activity_buffer.reset(token)
+    return wrapper
+
+
 
 # ============================================
 # HELPER FUNCTIONS
@@ -69,7 +100,8 @@ def board_to_dict(board, include_lists=False):
         'created_at': board.created_at.isoformat(),
     }
     if include_lists:
-        data['lists'] = [list_to_dict(lst, include_cards=True) for lst in board.lists.filter(is_archived=False)]
+        lists = with_active_cards(board.lists.filter(is_archived=False))
+        data['lists'] = [list_to_dict(lst, include_cards=True) for lst in lists]
         data['labels'] = [{'id': l.id, 'name': l.name, 'color': l.color} for l in board.labels.all()]
         data['members'] = [
             {
@@ -78,28 +110,63 @@ def board_to_dict(board, include_lists=False):
                 'role': m.role,
                 'initials': get_user_initials(m.user)
             }
-            for m in board.memberships.all()
+            for m in board.memberships.select_related('user')
         ]
     return data
 
 
+def _count_per_card(queryset, card_field):
+    """Contagem por cartão como subquery (vários Count com join multiplicariam as linhas)"""
+    return Coalesce(Subquery(
+        queryset.filter(**{card_field: OuterRef('pk')}).order_by()
+        .values(card_field).annotate(n=Count('id')).values('n')
+    ), 0)
+
+
+def with_card_counts(cards):
+    """
+    Cartões prontos para card_to_dict com número fixo de queries: contagens
+    anotadas e etiquetas/membros pré-carregados (antes eram 6 queries por cartão).
+    """
+    return cards.annotate(
+        num_comments=_count_per_card(CardComment.objects.all(), 'card'),
+        num_attachments=_count_per_card(CardAttachment.objects.all(), 'card'),
+        checklist_total=_count_per_card(ChecklistItem.objects.all(), 'checklist__card'),
+        checklist_completed=_count_per_card(ChecklistItem.objects.filter(is_completed=True), 'checklist__card'),
+    ).prefetch_related('labels', 'assigned_to')
+
+
+def with_active_cards(lists):
+    """Listas com os cartões não arquivados pré-carregados em active_cards"""
+    return lists.prefetch_related(Prefetch(
+        'cards', queryset=with_card_counts(KanbanCard.objects.filter(is_archived=False)), to_attr='active_cards',
+    ))
+
+
 def list_to_dict(lst, include_cards=False):
     """Converte lista para dicionário"""
+    cards = getattr(lst, 'active_cards', None)
+    if cards is None and include_cards:
+        cards = list(with_card_counts(lst.cards.filter(is_archived=False)))
     data = {
         'id': lst.id,
         'name': lst.name,
         'position': lst.position,
         'card_limit': lst.card_limit,
-        'card_count': lst.cards.filter(is_archived=False).count(),
+        'card_count': len(cards) if cards is not None else lst.cards.filter(is_archived=False).count(),
     }
     if include_cards:
-        data['cards'] = [card_to_dict(card) for card in lst.cards.filter(is_archived=False)]
+        data['cards'] = [card_to_dict(card) for card in cards]
     return data
 
 
 def card_to_dict(card):
-    """Converte cartão para dicionário"""
+    """Converte cartão para dicionário (use with_card_counts em listagens)"""
     progress = card.checklist_progress
+    if hasattr(card, 'num_comments'):
+        comment_count, attachment_count = card.num_comments, card.num_attachments
+    else:
+        comment_count, attachment_count = card.comments.count(), card.attachments.count()
     return {
         'id': card.id,
         'title': card.title,
@@ -115,8 +182,8 @@ def card_to_dict(card):
             for u in card.assigned_to.all()
         ],
         'has_description': bool(card.description),
-        'comment_count': card.comments.count(),
-        'attachment_count': card.attachments.count(),
+        'comment_count': comment_count,
+        'attachment_count': attachment_count,
         'checklist_progress': progress,
     }
 
@@ -142,30 +209,10 @@ def card_to_detail_dict(card):
         }
         for cl in card.checklists.all()
     ]
-    data['comments'] = [
-        {
-            'id': c.id,
-            'author': {
-                'id': c.author.id,
-                'name': c.author.get_full_name() or c.author.username,
-                'initials': get_user_initials(c.author)
-            },
-            'content': c.content,
-            'created_at': c.created_at.isoformat(),
-        }
-        for c in card.comments.all()[:20]
-    ]
-    data['activities'] = [
-        {
-            'id': a.id,
-            'user': a.user.get_full_name() or a.user.username,
-            'user_initials': get_user_initials(a.user),
-            'action': a.get_action_display(),
-            'description': a.description,
-            'created_at': a.created_at.isoformat(),
-        }
-        for a in card.activities.all()[:20]
-    ]
+    comments, data['comments_next_cursor'] = card_feed_page(card, 'comments')
+    data['comments'] = [comment_to_dict(c) for c in comments]
+    activities, data['activities_next_cursor'] = card_feed_page(card, 'activities')
+    data['activities'] = [activity_to_dict(a) for a in activities]
     data['created_by'] = {
         'id': card.created_by.id,
         'name': card.created_by.get_full_name() or card.created_by.username,
@@ -182,16 +229,82 @@ def get_user_initials(user):
     return name[:2].upper()
 
 
+def comment_to_dict(comment):
+    """Converte comentário para dicionário"""
+    return {
+        'id': comment.id,
+        'author': {
+            'id': comment.author.id,
+            'name': comment.author.get_full_name() or comment.author.username,
+            'initials': get_user_initials(comment.author)
+        },
+        'content': comment.content,
+        'created_at': comment.created_at.isoformat(),
+    }
+
+
+def activity_to_dict(activity):
+    """Converte atividade para dicionário"""
+    return {
+        'id': activity.id,
+        'user': activity.user.get_full_name() or activity.user.username,
+        'user_initials': get_user_initials(activity.user),
+        'action': activity.get_action_display(),
+        'description': activity.description,
+        'created_at': activity.created_at.isoformat(),
+    }
+
+
+def card_feed_page(card, feed, cursor=None, limit=FEED_PAGE_SIZE):
+    """
+    Retorna uma página do feed do cartão (mais recentes primeiro) e o cursor
+    da próxima página. Usa keyset em (created_at, id) em vez de OFFSET, então
+    o custo é o mesmo em qualquer ponto do histórico.
+    """
+    if feed == 'comments':
+        qs = CardComment.objects.filter(card=card).select_related('author')
+    else:
+        # Garante que atividades ainda no buffer desta request apareçam no feed
+        flush_activities()
+        qs = CardActivity.objects.filter(card=card).select_related('user')
+    return keyset_page(qs, cursor, limit)
+
+
+def record_activity(card, user, action, description):
+    """
+    Registra atividade no cartão. Dentro de uma view com @buffered_activities
+    a gravação é adiada para o bulk_create do fim da request.
+    """
+    activity = CardActivity(card=card, user=user, action=action, description=description)
+    buffer = _activity_buffer.get()
+    if buffer is None:
+        activity.save()
+    else:
+        buffer.append(activity)
+    return activity
+
+
+def flush_activities():
+    """Grava as atividades pendentes do buffer da request em um único INSERT"""
+    buffer = _activity_buffer.get()
+    if not buffer:
+        return
+    # Cartões excluídos nesta request não recebem atividade (seria removida em cascata)
+    pending = [a for a in buffer if a.card.pk is not None]
+    buffer.clear()
+    if not pending:
+        return
+    try:
+        CardActivity.objects.bulk_create(pending)
+    except Exception as e:
+        logger.error(f"[KANBAN_ACTIVITY] Falha ao gravar {len(pending)} atividades: {e}")
+
+
 def log_activity(card, user, action, description):
     """Registra atividade no cartão"""
     user_name = user.get_full_name() or user.username
     full_description = f"<strong>{user_name}</strong> {description}"
-    CardActivity.objects.create(
-        card=card,
-        user=user,
-        action=action,
-        description=full_description
-    )
+    return record_activity(card, user, action, full_description)
 
 
 # ============================================
@@ -288,7 +401,7 @@ def api_board_lists(request, board_id):
         return JsonResponse({'error': 'Sem permissão'}, status=403)
     
     if request.method == "GET":
-        lists = board.lists.filter(is_archived=False)
+        lists = with_active_cards(board.lists.filter(is_archived=False))
         return JsonResponse({
             'lists': [list_to_dict(lst, include_cards=True) for lst in lists]
         })
@@ -367,6 +480,7 @@ def api_lists_reorder(request, board_id):
 @csrf_exempt
 @api_login_required
 @require_http_methods(["GET", "POST"])
+@buffered_activities
 def api_list_cards(request, list_id):
     """Lista ou cria cartões em uma lista"""
     lst = get_object_or_404(KanbanList, id=list_id)
@@ -375,7 +489,7 @@ def api_list_cards(request, list_id):
         return JsonResponse({'error': 'Sem permissão'}, status=403)
     
     if request.method == "GET":
-        cards = lst.cards.filter(is_archived=False)
+        cards = with_card_counts(lst.cards.filter(is_archived=False))
         return JsonResponse({
             'cards': [card_to_dict(c) for c in cards]
         })
@@ -403,6 +517,7 @@ def api_list_cards(request, list_id):
 @csrf_exempt
 @api_login_required
 @require_http_methods(["GET", "PUT", "DELETE"])
+@buffered_activities
 def api_card_detail(request, card_id):
     """Detalhe, atualização ou exclusão de cartão"""
     card = get_object_or_404(KanbanCard, id=card_id)
@@ -455,6 +570,7 @@ def api_card_detail(request, card_id):
 @csrf_exempt
 @api_login_required
 @require_http_methods(["POST"])
+@buffered_activities
 def api_card_move(request, card_id):
     """Move cartão para outra lista"""
     card = get_object_or_404(KanbanCard, id=card_id)
@@ -513,6 +629,7 @@ def api_cards_reorder(request, list_id):
 @csrf_exempt
 @api_login_required
 @require_http_methods(["POST"])
+@buffered_activities
 def api_card_labels(request, card_id):
     """Adiciona ou remove labels do cartão"""
     card = get_object_or_404(KanbanCard, id=card_id)
@@ -546,6 +663,7 @@ def api_card_labels(request, card_id):
 @csrf_exempt
 @api_login_required
 @require_http_methods(["POST"])
+@buffered_activities
 def api_card_checklists(request, card_id):
     """Cria checklist no cartão"""
     card = get_object_or_404(KanbanCard, id=card_id)
@@ -633,16 +751,40 @@ def api_checklist_items(request, checklist_id):
 # COMMENTS ENDPOINTS
 # ============================================
 
+def _feed_response(request, card, feed, serializer):
+    """Resposta paginada por cursor (?cursor=...&limit=...) do feed do cartão"""
+    try:
+        limit = int(request.GET.get('limit', FEED_PAGE_SIZE))
+    except ValueError:
+        limit = FEED_PAGE_SIZE
+    limit = max(1, min(limit, FEED_MAX_PAGE_SIZE))
+
+    try:
+        items, next_cursor = card_feed_page(card, feed, request.GET.get('cursor'), limit)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse({
+        feed: [serializer(item) for item in items],
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None,
+    })
+
+
 @csrf_exempt
 @api_login_required
-@require_http_methods(["POST"])
+@require_http_methods(["GET", "POST"])
+@buffered_activities
 def api_card_comments(request, card_id):
-    """Adiciona comentário ao cartão"""
+    """Lista (paginado por cursor) ou adiciona comentário ao cartão"""
     card = get_object_or_404(KanbanCard, id=card_id)
     
     if not can_view_board(request.user, card.list.board):
         return JsonResponse({'error': 'Sem permissão'}, status=403)
     
+    if request.method == "GET":
+        return _feed_response(request, card, 'comments', comment_to_dict)
+    
     try:
         data = json.loads(request.body)
         comment = CardComment.objects.create(
@@ -652,20 +794,23 @@ def api_card_comments(request, card_id):
         )
         log_activity(card, request.user, 'commented', 'comentou neste cartão')
         
-        return JsonResponse({
-            'id': comment.id,
-            'author': {
-                'id': comment.author.id,
-                'name': comment.author.get_full_name() or comment.author.username,
-                'initials': get_user_initials(comment.author)
-            },
-            'content': comment.content,
-            'created_at': comment.created_at.isoformat()
-        })
+        return JsonResponse(comment_to_dict(comment))
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
 
+@api_login_required
+@require_http_methods(["GET"])
+def api_card_activities(request, card_id):
+    """Histórico completo de atividades do cartão, paginado por cursor"""
+    card = get_object_or_404(KanbanCard, id=card_id)
+    
+    if not can_view_board(request.user, card.list.board):
+        return JsonResponse({'error': 'Sem permissão'}, status=403)
+    
+    return _feed_response(request, card, 'activities', activity_to_dict)
+
+
 # ============================================
 # MEMBERS ENDPOINTS
 # ============================================
@@ -673,6 +818,7 @@ def api_card_comments(request, card_id):
 @csrf_exempt
 @api_login_required
 @require_http_methods(["POST"])
+@buffered_activities
 def api_card_members(request, card_id):
     """Adiciona ou remove membros do cartão"""
     card = get_object_or_404(KanbanCard, id=card_id)
@@ -750,6 +896,7 @@ def api_kanban_search(request):
 
 @api_login_required
 @require_http_methods(["POST"])
+@buffered_activities
 def api_card_members(request, card_id):
     """Gerencia membros atribuídos ao cartão"""
     card = get_object_or_404(KanbanCard, id=card_id)
@@ -766,19 +913,15 @@ def api_card_members(request, card_id):
         
         if action == 'add':
             card.assigned_to.add(member)
-            CardActivity.objects.create(
-                card=card,
-                user=request.user,
-                action='assigned',
-                description=f'{request.user.get_full_name() or request.user.username} atribuiu {member.get_full_name() or member.username} ao cartão'
+            record_activity(
+                card, request.user, 'assigned',
+                f'{request.user.get_full_name() or request.user.username} atribuiu {member.get_full_name() or member.username} ao cartão'
             )
         else:
             card.assigned_to.remove(member)
-            CardActivity.objects.create(
-                card=card,
-                user=request.user,
-                action='assigned',
-                description=f'{request.user.get_full_name() or request.user.username} removeu {member.get_full_name() or member.username} do cartão'
+            record_activity(
+                card, request.user, 'assigned',
+                f'{request.user.get_full_name() or request.user.username} removeu {member.get_full_name() or member.username} do cartão'
             )
         
         return JsonResponse({
@@ -799,6 +942,7 @@ def api_card_members(request, card_id):
 
 @api_login_required
 @require_http_methods(["GET", "POST"])
+@buffered_activities
 def api_card_attachments(request, card_id):
     """Gerencia anexos do cartão"""
     card = get_object_or_404(KanbanCard, id=card_id)
@@ -829,11 +973,9 @@ def api_card_attachments(request, card_id):
             uploaded_by=request.user
         )
         
-        CardActivity.objects.create(
-            card=card,
-            user=request.user,
-            action='attachment_added',
-            description=f'{request.user.get_full_name() or request.user.username} adicionou o anexo "{uploaded_file.name}"'
+        record_activity(
+            card, request.user, 'attachment_added',
+            f'{request.user.get_full_name() or request.user.username} adicionou o anexo "{uploaded_file.name}"'
         )
         
         return JsonResponse({
@@ -846,6 +988,7 @@ def api_card_attachments(request, card_id):
 
 @api_login_required
 @require_http_methods(["DELETE"])
+@buffered_activities
 def api_card_attachment_delete(request, card_id, attachment_id):
     """Exclui um anexo específico"""
     card = get_object_or_404(KanbanCard, id=card_id)
@@ -855,11 +998,9 @@ def api_card_attachment_delete(request, card_id, attachment_id):
     attachment.file.delete(save=False)  # Delete the file
     attachment.delete()
     
-    CardActivity.objects.create(
-        card=card,
-        user=request.user,
-        action='attachment_added',
-        description=f'{request.user.get_full_name() or request.user.username} removeu o anexo "{filename}"'
+    record_activity(
+        card, request.user, 'attachment_added',
+        f'{request.user.get_full_name() or request.user.username} removeu o anexo "{filename}"'
     )
     
     return JsonResponse({'success': True})
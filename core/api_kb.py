@@ -2,9 +2,10 @@ import json
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.db.models import F
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
-from .models import ArtigoBaseConhecimento, FerramentaIA, Department
+from .models import ArtigoBaseConhecimento, FerramentaIA
 
 @login_required
 def api_kb_articles_list(request):
@@ -56,7 +57,7 @@ def api_kb_article_create(request):
         if request.user.is_administrador():
             selected_dept_id = request.session.get('selected_department_id')
             if selected_dept_id:
-                dept = get_object_or_404(Department, id=selected_dept_id)
+                dept = request.departments.by_id(selected_dept_id)
         else:
             dept = request.user.department
             
@@ -91,9 +92,9 @@ def api_kb_article_detail(request, pk):
         artigo = get_object_or_404(ArtigoBaseConhecimento, pk=pk, department=request.user.department)
 
     if request.method == "GET":
-        # Incrementar views
+        # Incrementar views (UPDATE atômico: leituras simultâneas não perdem contagem)
+        ArtigoBaseConhecimento.objects.filter(pk=artigo.pk).update(views=F('views') + 1)
         artigo.views += 1
-        artigo.save()
         
         return JsonResponse({
             'id': artigo.id,
@@ -0,0 +1,33 @@
+"""
+APIs de monitoramento (apenas administradores)
+"""
+
+from django.http import JsonResponse
+from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_http_methods
+
+from . import db_connections, request_metrics
+
+
+@login_required
+@require_http_methods(["GET", "DELETE"])
+def api_request_metrics(request):
+    """
+    Latência e queries por view das últimas requisições deste processo, e os
+    contadores de conexões com o banco. DELETE zera as amostras e contadores
+    (ex.: antes de medir uma mudança).
+    """
+    if not request.user.is_administrador():
+        return JsonResponse({'error': 'Permissão negada'}, status=403)
+
+    if request.method == 'DELETE':
+        request_metrics.reset()
+        db_connections.reset()
+        return JsonResponse({'success': True})
+
+    return JsonResponse({
+        'success': True,
+        'amostras_por_view': request_metrics.SAMPLES_PER_VIEW,
+        'views': request_metrics.snapshot(),
+        'conexoes_banco': db_connections.snapshot(),
+    })
@@ -2,7 +2,7 @@ from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
-from .models import Lista, Cartao, User, Department, QuadroEtiqueta, CartaoComentario, CartaoAnexo
+from .models import Lista, Cartao, User, QuadroEtiqueta, CartaoComentario, CartaoAnexo
 import json
 from datetime import datetime
 
@@ -10,8 +10,8 @@ def get_department(request):
     if request.user.is_administrador():
         dept_id = request.session.get('selected_department_id')
         if dept_id and dept_id != 0:
-            return Department.objects.filter(id=dept_id).first() or Department.objects.first()
-        return Department.objects.first()
+            return request.departments.by_id(dept_id) or request.departments.first()
+        return request.departments.first()
     return request.user.department
 
 from django.db.models import Count
@@ -35,17 +35,21 @@ def api_quadro_data(request):
     membros_dept = User.objects.filter(department=department, is_active=True)
     membros_data = [{'id': u.id, 'nome': u.get_full_name() or u.username, 'avatar': None} for u in membros_dept]
 
+    # Cartões de todas as listas em uma query (antes: uma query por lista).
+    # distinct=True: os dois Count sobre relações diferentes multiplicariam as linhas
+    cartoes = Cartao.objects.filter(lista__in=listas, archived=False).order_by('ordem').annotate(
+        num_comentarios=Count('comentarios', distinct=True),
+        num_anexos=Count('anexos', distinct=True)
+    ).prefetch_related('membros', 'etiquetas')
+    cartoes_por_lista = {}
+    for cartao in cartoes:
+        cartoes_por_lista.setdefault(cartao.lista_id, []).append(cartao)
+
     data = []
     
     for lista in listas:
-        # OTIMIZAÇÃO: Usar annotate para contar relacionamentos sem carregar objetos
-        cartoes = lista.cartoes.filter(archived=False).order_by('ordem').annotate(
-            num_comentarios=Count('comentarios'),
-            num_anexos=Count('anexos')
-        ).prefetch_related('membros', 'etiquetas')
-        
         cartoes_data = []
-        for cartao in cartoes:
+        for cartao in cartoes_por_lista.get(lista.id, []):
             cartoes_data.append({
                 'id': cartao.id,
                 'titulo': cartao.titulo,
@@ -53,7 +57,7 @@ def api_quadro_data(request):
                 'prioridade': cartao.prioridade,
                 'data_limite': cartao.data_limite.strftime('%Y-%m-%d') if cartao.data_limite else None,
                 # Legacy responsavel fallback
-                'responsavel_id': cartao.responsavel.id if cartao.responsavel else None,
+                'responsavel_id': cartao.responsavel_id,
                 'membros': [{'id': m.id, 'nome': m.get_full_name() or m.username} for m in cartao.membros.all()],
                 'etiquetas': [{'id': e.id, 'nome': e.nome, 'cor': e.cor} for e in cartao.etiquetas.all()],
                 'checklists': cartao.checklists,
@@ -2,10 +2,32 @@ from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Q
+from datetime import timedelta
 import json
+import re
 
-from .models import RefundRequest, RefundRequestAttachment, User, Department
+from .models import RefundRequest, RefundRequestAttachment, RefundEvent, User
+from .pagination import capped_count, keyset_page, page_size
+
+
+# Máximo de eventos entregues por polling de notificações
+REFUND_EVENTS_PAGE = 50
+# Eventos recentes relidos a cada polling (ids de transações confirmadas fora de ordem)
+REFUND_EVENTS_OVERLAP = timedelta(minutes=2)
+
+
+def record_refund_event(refund, event, actor, message):
+    """Acrescenta um evento ao log de transições da solicitação"""
+    return RefundEvent.objects.create(
+        refund=refund,
+        analyst_id=refund.analyst_id,
+        actor=actor,
+        event=event,
+        status=refund.status,
+        message=message,
+    )
 
 
 @login_required
@@ -29,32 +51,38 @@ def api_refund_create(request):
             checked_cameras = data.get('checked_cameras', False)
             refund_value = data.get('refund_value', 0)
         
-        refund = RefundRequest.objects.create(
-            analyst=request.user,
-            store_code=data.get('store_code', ''),
-            customer_name=data.get('customer_name', ''),
-            customer_cpf=data.get('customer_cpf', ''),
-            customer_email=data.get('customer_email', ''),
-            customer_phone=data.get('customer_phone', ''),
-            incident_date=data.get('incident_date'),
-            incident_time=data.get('incident_time') or None,
-            purchase_location=data.get('purchase_location', 'loja_fisica'),
-            reason=data.get('reason', ''),
-            checked_cameras=checked_cameras,
-            refund_value=refund_value,
-            refund_type=data.get('refund_type', 'pix'),
-            pix_key=data.get('pix_key', ''),
-            summary=data.get('summary', ''),
-        )
+        with transaction.atomic():
+            refund = RefundRequest.objects.create(
+                analyst=request.user,
+                store_code=data.get('store_code', ''),
+                customer_name=data.get('customer_name', ''),
+                customer_cpf=data.get('customer_cpf', ''),
+                customer_email=data.get('customer_email', ''),
+                customer_phone=data.get('customer_phone', ''),
+                incident_date=data.get('incident_date'),
+                incident_time=data.get('incident_time') or None,
+                purchase_location=data.get('purchase_location', 'loja_fisica'),
+                reason=data.get('reason', ''),
+                checked_cameras=checked_cameras,
+                refund_value=refund_value,
+                refund_type=data.get('refund_type', 'pix'),
+                pix_key=data.get('pix_key', ''),
+                summary=data.get('summary', ''),
+            )
         
-        # Process file attachments if present
-        files = request.FILES.getlist('attachments')
-        for file in files[:5]:  # Limit to 5 files
-            RefundRequestAttachment.objects.create(
-                refund_request=refund,
-                file=file,
-                uploaded_by=request.user,
-                description=f'Anexo enviado na criação'
+            # Process file attachments if present
+            files = request.FILES.getlist('attachments')
+            for file in files[:5]:  # Limit to 5 files
+                RefundRequestAttachment.objects.create(
+                    refund_request=refund,
+                    file=file,
+                    uploaded_by=request.user,
+                    description=f'Anexo enviado na criação'
+                )
+        
+            record_refund_event(
+                refund, 'created', request.user,
+                f'Nova solicitação #{refund.id} de {request.user.get_full_name() or request.user.username}: {refund.customer_name} - R$ {refund.refund_value}'
             )
         
         return JsonResponse({
@@ -66,10 +94,60 @@ def api_refund_create(request):
         return JsonResponse({'success': False, 'error': str(e)}, status=400)
 
 
+def format_cpf_prefix(digits):
+    """Aplica a máscara 000.000.000-00 aos dígitos informados (completos ou prefixo)"""
+    parts = [digits[:3], digits[3:6], digits[6:9], digits[9:11]]
+    formatted = parts[0]
+    for sep, part in zip(['.', '.', '-'], parts[1:]):
+        if not part:
+            break
+        formatted += sep + part
+    return formatted
+
+
+def refund_search_q(search):
+    """
+    Monta o filtro da busca geral conforme o tipo do termo:
+    - "#123": ID exato
+    - só dígitos (com ou sem máscara): ID exato e CPF exato (11 dígitos) ou por prefixo
+    - contém "@": prefixo do e-mail
+    - texto: prefixo do nome do cliente, código da loja ou nome do responsável
+    Os prefixos não diferenciam maiúsculas (istartswith, que compara
+    UPPER(coluna)): nome, e-mail e loja têm índices nessa expressão
+    (refund_*_upper_idx), ID e CPF usam o índice da coluna. O responsável é
+    resolvido antes em uma subquery na tabela de usuários (pequena) e entra
+    como analyst_id, coberto pelo índice da listagem por analista.
+    """
+    if search.startswith('#') and search[1:].isdigit():
+        return Q(id=int(search[1:]))
+
+    digits = re.sub(r'\D', '', search)
+    if digits and re.fullmatch(r'[\d.\-/\s]+', search):
+        q = Q(id=int(digits)) if len(digits) <= 10 else Q()
+        if len(digits) == 11:
+            return q | Q(customer_cpf__in=[digits, format_cpf_prefix(digits)])
+        return q | Q(customer_cpf__startswith=digits) | Q(customer_cpf__startswith=format_cpf_prefix(digits))
+
+    if '@' in search:
+        return Q(customer_email__istartswith=search)
+
+    analysts = User.objects.filter(
+        Q(first_name__istartswith=search) | Q(last_name__istartswith=search)
+    ).values('id')
+    return (
+        Q(customer_name__istartswith=search) |
+        Q(store_code__istartswith=search) |
+        Q(analyst_id__in=analysts)
+    )
+
+
 @login_required
 @require_http_methods(["GET"])
 def api_refund_list(request):
-    """Listar solicitações de estorno com filtros de busca"""
+    """
+    Listar solicitações de estorno com filtros de busca, paginadas por cursor
+    (?cursor=&limit=). Retorna também a contagem (exata até COUNT_CAP).
+    """
     user = request.user
     
     # Check if requesting all NRS Suporte requests
@@ -108,28 +186,29 @@ def api_refund_list(request):
     if date_end:
         refunds = refunds.filter(created_at__date__lte=date_end)
     
-    # Busca geral (nome, CPF, ID, email, responsável)
+    # Busca tipada: ID/CPF exatos ou prefixos (sem cast do id nem LIKE '%...%')
     search = request.GET.get('search', '').strip()
     if search:
-        refunds = refunds.filter(
-            Q(id__icontains=search) |
-            Q(customer_name__icontains=search) |
-            Q(customer_cpf__icontains=search) |
-            Q(customer_email__icontains=search) |
-            Q(store_code__icontains=search) |
-            Q(analyst__first_name__icontains=search) |
-            Q(analyst__last_name__icontains=search)
-        )
+        refunds = refunds.filter(refund_search_q(search))
     
-    # Order by most recent
-    refunds = refunds.order_by('-created_at')
+    count, count_exact = capped_count(refunds)
+    
+    # Página mais recente primeiro, continuando do cursor (keyset em created_at, id)
+    try:
+        page, next_cursor = keyset_page(
+            refunds.select_related('analyst', 'viewed_by'),
+            request.GET.get('cursor'),
+            page_size(request),
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     
     data = []
-    for r in refunds:
+    for r in page:
         data.append({
             'id': str(r.id),
             'analyst_name': r.analyst.get_full_name() or r.analyst.username,
-            'analyst_id': str(r.analyst.id),
+            'analyst_id': str(r.analyst_id),
             'store_code': r.store_code,
             'customer_name': r.customer_name,
             'customer_cpf': r.customer_cpf,
@@ -145,7 +224,12 @@ def api_refund_list(request):
             'cancellation_requested': r.cancellation_requested,
         })
     
-    return JsonResponse({'refunds': data})
+    return JsonResponse({
+        'refunds': data,
+        'next_cursor': next_cursor,
+        'count': count,
+        'count_exact': count_exact,
+    })
 
 
 @login_required
@@ -240,18 +324,26 @@ def api_refund_detail(request, pk):
 def api_refund_update_status(request, pk):
     """Atualizar status da solicitação (CS Clientes)"""
     try:
-        refund = RefundRequest.objects.get(pk=pk)
         data = json.loads(request.body)
         
         new_status = data.get('status')
         if new_status and new_status in ['aberta', 'em_analise', 'concluida', 'cancelada']:
-            refund.status = new_status
-            
-            if new_status == 'concluida':
-                refund.completed_at = timezone.now()
-                refund.notified_nrs_completion = False
-            
-            refund.save()
+            # Status e evento juntos; a trava evita dois eventos para a mesma mudança
+            with transaction.atomic():
+                refund = RefundRequest.objects.select_for_update().get(pk=pk)
+                changed = refund.status != new_status
+                refund.status = new_status
+                
+                if new_status == 'concluida':
+                    refund.completed_at = timezone.now()
+                
+                refund.save()
+                
+                if changed:
+                    if new_status == 'concluida':
+                        record_refund_event(refund, 'completed', request.user, f'Sua solicitação #{refund.id} para {refund.customer_name} foi concluída!')
+                    else:
+                        record_refund_event(refund, 'status_changed', request.user, f'Solicitação #{refund.id} agora está {refund.get_status_display()}.')
             
             return JsonResponse({
                 'success': True,
@@ -274,14 +366,16 @@ def api_refund_request_cancellation(request, pk):
         if user.role not in ['gestor', 'administrador']:
             return JsonResponse({'success': False, 'error': 'Sem permissão para solicitar cancelamento'}, status=403)
         
-        refund = RefundRequest.objects.get(pk=pk)
         data = json.loads(request.body)
         
-        refund.cancellation_requested = True
-        refund.cancellation_requested_by = user
-        refund.cancellation_requested_at = timezone.now()
-        refund.cancellation_reason = data.get('reason', '')
-        refund.save(update_fields=['cancellation_requested', 'cancellation_requested_by', 'cancellation_requested_at', 'cancellation_reason'])
+        with transaction.atomic():
+            refund = RefundRequest.objects.get(pk=pk)
+            refund.cancellation_requested = True
+            refund.cancellation_requested_by = user
+            refund.cancellation_requested_at = timezone.now()
+            refund.cancellation_reason = data.get('reason', '')
+            refund.save(update_fields=['cancellation_requested', 'cancellation_requested_by', 'cancellation_requested_at', 'cancellation_reason'])
+            record_refund_event(refund, 'cancellation_requested', user, f'Cancelamento solicitado para #{refund.id} ({refund.customer_name}).')
         
         return JsonResponse({
             'success': True,
@@ -351,39 +445,48 @@ def api_refund_add_attachment(request, pk):
 @login_required
 @require_http_methods(["GET"])
 def api_refund_notifications(request):
-    """Verificar notificações de solicitações de estorno"""
+    """
+    Notificações de estorno lidas do log de eventos (?since=<último id visto>).
+    - CS Clientes: novas solicitações
+    - NRS Suporte: conclusão das próprias solicitações
+    Sem `since`, retorna apenas o cursor atual (não reenvia o histórico).
+
+    Os ids não são confirmados em ordem: um evento com id menor que o cursor
+    pode ficar visível depois do polling que avançou o cursor. Por isso, além
+    de id > since, os eventos dos últimos REFUND_EVENTS_OVERLAP são relidos a
+    cada polling; cada notificação leva o id do evento e o cliente descarta as
+    que já mostrou. A leitura é uma única consulta, sem escrita.
+    """
     user = request.user
-    notifications = []
     
-    # Para CS Clientes: novas solicitações não notificadas
-    if user.department and user.department.name == 'CS Clientes':
-        new_refunds = RefundRequest.objects.filter(notified_cs=False)
-        for r in new_refunds:
-            notifications.append({
-                'type': 'new_refund',
-                'message': f'Nova solicitação #{r.id} de {r.analyst.get_full_name() or r.analyst.username}: {r.customer_name} - R$ {r.refund_value}'
-            })
-            r.notified_cs = True
-            r.save(update_fields=['notified_cs'])
+    since = request.GET.get('since')
+    if not since:
+        last_event_id = RefundEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        return JsonResponse({'has_notifications': False, 'notifications': [], 'last_event_id': last_event_id})
+    try:
+        since = int(since)
+    except ValueError:
+        return JsonResponse({'error': 'Cursor inválido'}, status=400)
     
-    # Para NRS Suporte: solicitações concluídas
+    if user.department and user.department.name == 'CS Clientes':
+        events = RefundEvent.objects.filter(event='created')
     else:
-        completed_refunds = RefundRequest.objects.filter(
-            analyst=user,
-            status='concluida',
-            notified_nrs_completion=False
-        )
-        for r in completed_refunds:
-            notifications.append({
-                'type': 'refund_completed',
-                'message': f'Sua solicitação #{r.id} para {r.customer_name} foi concluída!'
-            })
-            r.notified_nrs_completion = True
-            r.save(update_fields=['notified_nrs_completion'])
+        events = RefundEvent.objects.filter(analyst=user, event='completed')
+    recent = timezone.now() - REFUND_EVENTS_OVERLAP
+    events = events.filter(Q(id__gt=since) | Q(created_at__gte=recent))
+    
+    events = list(events.order_by('id').values('id', 'event', 'refund_id', 'message')[:REFUND_EVENTS_PAGE])
+    notifications = [{
+        'id': e['id'],
+        'type': 'new_refund' if e['event'] == 'created' else 'refund_completed',
+        'refund_id': e['refund_id'],
+        'message': e['message'],
+    } for e in events]
     
     return JsonResponse({
         'has_notifications': len(notifications) > 0,
-        'notifications': notifications
+        'notifications': notifications,
+        'last_event_id': max([since, *(e['id'] for e in events)]),
     })
 
 
@@ -492,7 +595,7 @@ def api_refund_edit(request, pk):
 def api_nrs_analysts(request):
     """Retorna lista de analistas do NRS Suporte para filtros"""
     try:
-        nrs_dept = Department.objects.filter(name='NRS Suporte').first()
+        nrs_dept = request.departments.by_name('NRS Suporte')
         if not nrs_dept:
             return JsonResponse({'analysts': []})
         
@@ -6,18 +6,24 @@ from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_http_methods
 from django.shortcuts import get_object_or_404
+from django.core.files.storage import default_storage
 from django.db import transaction
+from django.db.models import Count, Q
 from django.utils import timezone
 import json
 import logging
 
 from .models import (
-    Colaborador, Cargo, Department, HistoricoProfissional, 
+    Colaborador, Cargo, HistoricoProfissional, 
     PerformanceRH, User, DocumentoColaborador
 )
+from .pagination import keyset_page, page_size
 
 logger = logging.getLogger(__name__)
 
+# Usuários sem ficha aparecem só na primeira página, limitados a este número
+MAX_USUARIOS_SEM_FICHA = 100
+
 
 def parse_decimal(value):
     """Auxiliar para converter valores decimais que podem vir com vírgula da UI"""
@@ -34,64 +40,103 @@ def parse_decimal(value):
 @login_required
 @require_http_methods(["GET"])
 def api_colaboradores_list(request):
-    """Retorna listagem de colaboradores + usuários Nexus que ainda não têm ficha RH"""
+    """
+    Diretório de colaboradores, em ordem alfabética e paginado por cursor.
+
+    Filtros: status (padrão 'ativo'; 'todos' para todos), department, cargo
+    e q (prefixo do nome). A primeira página traz também os usuários do Nexus
+    que ainda não têm ficha RH (podem aparecer como cards para "Criar ficha").
+    """
     status_filter = request.GET.get('status', 'ativo')
     dept_filter = request.GET.get('department')
+    cargo_filter = (request.GET.get('cargo') or '').strip()
+    search = (request.GET.get('q') or '').strip()
+    cursor = request.GET.get('cursor')
 
-    colaboradores = Colaborador.objects.all()
+    filtro = Q()
     if status_filter != 'todos':
-        colaboradores = colaboradores.filter(status=status_filter)
-    if dept_filter:
-        colaboradores = colaboradores.filter(department_id=dept_filter)
-
-    data = []
-    for c in colaboradores.select_related('department'):
-        data.append({
-            'tipo': 'colaborador',
-            'id': str(c.id),
-            'nome': c.nome_completo,
-            'nome_completo': c.nome_completo,
-            'cargo': c.cargo_atual,
-            'cargo_atual': c.cargo_atual,
-            'cpf': c.cpf or '',
-            'department': c.department.name,
-            'department_id': c.department_id,
-            'status': c.status,
-            'status_display': c.get_status_display(),
-            'data_admissao': c.data_admissao.strftime('%d/%m/%Y'),
-            'tempo_empresa': c.tempo_empresa,
-            'foto_url': c.foto.url if c.foto else None
-        })
-
-    # Usuários do Nexus que ainda não têm ficha de colaborador (podem aparecer como cards para "Criar ficha")
-    users_sem_ficha = User.objects.filter(ativo=True).filter(colaborador_perfil__isnull=True).select_related('department')
+        filtro &= Q(status=status_filter)
     if dept_filter:
-        users_sem_ficha = users_sem_ficha.filter(department_id=dept_filter)
+        filtro &= Q(department_id=dept_filter)
+    if cargo_filter:
+        filtro &= Q(cargo_atual__iexact=cargo_filter)
+    if search:
+        filtro &= Q(nome_completo__istartswith=search)
+
+    # Apenas os campos do card (sem endereço, documentos pessoais etc.)
+    colaboradores = Colaborador.objects.filter(filtro).values(
+        'id', 'nome_completo', 'cargo_atual', 'cpf', 'department_id', 'department__name',
+        'status', 'data_admissao', 'data_desligamento', 'foto',
+    )
+    try:
+        rows, next_cursor = keyset_page(
+            colaboradores, cursor, page_size(request), field='nome_completo', descending=False, parse=str,
+        )
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    status_display = dict(Colaborador.STATUS_CHOICES)
+    data = [{
+        'tipo': 'colaborador',
+        'id': str(c['id']),
+        'nome': c['nome_completo'],
+        'nome_completo': c['nome_completo'],
+        'cargo': c['cargo_atual'],
+        'cargo_atual': c['cargo_atual'],
+        'cpf': c['cpf'] or '',
+        'department': c['department__name'],
+        'department_id': c['department_id'],
+        'status': c['status'],
+        'status_display': status_display.get(c['status'], c['status']),
+        'data_admissao': c['data_admissao'].strftime('%d/%m/%Y'),
+        'tempo_empresa': Colaborador.calcular_tempo_empresa(c['data_admissao'], c['data_desligamento']),
+        'foto_url': default_storage.url(c['foto']) if c['foto'] else None,
+    } for c in rows]
 
     usuarios_sem_ficha = []
-    for u in users_sem_ficha:
-        nome = (u.get_full_name() or u.username or '').strip() or u.username
-        usuarios_sem_ficha.append({
-            'tipo': 'usuario_sem_ficha',
-            'user_id': str(u.id),
-            'id': 'user_' + str(u.id),
-            'nome': nome,
-            'cargo': u.get_role_display() if hasattr(u, 'get_role_display') else 'Usuário Nexus',
-            'department': u.department.name if u.department else '—',
-            'department_id': str(u.department_id) if u.department_id else '',
-            'username': u.username,
-            'email': u.email or '',
-            'foto_url': u.profile_photo.url if u.profile_photo else None
-        })
-
-    total_colab = Colaborador.objects.count()
-    ativos_colab = Colaborador.objects.filter(status='ativo').count()
+    if not cursor and status_filter in ('ativo', 'todos') and not cargo_filter:
+        users_sem_ficha = User.objects.filter(ativo=True, colaborador_perfil__isnull=True)
+        if dept_filter:
+            users_sem_ficha = users_sem_ficha.filter(department_id=dept_filter)
+        if search:
+            users_sem_ficha = users_sem_ficha.filter(
+                Q(first_name__istartswith=search) | Q(username__istartswith=search) | Q(email__istartswith=search)
+            )
+        role_display = dict(User.ROLE_CHOICES)
+        for u in users_sem_ficha.order_by('first_name', 'username').values(
+            'id', 'username', 'first_name', 'last_name', 'email', 'role',
+            'department_id', 'department__name', 'profile_photo',
+        )[:MAX_USUARIOS_SEM_FICHA]:
+            nome = f"{u['first_name']} {u['last_name']}".strip() or u['username']
+            usuarios_sem_ficha.append({
+                'tipo': 'usuario_sem_ficha',
+                'user_id': str(u['id']),
+                'id': 'user_' + str(u['id']),
+                'nome': nome,
+                'cargo': role_display.get(u['role'], 'Usuário Nexus'),
+                'department': u['department__name'] or '—',
+                'department_id': str(u['department_id']) if u['department_id'] else '',
+                'username': u['username'],
+                'email': u['email'] or '',
+                'foto_url': default_storage.url(u['profile_photo']) if u['profile_photo'] else None,
+            })
+
+    # Totais gerais e total do filtro atual em uma única query
+    stats = Colaborador.objects.aggregate(
+        total=Count('id'),
+        ativos=Count('id', filter=Q(status='ativo')),
+        ferias=Count('id', filter=Q(status='ferias')),
+        afastados=Count('id', filter=Q(status='afastado')),
+        desligados=Count('id', filter=Q(status='desligado')),
+        filtrados=Count('id', filter=filtro) if filtro else Count('id'),
+    )
 
     return JsonResponse({
         'success': True,
         'colaboradores': data,
         'usuarios_sem_ficha': usuarios_sem_ficha,
-        'stats': {'total': total_colab, 'ativos': ativos_colab}
+        'next_cursor': next_cursor,
+        'stats': stats,
     })
 
 
@@ -265,9 +310,7 @@ def api_rh_auxiliar_data(request):
     cargos = list(Cargo.objects.all().values('id', 'nome', 'department__name'))
     for cargo in cargos:
         cargo['id'] = str(cargo['id'])
-    depts = list(Department.objects.all().values('id', 'name'))
-    for dept in depts:
-        dept['id'] = str(dept['id'])
+    depts = [{'id': str(d.id), 'name': d.name} for d in request.departments.all]
     
     return JsonResponse({
         'success': True,
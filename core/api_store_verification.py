@@ -12,7 +12,6 @@ from datetime import datetime, date, timedelta
 from django.db.models import Q
 import json
 import logging
-import time
 import random
 import math
 
@@ -20,6 +19,7 @@ from .models import (
     Store, StoreAudit, StoreAuditIssue, StoreAuditItem,
     AnalystAssignment, User
 )
+from .escala import working_days
 
 
 logger = logging.getLogger(__name__)
@@ -731,8 +731,6 @@ def get_daily_quota_info(analyst):
 @require_http_methods(["GET"])
 def api_get_analyst_dashboard(request):
     """Retorna métricas para o dashboard do analista - OTIMIZADO"""
-    logger.info(f"[DASHBOARD_START] generating dashboard for user {request.user.username}")
-    start_time = time.time()
     
     # 1. Resolver Analista
     analyst_id = request.GET.get('analyst_id')
@@ -835,15 +833,8 @@ def api_get_analyst_dashboard(request):
         import math
         daily_target = math.ceil(pending_stores / divisor)
 
-    # 7. Calendário Semanal (Schedule)
-    from core.models import DailyAuditQuota
-    # Usar get_or_create_today otimizado (cuidado, ele faz save(). Se for gargalo, otimizar depois)
-    # Por enquanto, assumimos que 1 write por dashboard load é aceitável, melhor que 50 reads.
-    # Mas para visualização pura, talvez não precisasse criar/salvar.
-    # Vamos instanciar sem salvar para performance de leitura? 
-    # Não, precisamos saber se é working day. Vamos usar o helper mas monitorar o log [DASHBOARD_PERF]
-    
-    quota_helper = DailyAuditQuota.get_or_create_today(analyst)
+    # 7. Calendário Semanal (Schedule): ciclo 6x2 + folgas manuais da semana em uma consulta
+    week_working_days = working_days(analyst, start_of_week, 7)
     
     weekly_schedule = []
     days_of_week_names = ['Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado', 'Domingo']
@@ -851,7 +842,7 @@ def api_get_analyst_dashboard(request):
     for i in range(7):
         date_check = start_of_week + timedelta(days=i)
         is_today_flag = (date_check == today)
-        is_working = quota_helper.is_working_day(date_check)
+        is_working = week_working_days[i]
         
         status = 'work' if is_working else 'off'
         if date_check > today:
@@ -873,11 +864,6 @@ def api_get_analyst_dashboard(request):
     last_audit = StoreAudit.objects.filter(analyst=analyst).order_by('-created_at').first()
     last_audit_date = last_audit.created_at.strftime('%d/%m/%Y %H:%M') if last_audit else None
 
-    # Performance Log
-    end_time = time.time()
-    duration = end_time - start_time
-    logger.info(f"[DASHBOARD_PERF] Dashboard gen for {analyst.username} took {duration:.3f}s. Stores: {total_stores}, AuditsWk: {len(weekly_audits)}")
-
     return JsonResponse({
         'success': True,
         'analyst': {
@@ -5,14 +5,26 @@ import json
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
+from django.db.models import Prefetch
 from django.utils import timezone
 
-from .models import Store, StoreViewerSession, StoreAudit
+from .db_retry import retry_transaction
+from .models import Store, StoreViewerSession, StoreAudit, StoreAuditItem
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+@retry_transaction
+def _touch_viewer_session(store, user, is_auditing):
+    """Cria ou atualiza a sessão (heartbeats simultâneos disputam a mesma linha)"""
+    return StoreViewerSession.objects.update_or_create(
+        store=store,
+        user=user,
+        defaults={'is_auditing': is_auditing}
+    )
+
+
 @login_required
 @require_http_methods(["POST"])
 def api_store_presence_heartbeat(request, store_id):
@@ -32,11 +44,7 @@ def api_store_presence_heartbeat(request, store_id):
                 pass
         
         # Create or update session
-        session, created = StoreViewerSession.objects.update_or_create(
-            store=store,
-            user=request.user,
-            defaults={'is_auditing': is_auditing}
-        )
+        _touch_viewer_session(store, request.user, is_auditing)
         
         # Get other active viewers
         other_viewers = StoreViewerSession.get_active_viewers(store, exclude_user=request.user)
@@ -132,7 +140,10 @@ def api_store_audit_history(request, store_id):
     try:
         store = Store.objects.get(id=store_id)
         
-        audits = StoreAudit.objects.filter(store=store).select_related('analyst').prefetch_related('items').order_by('-created_at')
+        # Pendência e quem resolveu vêm no prefetch dos itens (sem query por item)
+        audits = StoreAudit.objects.filter(store=store).select_related('analyst').prefetch_related(
+            Prefetch('items', queryset=StoreAuditItem.objects.select_related('issue__resolved_by'))
+        ).order_by('-created_at')
         
         history = []
         for audit in audits:
@@ -141,7 +152,7 @@ def api_store_audit_history(request, store_id):
                 resolution_info = None
                 if item.issue and item.issue.status == 'resolvida':
                     resolution_info = {
-                'resolved_by': item.issue.resolved_by.get_full_name() or item.issue.resolved_by.username if item.issue.resolved_by else 'Desconhecido',
+                        'resolved_by': item.issue.resolved_by.get_full_name() or item.issue.resolved_by.username if item.issue.resolved_by else 'Desconhecido',
                         'resolved_at': timezone.localtime(item.issue.resolved_at).strftime('%d/%m/%Y %H:%M') if item.issue.resolved_at else '',
                         'notes': item.issue.gestor_notes,
                     }
@@ -5,9 +5,15 @@ from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 import json
-from datetime import datetime, timedelta, date
+from datetime import timedelta, date
 
 from .models import Task, Routine, RoutineLog, User, StoreAuditIssue
+from .routines import (
+    routine_status, team_routine_overview, missed_routines,
+    ensure_materialized, materialize_routine_logs, due_routine_logs,
+)
+from .fanout import get_team_analysts, fan_out, pop_notification_events
+
 
 @login_required
 def api_tasks_list(request):
@@ -59,48 +65,33 @@ def api_task_create(request):
         data = json.loads(request.body)
         assigned_to_id = data.get('assigned_to_id')
         
-        # Lógica para "Selecionar Todos"
-        users_to_assign = []
+        # "Selecionar Todos": uma tarefa por analista do time, criadas em lote
         if assigned_to_id == 'all':
-            dept_to_filter = request.user.department
-            if request.user.is_administrador():
-                selected_dept_id = request.session.get('selected_department_id')
-                if selected_dept_id:
-                    # Necessário importar Department se fosse objeto, mas filter por id funciona
-                    dept_to_filter = selected_dept_id
-                else:
-                    dept_to_filter = None # Global? Perigoso atribuir a TODOS do sistema.
-            
-            if dept_to_filter:
-                # Busca todos usuários ativos do departamento
-                users_to_assign = User.objects.filter(
-                    department_id=dept_to_filter if request.user.is_administrador() else dept_to_filter.id,
-                    ativo=True,
-                    role='analista'
-                )
-            elif request.user.is_administrador() and not dept_to_filter:
-                # Se admin e global, pega todos analistas do sistema?
-                users_to_assign = User.objects.filter(ativo=True, role='analista')
-
+            users_to_assign = get_team_analysts(request)
         else:
             users_to_assign = [get_object_or_404(User, pk=assigned_to_id)]
 
-        created_ids = []
-        for user_target in users_to_assign:
-            # Simple handling of due_date string, strictly assuming ISO format or similar
-            # if provided. Django usually handles ISO strings.
-            d_date = data.get('due_date')
-            
-            task = Task.objects.create(
+        # due_date em formato ISO (o Django converte a string)
+        d_date = data.get('due_date')
+        created_ids = fan_out(
+            Task,
+            users_to_assign,
+            lambda user_target: Task(
                 title=data.get('title'),
                 description=data.get('description', ''),
                 assigned_to=user_target,
                 created_by=request.user,
                 due_date=d_date,
                 priority=data.get('priority', 'media'),
-                status='pendente'
-            )
-            created_ids.append(task.id)
+                status='pendente',
+                notified=True,
+            ),
+            notify=lambda user_target, task: {
+                'type': 'new_task',
+                'title': task.title,
+                'message': f"Nova tarefa atribuída: {task.title}",
+            },
+        )
         
         return JsonResponse({'ids': [str(x) for x in created_ids], 'status': 'success'})
     except Exception as e:
@@ -169,41 +160,24 @@ def api_task_delete(request, pk):
 @login_required
 def api_routines_daily(request):
     """
-    Retorna checklist de rotinas do dia para o usuário.
-    Gera automaticamente os logs do dia se não existirem.
+    Retorna checklist das rotinas do período corrente (dia, semana ou mês,
+    conforme a frequência) para o usuário. Não cria logs: eles são
+    materializados em lote pelo agendador de rotinas.
     """
-    user = request.user
     today = timezone.localtime().date()
-    
-    # Busca todas as rotinas ativas para o usuário
-    routines = Routine.objects.filter(assigned_to=user, active=True)
-    
-    checklist = []
-    
-    # Optimize: Fetch existing logs for today to avoid N+1
-    existing_logs = {log.routine_id: log for log in RoutineLog.objects.filter(routine__in=routines, date=today)}
-    
-    # Identify missing logs and bulk create them
-    missing_routines = [r for r in routines if r.id not in existing_logs]
-    if missing_routines:
-        new_logs = [RoutineLog(routine=r, date=today, completed=False) for r in missing_routines]
-        RoutineLog.objects.bulk_create(new_logs)
-        # Fetch again to get IDs (bulk_create doesn't return IDs on all DBs, but generally safe to re-fetch or use logic)
-        # For simplicity and robust ID access, re-fetching is safer or just use the objects if not needing IDs immediately for JSON?
-        # We need log.id for the frontend checklist.
-        existing_logs = {log.routine_id: log for log in RoutineLog.objects.filter(routine__in=routines, date=today)}
+    ensure_materialized(today)
+    rows = routine_status(today, Routine.objects.filter(assigned_to=request.user))
+
+    checklist = [{
+        'log_id': str(r['log_id']),
+        'routine_id': str(r['id']),
+        'title': r['title'],
+        'description': r['description'],
+        'frequency': r['frequency'],
+        'deadline': r['next_deadline'].isoformat() if r['next_deadline'] else None,
+        'completed': r['completed']
+    } for r in rows if r['log_id']]
 
-    for r in routines:
-        log = existing_logs.get(r.id)
-        if log:
-            checklist.append({
-                'log_id': str(log.id),
-                'routine_id': str(r.id),
-                'title': r.title,
-                'description': r.description,
-                'completed': log.completed
-            })
-        
     return JsonResponse(checklist, safe=False)
 
 @login_required
@@ -216,53 +190,9 @@ def api_routines_overview(request):
         return JsonResponse({'error': 'Acesso negado'}, status=403)
 
     today = timezone.localtime().date()
-    
-    dept_to_filter = request.user.department
-    if request.user.is_administrador():
-        selected_dept_id = request.session.get('selected_department_id')
-        if selected_dept_id:
-            dept_to_filter = selected_dept_id
-        else:
-            dept_to_filter = None
-
-    # Busca todos os analistas do departamento
-    if dept_to_filter:
-        analysts = User.objects.filter(
-            department_id=dept_to_filter if request.user.is_administrador() else dept_to_filter.id,
-            ativo=True,
-            role='analista'
-        ).order_by('first_name')
-    elif request.user.is_administrador():
-        analysts = User.objects.filter(ativo=True, role='analista').order_by('first_name')
-    else:
-        analysts = []
-
-    overview = []
-    
-    for analyst in analysts:
-        # Busca routines do analista
-        routines = Routine.objects.filter(assigned_to=analyst, active=True)
-        analyst_data = {
-            'analyst_name': f"{analyst.first_name} {analyst.last_name}".strip() or analyst.username,
-            'analyst_id': str(analyst.id),
-            'routines': []
-        }
-        
-        for r in routines:
-            # Check log status without creating if easy, but creating ensures consistency
-            log, _ = RoutineLog.objects.get_or_create(
-                routine=r,
-                date=today,
-                defaults={'completed': False}
-            )
-            analyst_data['routines'].append({
-                'title': r.title,
-                'completed': log.completed
-            })
-            
-        overview.append(analyst_data)
-        
-    return JsonResponse(overview, safe=False)
+    ensure_materialized(today)
+    analysts = get_team_analysts(request).order_by('first_name')
+    return JsonResponse(team_routine_overview(today, analysts), safe=False)
 
 @csrf_exempt
 @login_required
@@ -291,21 +221,11 @@ def api_manager_alerts(request):
         
     yesterday = timezone.localtime().date() - timedelta(days=1)
     
-    # Busca logs de ontem que não foram completados
-    # Filtrando por departamento do gestor
-    missed_logs = RoutineLog.objects.filter(
-        date=yesterday,
-        completed=False,
-        routine__assigned_to__department=request.user.department
-    ).select_related('routine', 'routine__assigned_to')
-    
-    alerts = []
-    for log in missed_logs:
-        alerts.append({
-            'analyst': f"{log.routine.assigned_to.first_name} {log.routine.assigned_to.last_name}",
-            'routine': log.routine.title,
-            'date': yesterday.isoformat()
-        })
+    alerts = [{
+        'analyst': f"{r['assigned_to__first_name']} {r['assigned_to__last_name']}",
+        'routine': r['title'],
+        'date': yesterday.isoformat()
+    } for r in missed_routines(yesterday, get_team_analysts(request))]
         
     return JsonResponse(alerts, safe=False)
 
@@ -320,40 +240,37 @@ def api_routine_create(request):
     try:
         data = json.loads(request.body)
         assigned_to_id = data.get('assigned_to_id')
+        frequency = data.get('frequency') or 'diaria'
+        if frequency not in dict(Routine.FREQUENCY_CHOICES):
+            return JsonResponse({'error': 'Frequência inválida.'}, status=400)
         
-        users_to_assign = []
         if assigned_to_id == 'all':
-            dept_to_filter = request.user.department
-            if request.user.is_administrador():
-                selected_dept_id = request.session.get('selected_department_id')
-                if selected_dept_id:
-                    dept_to_filter = selected_dept_id
-                else:
-                    dept_to_filter = None
-            
-            if dept_to_filter:
-                 users_to_assign = User.objects.filter(
-                    department_id=dept_to_filter if request.user.is_administrador() else dept_to_filter.id,
-                    ativo=True,
-                    role='analista'
-                )
-            elif request.user.is_administrador():
-                 users_to_assign = User.objects.filter(ativo=True, role='analista')
+            users_to_assign = get_team_analysts(request)
         else:
             users_to_assign = [get_object_or_404(User, pk=assigned_to_id)]
         
-        created_ids = []
-        for user_target in users_to_assign:
-            routine = Routine.objects.create(
+        created_ids = fan_out(
+            Routine,
+            users_to_assign,
+            lambda user_target: Routine(
                 title=data.get('title'),
                 description=data.get('description', ''),
                 assigned_to=user_target,
                 created_by=request.user,
-                frequency='diaria', # Por enquanto fixo
+                frequency=frequency,
                 time_limit=data.get('time_limit'), # Expects "HH:MM"
-                active=True
-            )
-            created_ids.append(routine.id)
+                active=True,
+                notified=True,
+            ),
+            notify=lambda user_target, routine: {
+                'type': 'new_routine',
+                'title': routine.title,
+                'message': f"Nova rotina atribuída: {routine.title}",
+            },
+        )
+        
+        # Gera já os logs do período corrente das novas rotinas
+        materialize_routine_logs(timezone.localtime().date(), Routine.objects.filter(id__in=created_ids))
         
         return JsonResponse({'ids': [str(x) for x in created_ids], 'status': 'success'})
     except Exception as e:
@@ -368,29 +285,14 @@ def api_notifications_check(request):
     user = request.user
     notifications = []
     
-    # 1. Novas Tarefas
-    new_tasks = Task.objects.filter(assigned_to=user, notified=False)[:50]
-    for t in new_tasks:
-        notifications.append({
-            'type': 'new_task',
-            'title': t.title,
-            'id': t.id,
-            'message': f"Nova tarefa atribuída: {t.title}"
-        })
-        t.notified = True
-        t.save()
-        
-    # 2. Novas Rotinas
-    new_routines = Routine.objects.filter(assigned_to=user, notified=False)[:50]
-    for r in new_routines:
+    # 1-2. Novas tarefas/rotinas/eventos: eventos publicados na criação (fan-out)
+    for event in pop_notification_events(user):
         notifications.append({
-            'type': 'new_routine',
-            'title': r.title,
-            'id': r.id,
-            'message': f"Nova rotina atribuída: {r.title}"
+            'type': event.type,
+            'title': event.title,
+            'id': event.object_id,
+            'message': event.message
         })
-        r.notified = True
-        r.save()
         
     # 3. Alertas de Vencimento de Tarefas (10 min antes)
     now = timezone.now()
@@ -415,36 +317,20 @@ def api_notifications_check(request):
         t.warning_sent = True
         t.save()
 
-    # 4. Alertas de Vencimento de Rotinas (10 min antes do time_limit)
-    today = timezone.localtime().date()
-    timed_routines = Routine.objects.filter(assigned_to=user, active=True, time_limit__isnull=False)
-    
-    # Bulk check logs
-    existing_logs = {log.routine_id: log for log in RoutineLog.objects.filter(routine__in=timed_routines, date=today)}
+    # 4. Alertas de Vencimento de Rotinas (10 min antes do prazo do período)
+    ensure_materialized(timezone.localtime(now).date())
+    warning_logs = list(due_routine_logs(user, now, timedelta(minutes=10)))
     
-    for r in timed_routines:
-        limit_dt = datetime.combine(today, r.time_limit)
-        limit_dt = timezone.make_aware(limit_dt)
-        
-        time_diff = (limit_dt - now).total_seconds()
-        
-        if 0 < time_diff <= 600:
-            log = existing_logs.get(r.id)
-            if not log:
-                # Create if missing (only if within warning window to save DB space? 
-                # Or just create. Better to create to track it.)
-                log = RoutineLog.objects.create(routine=r, date=today, completed=False)
-                existing_logs[r.id] = log
-                
-            if not log.completed and not log.warning_sent:
-                notifications.append({
-                    'type': 'warning_routine',
-                    'title': r.title,
-                    'id': str(r.id),
-                    'message': f"ATENÇÃO: A rotina '{r.title}' deve ser feita até {r.time_limit.strftime('%H:%M')}!"
-                })
-                log.warning_sent = True
-                log.save()
+    for log in warning_logs:
+        r = log.routine
+        notifications.append({
+            'type': 'warning_routine',
+            'title': r.title,
+            'id': str(r.id),
+            'message': f"ATENÇÃO: A rotina '{r.title}' deve ser feita até {r.time_limit.strftime('%H:%M')}!"
+        })
+    if warning_logs:
+        RoutineLog.objects.filter(id__in=[log.id for log in warning_logs]).update(warning_sent=True)
                 
     # 5. Irregularidades em Auditorias de Loja (Apenas Gestores/Admins)
     if user.role in ['gestor', 'administrador']:
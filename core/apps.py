@@ -6,3 +6,8 @@ class CoreConfig(AppConfig):
     name = 'core'
 
 
+
+    def ready(self):
+        # Registra os signals que invalidam os caches (escala, auditorias, desempenho e departamentos)
+        # e o que notifica tarefas/rotinas criadas fora do fan-out
+        from . import auditoria_stats, departments, desempenho_stats, escala, fanout  # noqa: F401
@@ -0,0 +1,360 @@
+"""
+Agregados das auditorias de atendimento (dashboard, ranking e estatísticas).
+
+Tudo o que as três telas mostram sai de uma única query por
+(departamento, período): as auditorias agrupadas por analista, com contagens
+condicionais por classificação e alertas. Os totais do departamento, o top 3,
+o ranking e os números de cada analista são derivados dessas linhas em Python.
+
+O resultado fica em cache com a chave (departamento, período, versão). A
+versão é incrementada a cada save/delete de AuditoriaAtendimento (signals),
+então uma auditoria nova aparece na próxima leitura sem apagar chaves. Ela
+fica no banco (core/cache_versions.py): nos outros workers a auditoria
+aparece em no máximo VERSION_CHECK_SECONDS.
+
+As falhas por critério ficam consolidadas por analista e semana em
+AuditoriaCriterioSemanal. A cada save/delete só as semanas afetadas são
+recalculadas (uma query de agregação condicional), então o relatório de
+critérios lê poucas linhas mesmo com anos de histórico. O recálculo trava as
+linhas das semanas (select_for_update): saves concorrentes na mesma semana
+recalculam um depois do outro, e nenhum grava um total antigo por cima.
+"""
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, IntegerField, Q, Sum, When
+from django.db.models.functions import TruncWeek
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from . import cache_versions
+from .models import AuditoriaAtendimento, AuditoriaCriterioSemanal
+
+CLASSIFICACOES = ('excelente', 'bom', 'regular', 'insatisfatorio')
+CRITERIOS = (
+    'apresentou_corretamente',
+    'analisou_historico',
+    'entendeu_solicitacao',
+    'informacao_clara',
+    'acordo_espera',
+    'atendimento_respeitoso',
+    'portugues_correto',
+    'finalizacao_correta',
+    'procedimento_correto',
+)
+FALHA_FIELDS = tuple(f'falha_{c}' for c in CRITERIOS)
+STATS_CACHE_TIMEOUT = 60 * 10
+STATS_VERSION = 'auditoria'
+
+
+# ========================================
+# VERSÃO (invalidação do cache)
+# ========================================
+
+def get_stats_version():
+    return cache_versions.get_version(STATS_VERSION)
+
+
+def bump_stats_version(**kwargs):
+    """Invalida todos os agregados em cache, em todos os workers (usado também como receiver de signals)"""
+    cache_versions.bump(STATS_VERSION)
+
+
+post_save.connect(bump_stats_version, sender=AuditoriaAtendimento, dispatch_uid='auditoria_stats_save')
+post_delete.connect(bump_stats_version, sender=AuditoriaAtendimento, dispatch_uid='auditoria_stats_delete')
+
+
+# ========================================
+# AGREGADOS
+# ========================================
+
+def _nome(row):
+    return f"{row['first_name']} {row['last_name']}".strip() or row['username']
+
+
+def _analista_rows(department_id, data_inicio, data_fim):
+    """A única query: uma linha por analista com todas as contagens do período"""
+    queryset = AuditoriaAtendimento.objects.filter(department_id=department_id)
+    if data_inicio:
+        queryset = queryset.filter(data_atendimento__gte=data_inicio)
+    if data_fim:
+        queryset = queryset.filter(data_atendimento__lte=data_fim)
+
+    rows = queryset.order_by().values(
+        'analista_auditado_id',
+        'analista_auditado__username',
+        'analista_auditado__first_name',
+        'analista_auditado__last_name',
+    ).annotate(
+        total=Count('id'),
+        soma_nota=Sum('nota'),
+        soma_pontuacao=Sum('pontuacao'),
+        alertas=Count('id', filter=Q(requer_acao=True)),
+        **{c: Count('id', filter=Q(classificacao=c)) for c in CLASSIFICACOES},
+    )
+
+    analistas = {}
+    for row in rows:
+        total = row['total']
+        analistas[row['analista_auditado_id']] = {
+            'id': row['analista_auditado_id'],
+            'username': row['analista_auditado__username'],
+            'first_name': row['analista_auditado__first_name'],
+            'last_name': row['analista_auditado__last_name'],
+            'total': total,
+            'soma_nota': float(row['soma_nota'] or 0),
+            'nota_media': float(row['soma_nota'] or 0) / total,
+            'pontuacao_media': (row['soma_pontuacao'] or 0) / total,
+            'alertas': row['alertas'],
+            'distribuicao': {c: row[c] for c in CLASSIFICACOES},
+        }
+    return analistas
+
+
+def audit_stats(department_id, data_inicio=None, data_fim=None):
+    """
+    Agregados por analista do departamento no período (datas inclusivas, None
+    = sem limite). Retorna {analista_id: {...}}; lido do cache quando possível.
+    """
+    key = f'auditoria:stats:{department_id}:{data_inicio or "-"}:{data_fim or "-"}:v{get_stats_version()}'
+    analistas = cache.get(key)
+    if analistas is None:
+        analistas = _analista_rows(department_id, data_inicio, data_fim)
+        cache.set(key, analistas, STATS_CACHE_TIMEOUT)
+    return analistas
+
+
+def dashboard_summary(analistas):
+    """Totais do departamento (ou de um subconjunto de analistas) a partir das linhas"""
+    rows = list(analistas.values())
+    total = sum(r['total'] for r in rows)
+    soma_nota = sum(r['soma_nota'] for r in rows)
+    top_3 = sorted(rows, key=lambda r: (-r['nota_media'], _nome(r)))[:3]
+    return {
+        'total_auditorias': total,
+        'nota_media_geral': round(soma_nota / total, 2) if total else 0,
+        'distribuicao': {c: sum(r['distribuicao'][c] for r in rows) for c in CLASSIFICACOES},
+        'total_alertas': sum(r['alertas'] for r in rows),
+        'analistas_com_alertas': [
+            {'id': str(r['id']), 'username': r['username']} for r in rows if r['alertas']
+        ],
+        'top_3': [
+            {
+                'id': str(r['id']),
+                'username': r['username'],
+                'nome': _nome(r),
+                'nota_media': round(r['nota_media'], 2),
+            }
+            for r in top_3
+        ],
+    }
+
+
+def ranking(analistas):
+    """Ranking por nota média, com a classificação predominante de cada analista"""
+    rows = sorted(analistas.values(), key=lambda r: (-r['nota_media'], _nome(r)))
+    data = []
+    for idx, r in enumerate(rows, 1):
+        # Empate entre classificações fica com a melhor
+        predominante = max(CLASSIFICACOES, key=lambda c: r['distribuicao'][c])
+        data.append({
+            'posicao': idx,
+            'analista_id': str(r['id']),
+            'analista_username': r['username'],
+            'analista_nome': _nome(r),
+            'total_auditorias': r['total'],
+            'nota_media': round(r['nota_media'], 2),
+            'pontuacao_media': round(r['pontuacao_media'], 1),
+            'classificacao_predominante': predominante,
+        })
+    return data
+
+
+def ultima_auditoria(department_id, analista_id):
+    """Auditoria mais recente do analista (em cache com a mesma versão dos agregados)"""
+    key = f'auditoria:ultima:{department_id}:{analista_id}:v{get_stats_version()}'
+    ultima = cache.get(key)
+    if ultima is None:
+        ultima = AuditoriaAtendimento.objects.filter(
+            department_id=department_id, analista_auditado_id=analista_id,
+        ).order_by('-created_at', '-id').only('id', 'created_at', 'nota', 'classificacao').first() or False
+        cache.set(key, ultima, STATS_CACHE_TIMEOUT)
+    return ultima or None
+
+
+# ========================================
+# CONSOLIDAÇÃO SEMANAL DOS CRITÉRIOS
+# ========================================
+
+def week_start(day):
+    """Segunda-feira da semana de day"""
+    return day - timedelta(days=day.weekday())
+
+
+def criterios_por_semana(queryset):
+    """
+    Falhas por critério agrupadas por (departamento, analista, semana), em uma
+    única query com Sum(Case(...)) para cada critério.
+    """
+    falhas = {
+        f'falha_{c}': Sum(Case(When(**{c: False}, then=1), default=0, output_field=IntegerField()))
+        for c in CRITERIOS
+    }
+    return queryset.order_by().annotate(
+        semana=TruncWeek('data_atendimento'),
+    ).values('department_id', 'analista_auditado_id', 'semana').annotate(total=Count('id'), **falhas)
+
+
+def refresh_criterios_semanal(buckets):
+    """
+    Recalcula as semanas (department_id, analista_id, segunda-feira) informadas.
+
+    Em uma transação: cria zeradas as linhas que ainda não existem e trava
+    todas (na mesma ordem, sem deadlock entre dois recálculos) antes de
+    agregar. Um save concorrente na mesma semana espera a trava e agrega
+    depois do commit deste, já contando a auditoria dele.
+    """
+    buckets = set(buckets)
+    if not buckets:
+        return
+
+    chaves = reduce(or_, (
+        Q(department_id=dep, analista_id=analista, semana=semana) for dep, analista, semana in sorted(buckets)
+    ))
+    filtro = reduce(or_, (
+        Q(department_id=dep, analista_auditado_id=analista,
+          data_atendimento__gte=semana, data_atendimento__lt=semana + timedelta(days=7))
+        for dep, analista, semana in buckets
+    ))
+    with transaction.atomic():
+        AuditoriaCriterioSemanal.objects.bulk_create(
+            [
+                AuditoriaCriterioSemanal(department_id=dep, analista_id=analista, semana=semana)
+                for dep, analista, semana in sorted(buckets)
+            ],
+            ignore_conflicts=True,
+        )
+        list(AuditoriaCriterioSemanal.objects.filter(chaves).order_by(
+            'department_id', 'analista_id', 'semana',
+        ).select_for_update().values_list('id', flat=True))
+
+        rows = [
+            AuditoriaCriterioSemanal(
+                department_id=row['department_id'],
+                analista_id=row['analista_auditado_id'],
+                semana=row['semana'],
+                total=row['total'],
+                **{f: row[f] for f in FALHA_FIELDS},
+            )
+            for row in criterios_por_semana(AuditoriaAtendimento.objects.filter(filtro))
+        ]
+        AuditoriaCriterioSemanal.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['department', 'analista', 'semana'],
+            update_fields=['total', *FALHA_FIELDS, 'updated_at'],
+        )
+
+        # Semanas sem auditorias (exclusão, mudança de data/analista): inclui as criadas zeradas acima
+        vazias = buckets - {(r.department_id, r.analista_id, r.semana) for r in rows}
+        if vazias:
+            AuditoriaCriterioSemanal.objects.filter(reduce(or_, (
+                Q(department_id=dep, analista_id=analista, semana=semana) for dep, analista, semana in vazias
+            ))).delete()
+
+
+def _bucket(auditoria):
+    # As views atribuem data e ids como vieram do JSON (strings)
+    data = AuditoriaAtendimento._meta.get_field('data_atendimento').to_python(auditoria.data_atendimento)
+    return (int(auditoria.department_id), int(auditoria.analista_auditado_id), week_start(data))
+
+
+def _remember_old_bucket(sender, instance, raw=False, **kwargs):
+    """Guarda a semana anterior: edição pode mudar data, analista ou departamento"""
+    instance._criterios_bucket_antigo = None
+    if raw or instance.pk is None:
+        return
+    old = AuditoriaAtendimento.objects.filter(pk=instance.pk).values(
+        'department_id', 'analista_auditado_id', 'data_atendimento',
+    ).first()
+    if old:
+        instance._criterios_bucket_antigo = (
+            old['department_id'], old['analista_auditado_id'], week_start(old['data_atendimento']),
+        )
+
+
+def _refresh_after_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    buckets = {_bucket(instance)}
+    old = getattr(instance, '_criterios_bucket_antigo', None)
+    if old:
+        buckets.add(old)
+    refresh_criterios_semanal(buckets)
+
+
+def _refresh_after_delete(sender, instance, **kwargs):
+    refresh_criterios_semanal({_bucket(instance)})
+
+
+pre_save.connect(_remember_old_bucket, sender=AuditoriaAtendimento, dispatch_uid='auditoria_criterios_pre_save')
+post_save.connect(_refresh_after_save, sender=AuditoriaAtendimento, dispatch_uid='auditoria_criterios_save')
+post_delete.connect(_refresh_after_delete, sender=AuditoriaAtendimento, dispatch_uid='auditoria_criterios_delete')
+
+
+def criterios_report(department_id, inicio, fim, analista_id=None):
+    """
+    Taxa de falha por critério x analista x semana, lida da consolidação.
+    inicio/fim são datas; o período é alinhado às semanas (segunda-feira).
+    """
+    inicio = week_start(inicio)
+    queryset = AuditoriaCriterioSemanal.objects.filter(
+        department_id=department_id, semana__gte=inicio, semana__lte=fim,
+    )
+    if analista_id:
+        queryset = queryset.filter(analista_id=analista_id)
+    rows = queryset.order_by('semana').values(
+        'analista_id', 'analista__username', 'analista__first_name', 'analista__last_name',
+        'semana', 'total', *FALHA_FIELDS,
+    )
+
+    def taxas(total, falhas):
+        return {c: round(100 * falhas[c] / total, 1) if total else 0 for c in CRITERIOS}
+
+    equipe = {'total': 0, 'falhas': dict.fromkeys(CRITERIOS, 0)}
+    analistas = {}
+    for row in rows:
+        falhas = {c: row[f'falha_{c}'] for c in CRITERIOS}
+        analista = analistas.setdefault(row['analista_id'], {
+            'id': str(row['analista_id']),
+            'nome': f"{row['analista__first_name']} {row['analista__last_name']}".strip() or row['analista__username'],
+            'total': 0,
+            'falhas': dict.fromkeys(CRITERIOS, 0),
+            'semanas': [],
+        })
+        analista['semanas'].append({
+            'semana': row['semana'].isoformat(),
+            'total': row['total'],
+            'falhas': falhas,
+            'taxas': taxas(row['total'], falhas),
+        })
+        for acumulado in (analista, equipe):
+            acumulado['total'] += row['total']
+            for c in CRITERIOS:
+                acumulado['falhas'][c] += falhas[c]
+
+    for acumulado in (equipe, *analistas.values()):
+        acumulado['taxas'] = taxas(acumulado['total'], acumulado['falhas'])
+        pior = max(CRITERIOS, key=lambda c: acumulado['falhas'][c])
+        acumulado['pior_criterio'] = pior if acumulado['falhas'][pior] else None
+
+    return {
+        'periodo': {'inicio': inicio.isoformat(), 'fim': fim.isoformat()},
+        'criterios': [
+            {'key': c, 'label': str(AuditoriaAtendimento._meta.get_field(c).verbose_name)} for c in CRITERIOS
+        ],
+        'equipe': equipe,
+        'analistas': sorted(analistas.values(), key=lambda a: a['nome']),
+    }
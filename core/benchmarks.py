@@ -0,0 +1,645 @@
+"""
+Benchmarks das telas e APIs principais com volume sintético reprodutível.
+
+seed() gera os dados com semente fixa (mesmos dados a cada execução, com as
+datas relativas a hoje); volumes com scale=1:
+- 3 departamentos, 50 analistas, 1 gestor por departamento e 1 administrador
+  (o departamento do NRS se chama "NRS Suporte" se o banco ainda não tiver
+  um, para as telas de KPIs encontrarem o departamento)
+- 1.000 lojas com atribuições para os analistas do NRS
+- 200.000 reclamações, 100.000 auditorias de lojas (3 itens cada, com
+  pendências) e 50.000 estornos
+- 20.000 auditorias de atendimento, 12 meses de KPIs por analista, 500
+  colaboradores do RH, 5.000 tarefas, 500 rotinas, 2.000 folgas manuais e
+  2.000 eventos do calendário
+- 10 quadros Kanban (6 listas x 50 cartões) e a escala 6x2 dos analistas
+
+scale multiplica todos os volumes, inclusive os cartões por lista. Os
+registros ligados a uma entidade (loja, analista, usuário, departamento)
+são sorteados com _pick(): a primeira recebe HOT_SHARE deles além da sua
+parte no sorteio, então o volume por entidade também cresce com scale. Os
+endpoints por id (check_query_budget) usam essas primeiras entidades, e uma
+query por item (N+1) aparece como número de queries que cresce com scale.
+
+Todos os registros levam o prefixo "bench"/"BENCH" e cleanup() remove só eles.
+run_suite() chama as URLs de BENCHMARKS pelo test client (com middleware,
+sessão e templates, como em produção) e mede p50/p95, queries (com as
+repetições do QueryInspector) e pico de memória. Usado pelos comandos
+seed_benchmark_data e run_benchmarks. Não rode em produção.
+"""
+import logging
+import random
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, time as dt_time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from .auditoria_stats import CRITERIOS, FALHA_FIELDS, criterios_por_semana
+from .departments import NRS_NAME
+from .models import (
+    AnalistaEscala, AnalystAssignment, AuditoriaAtendimento, AuditoriaCriterioSemanal, BoardMembership,
+    Cargo, CardLabel, Colaborador, Complaint, Department, Evento, FolgaManual, HistoricoProfissional,
+    IndicadorDesempenho, KanbanBoard, KanbanCard, KanbanList, MetaMensalGlobal, RefundRequest, Routine,
+    Store, StoreAudit, StoreAuditIssue, StoreAuditItem, Task, Turno, User,
+)
+from .query_inspector import QueryInspector
+from .request_metrics import percentile
+
+BENCH_SLUG = 'bench-'
+BENCH_USER = 'bench_'
+BENCH_CODE = 'BENCH'
+BENCH_NAME = 'Bench '
+BATCH_SIZE = 5000
+QUIET_LOGGERS = ('core.request_metrics', 'core.query_inspector', 'django.request')
+
+DEPARTMENTS = [
+    ('Bench Reclame Aqui', 'bench-ra'),
+    ('Bench NRS', 'bench-nrs'),
+    ('Bench SAC', 'bench-sac'),
+]
+
+# Volumes com scale=1
+VOLUMES = {
+    'analistas': 50,
+    'lojas': 1000,
+    'reclamacoes': 200000,
+    'auditorias_lojas': 100000,
+    'estornos': 50000,
+    'auditorias_atendimento': 20000,
+    'colaboradores': 500,
+    'tarefas': 5000,
+    'rotinas': 500,
+    'folgas_manuais': 2000,
+    'eventos': 2000,
+    'quadros': 10,
+    'cartoes_por_lista': 50,
+}
+LISTS_PER_BOARD = 6
+ITEMS_PER_STORE_AUDIT = 3
+KPI_MONTHS = 12
+# Parte dos registros de cada tipo que vai para a primeira entidade (ver _pick)
+HOT_SHARE = 0.05
+
+# (nome, url, usuário, iterações) - a url aceita {board_id} e {store_id}; iterações None usa o padrão
+BENCHMARKS = [
+    ('dashboard', '/', 'admin', None),
+    ('complaint_list', '/complaints/', 'admin', None),
+    ('complaint_list_busca', '/complaints/?search=Silva', 'admin', None),
+    ('verificacao_lojas', '/verificacao-lojas/', 'admin', None),
+    ('analysts_overview', '/api/store-verification/analyst/overview/', 'gestor', None),
+    ('kanban_board_detail', '/api/kanban/boards/{board_id}/', 'admin', None),
+    ('escala_schedule', '/api/escala/schedule/?meses=3', 'admin', None),
+    ('auditoria_dashboard', '/api/auditoria/dashboard/', 'admin', None),
+    ('kpis_list', '/api/desempenho/kpis/', 'admin', None),
+    ('rh_colaboradores', '/api/rh/colaboradores/', 'admin', None),
+    ('store_audit_history', '/api/stores/{store_id}/history/', 'admin', None),
+    ('refund_list', '/api/refunds/list/', 'admin', None),
+    ('refund_list_busca', '/api/refunds/list/?search=Cliente 12', 'admin', None),
+    ('refund_list_cpf', '/api/refunds/list/?search=123.4', 'admin', None),
+    ('export_complaints_csv', '/export/complaints/csv/', 'admin', 3),
+    ('export_complaints_xlsx', '/export/complaints/xlsx/', 'admin', 1),
+    ('export_stores_csv', '/export/stores/csv/', 'admin', 3),
+]
+
+FIRST_NAMES = ['Ana', 'Bruno', 'Carla', 'Diego', 'Elisa', 'Fábio', 'Gabriela', 'Hugo', 'Isabela', 'João']
+LAST_NAMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Costa', 'Ferreira', 'Rodrigues', 'Almeida', 'Lima', 'Gomes']
+CITIES = [('São Paulo', 'SP'), ('Campinas', 'SP'), ('Curitiba', 'PR'), ('Belo Horizonte', 'MG'), ('Recife', 'PE')]
+
+
+def volumes(scale=1.0):
+    vol = {key: max(1, round(value * scale)) for key, value in VOLUMES.items()}
+    # Pelo menos um analista por departamento
+    vol['analistas'] = max(vol['analistas'], len(DEPARTMENTS))
+    return vol
+
+
+def is_seeded():
+    return Department.objects.filter(slug__startswith=BENCH_SLUG).exists()
+
+
+@contextmanager
+def manual_timestamps(*fields):
+    """Permite gravar created_at do passado (auto_now_add sobrescreveria no bulk_create)"""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def _cpf(rng):
+    digits = f'{rng.randrange(10 ** 11):011d}'
+    return f'{digits[:3]}.{digits[3:6]}.{digits[6:9]}-{digits[9:]}'
+
+
+def _past(rng, now, days):
+    return now - timedelta(days=rng.randrange(days), seconds=rng.randrange(86400))
+
+
+def _pick(rng, items):
+    """Como rng.choice, mas items[0] recebe HOT_SHARE dos sorteios a mais"""
+    return items[0] if rng.random() < HOT_SHARE else rng.choice(items)
+
+
+def _bulk(model, objects):
+    model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+
+
+def seed(scale=1.0, seed=42, log=print):
+    """Gera os dados sintéticos. Retorna os volumes gerados"""
+    rng = random.Random(seed)
+    vol = volumes(scale)
+    now = timezone.now()
+    today = timezone.localdate()
+
+    # As telas de KPIs acham o NRS pelo nome; não duplica um NRS Suporte que já exista
+    names = {'bench-nrs': NRS_NAME} if not Department.objects.filter(name=NRS_NAME).exists() else {}
+
+    with transaction.atomic():
+        departments = [Department.objects.create(name=names.get(slug, name), slug=slug) for name, slug in DEPARTMENTS]
+        dept_ra, dept_nrs, dept_sac = departments
+
+        # Uma senha para todos: make_password é lento de propósito
+        password = make_password('bench123')
+        users = [User(username='bench_admin', first_name='Bench', last_name='Admin', role='administrador',
+                      department=dept_ra, password=password)]
+        users += [User(username=f'bench_gestor_{d.slug[6:]}', first_name='Gestor', last_name=d.name,
+                       role='gestor', department=d, password=password) for d in departments]
+        users += [User(username=f'bench_analista_{i:03d}', first_name=rng.choice(FIRST_NAMES),
+                       last_name=rng.choice(LAST_NAMES), role='analista', department=departments[i % 3],
+                       password=password) for i in range(vol['analistas'])]
+        _bulk(User, users)
+        analistas = list(User.objects.filter(username__startswith='bench_analista_').order_by('username'))
+        by_dept = {d.id: [u for u in analistas if u.department_id == d.id] for d in departments}
+        admin = User.objects.get(username='bench_admin')
+        gestores = {u.department_id: u for u in User.objects.filter(username__startswith='bench_gestor_')}
+        log(f"{len(users)} usuários")
+
+        stores = []
+        for i in range(vol['lojas']):
+            city, state = rng.choice(CITIES)
+            stores.append(Store(code=f'{BENCH_CODE}{i:04d}', city=city, state=state, address=f'Rua {i}',
+                                active=rng.random() > 0.05,
+                                last_audit_result=rng.choice(['pending', 'conforme', 'irregular'])))
+        _bulk(Store, stores)
+        stores = list(Store.objects.filter(code__startswith=BENCH_CODE).order_by('code').only('id', 'code'))
+        nrs = by_dept[dept_nrs.id]
+        _bulk(AnalystAssignment, [
+            AnalystAssignment(analyst=nrs[i % len(nrs)], store=store) for i, store in enumerate(stores)
+        ])
+        log(f"{len(stores)} lojas")
+
+        statuses = [s for s, _ in Complaint.STATUS_CHOICES]
+        tipos = [t for t, _ in Complaint.TIPO_RECLAMACAO_CHOICES]
+        origens = [o for o, _ in Complaint.ORIGEM_CHOICES]
+        complaint_depts = [dept_ra] * 7 + [dept_sac] * 3
+        with manual_timestamps(Complaint._meta.get_field('created_at')):
+            batch = []
+            for i in range(vol['reclamacoes']):
+                dept = rng.choice(complaint_depts)
+                created = _past(rng, now, 730)
+                batch.append(Complaint(
+                    department=dept, id_ra=f'{BENCH_CODE}-{i}', cpf_cliente=_cpf(rng),
+                    nome_cliente=rng.choice(FIRST_NAMES), sobrenome=rng.choice(LAST_NAMES),
+                    email_cliente=f'cliente{i}@example.com', telefone='11999999999',
+                    loja_cod=_pick(rng, stores).code, origem_contato=rng.choice(origens),
+                    descricao='benchmark', status=rng.choice(statuses),
+                    analista=_pick(rng, by_dept[dept.id]), data_reclamacao=created.date(),
+                    tipo_reclamacao=rng.choice(tipos), nota_satisfacao=rng.choice([None, *range(11)]),
+                    created_at=created,
+                ))
+                if len(batch) == BATCH_SIZE:
+                    _bulk(Complaint, batch)
+                    batch = []
+            _bulk(Complaint, batch)
+        log(f"{vol['reclamacoes']} reclamações")
+
+        with manual_timestamps(StoreAudit._meta.get_field('created_at')):
+            batch = []
+            for _ in range(vol['auditorias_lojas']):
+                batch.append(StoreAudit(analyst=_pick(rng, nrs), store=_pick(rng, stores),
+                                        created_at=_past(rng, now, 365)))
+                if len(batch) == BATCH_SIZE:
+                    _bulk(StoreAudit, batch)
+                    batch = []
+            _bulk(StoreAudit, batch)
+        seed_store_audit_items(rng, [admin, *gestores.values()])
+        log(f"{vol['auditorias_lojas']} auditorias de lojas")
+
+        refund_statuses = ['aberta', 'em_analise', 'concluida']
+        batch = []
+        for i in range(vol['estornos']):
+            batch.append(RefundRequest(
+                analyst=rng.choice(nrs), store_code=BENCH_CODE, customer_name=f'Cliente {i}',
+                customer_cpf=_cpf(rng), customer_email=f'cliente{i}@example.com',
+                customer_phone='11999999999', incident_date=today - timedelta(days=i % 365),
+                purchase_location='loja_fisica', reason='benchmark',
+                refund_value=Decimal(rng.randrange(100, 100000)) / 100, refund_type='pix',
+                summary='benchmark', status=rng.choice(refund_statuses),
+            ))
+            if len(batch) == BATCH_SIZE:
+                _bulk(RefundRequest, batch)
+                batch = []
+        _bulk(RefundRequest, batch)
+        log(f"{vol['estornos']} estornos")
+
+        seed_auditorias(rng, vol['auditorias_atendimento'], now, departments, by_dept, gestores)
+        log(f"{vol['auditorias_atendimento']} auditorias de atendimento")
+
+        seed_kpis(rng, today, departments, by_dept)
+        log(f"{KPI_MONTHS} meses de KPIs")
+
+        seed_rh(rng, vol['colaboradores'], today, departments)
+        log(f"{vol['colaboradores']} colaboradores")
+
+        seed_tarefas(rng, vol['tarefas'], vol['rotinas'], now, [admin, *analistas], list(gestores.values()))
+        log(f"{vol['tarefas']} tarefas e {vol['rotinas']} rotinas")
+
+        seed_eventos(rng, vol['eventos'], now, departments, [admin, *gestores.values()])
+        log(f"{vol['eventos']} eventos")
+
+        seed_kanban(rng, vol['quadros'], vol['cartoes_por_lista'], analistas)
+        log(f"{vol['quadros']} quadros Kanban")
+
+        seed_escala(rng, analistas, today, vol['folgas_manuais'])
+        log(f"{len(analistas)} analistas na escala 6x2, {vol['folgas_manuais']} folgas manuais")
+    return vol
+
+
+def seed_store_audit_items(rng, resolvers):
+    """Itens das auditorias de lojas; cada item irregular abre uma pendência da loja (metade resolvida)"""
+    item_names = [name for name, _ in StoreAuditItem.ITEM_CHOICES]
+    audits = list(StoreAudit.objects.filter(store__code__startswith=BENCH_CODE).order_by('id')
+                  .values_list('id', 'store_id', 'created_at'))
+    for start in range(0, len(audits), BATCH_SIZE):
+        items, issues = [], []
+        for audit_id, store_id, created in audits[start:start + BATCH_SIZE]:
+            for name in rng.sample(item_names, ITEMS_PER_STORE_AUDIT):
+                item = StoreAuditItem(audit_id=audit_id, item_name=name, is_compliant=rng.random() > 0.1)
+                if not item.is_compliant:
+                    item.description = 'benchmark'
+                    if rng.random() < 0.5:
+                        item.issue = StoreAuditIssue(store_id=store_id, status='resolvida', gestor_notes='benchmark',
+                                                     resolved_by=rng.choice(resolvers),
+                                                     resolved_at=created + timedelta(days=2))
+                    else:
+                        item.issue = StoreAuditIssue(store_id=store_id)
+                    issues.append(item.issue)
+                items.append(item)
+        # bulk_create preenche o pk das pendências, usado pelo FK dos itens
+        _bulk(StoreAuditIssue, issues)
+        _bulk(StoreAuditItem, items)
+
+
+def seed_auditorias(rng, total, now, departments, by_dept, gestores):
+    """Auditorias de atendimento (pontuação calculada como no save) e a consolidação semanal dos critérios"""
+    tipos = [t for t, _ in AuditoriaAtendimento.TIPO_ATENDIMENTO_CHOICES]
+    with manual_timestamps(AuditoriaAtendimento._meta.get_field('created_at')):
+        batch = []
+        for i in range(total):
+            dept = _pick(rng, departments)
+            created = _past(rng, now, 365)
+            auditoria = AuditoriaAtendimento(
+                data_atendimento=timezone.localdate(created), id_conversa=f'{BENCH_CODE}-{i}',
+                tipo_atendimento=rng.choice(tipos), analista_auditado=_pick(rng, by_dept[dept.id]),
+                auditor=gestores[dept.id], department=dept, created_at=created,
+                **{criterio: rng.random() > 0.15 for criterio in CRITERIOS},
+            )
+            # bulk_create não chama save(): mesmos cálculos, sem a consulta da configuração
+            auditoria.pontuacao = auditoria.calcular_pontuacao()
+            auditoria.nota = auditoria.calcular_nota(auditoria.pontuacao)
+            auditoria.classificacao = auditoria.calcular_classificacao(auditoria.pontuacao)
+            auditoria.requer_acao = auditoria.nota < 7
+            batch.append(auditoria)
+            if len(batch) == BATCH_SIZE:
+                _bulk(AuditoriaAtendimento, batch)
+                batch = []
+        _bulk(AuditoriaAtendimento, batch)
+
+    # Sem signals no bulk_create: a consolidação é montada de uma vez
+    rows = criterios_por_semana(AuditoriaAtendimento.objects.filter(id_conversa__startswith=f'{BENCH_CODE}-'))
+    _bulk(AuditoriaCriterioSemanal, [
+        AuditoriaCriterioSemanal(department_id=row['department_id'], analista_id=row['analista_auditado_id'],
+                                 semana=row['semana'], total=row['total'], **{f: row[f] for f in FALHA_FIELDS})
+        for row in rows
+    ])
+
+
+def seed_kpis(rng, today, departments, by_dept):
+    """KPIs mensais de cada analista e metas globais de cada departamento nos últimos KPI_MONTHS meses"""
+    months = []
+    mes, ano = today.month, today.year
+    for _ in range(KPI_MONTHS):
+        months.append((mes, ano))
+        mes, ano = (mes - 1, ano) if mes > 1 else (12, ano - 1)
+
+    _bulk(MetaMensalGlobal, [
+        MetaMensalGlobal(mes=mes, ano=ano, department=dept, meta_tme=60, meta_nps=Decimal('8.50'), meta_chats=400)
+        for dept in departments for mes, ano in months
+    ])
+    _bulk(IndicadorDesempenho, [
+        IndicadorDesempenho(analista=analista, department=dept, mes=mes, ano=ano,
+                            nps=Decimal(rng.randrange(600, 1000)) / 100, tme=rng.randrange(20, 120),
+                            chats=rng.randrange(200, 600))
+        for dept in departments for analista in by_dept[dept.id] for mes, ano in months
+    ])
+
+
+def seed_rh(rng, total, today, departments):
+    """Cargos, colaboradores do RH (CPF "BENCH" + número) e o histórico profissional de cada um"""
+    cargos = ['Analista', 'Coordenador', 'Gestor']
+    _bulk(Cargo, [
+        Cargo(nome=f'{BENCH_NAME}{nome}', department=dept, salario_base=Decimal(3000 + 2000 * i))
+        for dept in departments for i, nome in enumerate(cargos)
+    ])
+    _bulk(Colaborador, [
+        Colaborador(
+            nome_completo=f'{BENCH_NAME}{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}',
+            cpf=f'{BENCH_CODE}{i:09d}', data_nascimento=today - timedelta(days=rng.randrange(7000, 18000)),
+            data_admissao=today - timedelta(days=rng.randrange(30, 3650)), cargo_atual=rng.choice(cargos),
+            department=_pick(rng, departments), salario_atual=Decimal(rng.randrange(3000, 12000)),
+            status=rng.choice(['ativo'] * 8 + ['ferias', 'afastado']),
+        )
+        for i in range(total)
+    ])
+    historico = []
+    for colaborador_id, admissao, cargo in (Colaborador.objects.filter(cpf__startswith=BENCH_CODE)
+                                            .order_by('id').values_list('id', 'data_admissao', 'cargo_atual')):
+        historico.append(HistoricoProfissional(colaborador_id=colaborador_id, data_evento=admissao,
+                                               tipo_evento='admissao', cargo_novo=cargo))
+        if rng.random() < 0.3:
+            historico.append(HistoricoProfissional(colaborador_id=colaborador_id, data_evento=today,
+                                                   tipo_evento='promocao', cargo_anterior=cargo, cargo_novo=cargo))
+    _bulk(HistoricoProfissional, historico)
+
+
+def seed_tarefas(rng, tarefas, rotinas, now, users, creators):
+    """Tarefas e rotinas; users[0] (o administrador) é o usuário com mais itens"""
+    prioridades = [p for p, _ in Task.PRIORIDADE_CHOICES]
+    batch = []
+    for i in range(tarefas):
+        status = rng.choice(['pendente', 'pendente', 'concluida', 'atrasada'])
+        batch.append(Task(
+            title=f'{BENCH_NAME}Tarefa {i}', description='benchmark', assigned_to=_pick(rng, users),
+            created_by=rng.choice(creators), due_date=now + timedelta(days=rng.randrange(-30, 30)),
+            priority=rng.choice(prioridades), status=status, notified=True,
+            completed_at=now if status == 'concluida' else None,
+        ))
+    _bulk(Task, batch)
+
+    frequencias = [f for f, _ in Routine.FREQUENCY_CHOICES]
+    _bulk(Routine, [
+        Routine(title=f'{BENCH_NAME}Rotina {i}', description='benchmark', assigned_to=_pick(rng, users),
+                created_by=rng.choice(creators), frequency=rng.choice(frequencias), notified=True,
+                time_limit=rng.choice([None, dt_time(12, 0), dt_time(18, 0)]))
+        for i in range(rotinas)
+    ])
+
+
+def seed_eventos(rng, total, now, departments, users):
+    """Eventos do calendário de 60 dias atrás a 60 dias à frente"""
+    tipos = [t for t, _ in Evento.TIPO_CHOICES]
+    _bulk(Evento, [
+        Evento(titulo=f'{BENCH_NAME}Evento {i}', data_inicio=now + timedelta(days=rng.randrange(-60, 60)),
+               horario=f'{rng.randrange(8, 19):02d}:00', tipo=rng.choice(tipos),
+               codigo_loja=f'{BENCH_CODE}{rng.randrange(1000):04d}', department=_pick(rng, departments),
+               usuario=rng.choice(users))
+        for i in range(total)
+    ])
+
+
+def seed_kanban(rng, boards, cards_per_list, users):
+    created = [KanbanBoard(name=f'{BENCH_NAME}Quadro {i}', owner=rng.choice(users)) for i in range(boards)]
+    _bulk(KanbanBoard, created)
+    created = list(KanbanBoard.objects.filter(name__startswith=BENCH_NAME).order_by('id'))
+
+    _bulk(BoardMembership, [
+        BoardMembership(board=board, user=user)
+        for board in created for user in rng.sample(users, min(10, len(users)))
+        if user.id != board.owner_id
+    ])
+    _bulk(CardLabel, [
+        CardLabel(board=board, name=f'Etiqueta {j}', color=color)
+        for board in created for j, color in enumerate(['#61bd4f', '#f2d600', '#ff9f1a', '#eb5a46', '#c377e0', '#0079bf'])
+    ])
+    _bulk(KanbanList, [
+        KanbanList(board=board, name=f'Lista {j}', position=j)
+        for board in created for j in range(LISTS_PER_BOARD)
+    ])
+    lists = list(KanbanList.objects.filter(board__in=created).order_by('id'))
+    _bulk(KanbanCard, [
+        KanbanCard(list=lst, title=f'Cartão {k}', description='benchmark', position=k, created_by=rng.choice(users))
+        for lst in lists for k in range(cards_per_list)
+    ])
+
+    labels = {}
+    for label in CardLabel.objects.filter(board__in=created).order_by('id'):
+        labels.setdefault(label.board_id, []).append(label)
+    cards = KanbanCard.objects.filter(list__board__in=created).order_by('id').values_list('id', 'list__board_id')
+    Assigned = KanbanCard.assigned_to.through
+    Labeled = KanbanCard.labels.through
+    assigned, labeled = [], []
+    for card_id, board_id in cards:
+        assigned.append(Assigned(kanbancard_id=card_id, user_id=rng.choice(users).id))
+        for label in rng.sample(labels[board_id], 2):
+            labeled.append(Labeled(kanbancard_id=card_id, cardlabel_id=label.id))
+    _bulk(Assigned, assigned)
+    _bulk(Labeled, labeled)
+
+
+def seed_escala(rng, analistas, today, folgas):
+    turnos = [Turno(nome=f'{BENCH_NAME}{nome}', horario=horario, ordem=100 + i)
+              for i, (nome, horario) in enumerate([('Manhã', '06:00 - 14:00'), ('Tarde', '14:00 - 22:00'),
+                                                   ('Noite', '22:00 - 06:00')])]
+    _bulk(Turno, turnos)
+    turnos = list(Turno.objects.filter(nome__startswith=BENCH_NAME).order_by('ordem'))
+    # Folgas escalonadas: o ciclo 6x2 tem 8 dias, uma posição por analista
+    _bulk(AnalistaEscala, [
+        AnalistaEscala(user=u, nome=f'{BENCH_NAME}{u.first_name} {u.last_name[0]}.', turno=turnos[i % len(turnos)],
+                       data_primeira_folga=today - timedelta(days=i % 8), ordem=i)
+        for i, u in enumerate(analistas)
+    ])
+    escala = list(AnalistaEscala.objects.filter(nome__startswith=BENCH_NAME).order_by('ordem'))
+    # Folgas, férias e atestados manuais em volta de hoje (uma por analista e dia)
+    dias = {}
+    for _ in range(folgas):
+        analista = _pick(rng, escala)
+        data = today + timedelta(days=rng.randrange(-90, 90))
+        dias[(analista.id, data)] = FolgaManual(analista=analista, data=data, motivo='benchmark',
+                                                tipo=rng.choice(['folga', 'ferias', 'atestado']))
+    _bulk(FolgaManual, list(dias.values()))
+
+
+def cleanup():
+    """Remove todos os dados sintéticos. Retorna o total de registros removidos"""
+    total = 0
+    with transaction.atomic():
+        for queryset in (
+            RefundRequest.objects.filter(store_code=BENCH_CODE),
+            Complaint.objects.filter(id_ra__startswith=f'{BENCH_CODE}-'),
+            # Colaborador protege o departamento: sai antes dele
+            Colaborador.objects.filter(cpf__startswith=BENCH_CODE),
+            Store.objects.filter(code__startswith=BENCH_CODE),
+            KanbanBoard.objects.filter(name__startswith=BENCH_NAME),
+            AnalistaEscala.objects.filter(nome__startswith=BENCH_NAME),
+            Turno.objects.filter(nome__startswith=BENCH_NAME),
+            User.objects.filter(username__startswith=BENCH_USER),
+            Department.objects.filter(slug__startswith=BENCH_SLUG),
+        ):
+            deleted, _ = queryset.delete()
+            total += deleted
+    return total
+
+
+def data_volumes():
+    """Volumes de dados sintéticos presentes no banco (para o relatório)"""
+    return {
+        'usuarios': User.objects.filter(username__startswith=BENCH_USER).count(),
+        'lojas': Store.objects.filter(code__startswith=BENCH_CODE).count(),
+        'reclamacoes': Complaint.objects.filter(id_ra__startswith=f'{BENCH_CODE}-').count(),
+        'auditorias_lojas': StoreAudit.objects.filter(store__code__startswith=BENCH_CODE).count(),
+        'estornos': RefundRequest.objects.filter(store_code=BENCH_CODE).count(),
+        'auditorias_atendimento': AuditoriaAtendimento.objects.filter(id_conversa__startswith=f'{BENCH_CODE}-').count(),
+        'colaboradores': Colaborador.objects.filter(cpf__startswith=BENCH_CODE).count(),
+        'tarefas': Task.objects.filter(title__startswith=BENCH_NAME).count(),
+        'cartoes_kanban': KanbanCard.objects.filter(list__board__name__startswith=BENCH_NAME).count(),
+    }
+
+
+@contextmanager
+def client_environment():
+    """
+    Ambiente de teste (host "testserver", e-mail em memória), estáticos sem
+    manifest (para renderizar as páginas sem collectstatic) e sem os logs por
+    request, que só atrapalham a leitura do resultado
+    """
+    levels = {name: logging.getLogger(name).level for name in QUIET_LOGGERS}
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(logging.CRITICAL)
+    setup_test_environment()
+    try:
+        with override_settings(STORAGES={**settings.STORAGES, 'staticfiles': {
+            'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+        }}):
+            yield
+    finally:
+        teardown_test_environment()
+        for name, level in levels.items():
+            logging.getLogger(name).setLevel(level)
+
+
+def bench_clients():
+    """Clients autenticados por papel; o administrador vê o departamento Bench Reclame Aqui"""
+    clients = {}
+    for role, username in (('admin', 'bench_admin'), ('gestor', 'bench_gestor_nrs')):
+        # Erros viram resposta 500 (registrada no resultado) em vez de exceção
+        client = Client(raise_request_exception=False)
+        client.force_login(User.objects.get(username=username))
+        if role == 'admin':
+            session = client.session
+            session['selected_department_id'] = Department.objects.get(slug='bench-ra').id
+            session.save()
+            # Com sessão em cookie assinado a chave muda a cada save
+            client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+        clients[role] = client
+    return clients
+
+
+def _request(client, url):
+    inspector = QueryInspector(url)
+    with connection.execute_wrapper(inspector):
+        start = time.perf_counter()
+        response = client.get(url)
+        if response.streaming:
+            size = sum(len(chunk) for chunk in response.streaming_content)
+        else:
+            size = len(response.content)
+        elapsed = (time.perf_counter() - start) * 1000
+    return response.status_code, elapsed, inspector, size
+
+
+def measure(client, url, iterations, warmup=1, cold_cache=False):
+    """Mede uma URL: latência das iterações e pico de memória em uma execução extra"""
+    for _ in range(warmup):
+        client.get(url)
+
+    timings, db_timings = [], []
+    for _ in range(iterations):
+        if cold_cache:
+            cache.clear()
+        status, elapsed, inspector, size = _request(client, url)
+        timings.append(elapsed)
+        db_timings.append(inspector.duration * 1000)
+
+    # tracemalloc deixa o código bem mais lento: só nesta execução, fora das medidas de tempo
+    if cold_cache:
+        cache.clear()
+    tracemalloc.start()
+    try:
+        client.get(url)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings.sort()
+    db_timings.sort()
+    repeated = inspector.repeated()
+    return {
+        'url': url,
+        'status': status,
+        'iteracoes': iterations,
+        'p50_ms': round(percentile(timings, 50), 1),
+        'p95_ms': round(percentile(timings, 95), 1),
+        'min_ms': round(timings[0], 1),
+        'max_ms': round(timings[-1], 1),
+        'db_p50_ms': round(percentile(db_timings, 50), 1),
+        'queries': inspector.count,
+        'repeticoes_max': max(inspector.fingerprints.values(), default=0),
+        'n_plus_one': [{'vezes': times, 'origem': [o for o, _ in origins], 'sql': key[:200]}
+                       for key, times, origins in repeated],
+        'pico_memoria_kb': round(peak / 1024),
+        'bytes': size,
+    }
+
+
+def run_suite(names=None, iterations=10, warmup=1, cold_cache=False, log=None):
+    """Executa os benchmarks (todos ou os de names) e retorna {nome: resultado}"""
+    context = {
+        'board_id': KanbanBoard.objects.filter(name__startswith=BENCH_NAME).order_by('id').values_list('id', flat=True).first(),
+        'store_id': Store.objects.filter(code__startswith=BENCH_CODE).order_by('code').values_list('id', flat=True).first(),
+    }
+    results = {}
+    with client_environment():
+        clients = bench_clients()
+        for name, url, role, fixed_iterations in BENCHMARKS:
+            if names and name not in names:
+                continue
+            result = measure(
+                clients[role], url.format(**context), fixed_iterations or iterations,
+                warmup=warmup, cold_cache=cold_cache,
+            )
+            results[name] = result
+            if log:
+                log(name, result)
+    return results
+
+
+def report_meta(iterations, cold_cache):
+    return {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'banco': connection.vendor,
+        'iteracoes': iterations,
+        'cache_frio': cold_cache,
+        'volumes': data_volumes(),
+    }
@@ -0,0 +1,49 @@
+"""
+Versões de cache compartilhadas entre os workers.
+
+O cache padrão (LocMemCache) é por processo: com dois workers do gunicorn,
+apagar ou incrementar uma chave só afeta o worker que atendeu o request. Os
+agregados em cache (escala, auditorias, desempenho do time) usam uma versão
+na chave, e essa versão fica no banco (CacheVersion): um save em qualquer
+worker invalida o cache de todos.
+
+    version = get_version('escala')          # entra na chave do cache
+    bump('escala')                           # em um save/delete (signals)
+
+Cada processo guarda a versão lida por VERSION_CHECK_SECONDS e depois relê do
+banco (uma query por nome). No worker que fez a alteração a versão nova vale
+assim que a transação é confirmada; nos outros, a mudança aparece em no
+máximo VERSION_CHECK_SECONDS.
+"""
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import CacheVersion
+
+VERSION_CHECK_SECONDS = 5
+
+
+def _local_key(name):
+    return f'cache_version:{name}'
+
+
+def get_version(name):
+    key = _local_key(name)
+    version = cache.get(key)
+    if version is None:
+        version = CacheVersion.objects.filter(name=name).values_list('version', flat=True).first() or 0
+        cache.set(key, version, VERSION_CHECK_SECONDS)
+    return version
+
+
+def bump(name):
+    """Incrementa a versão na transação corrente (confirmada junto com a alteração dos dados)"""
+    if not CacheVersion.objects.filter(name=name).update(version=F('version') + 1):
+        try:
+            with transaction.atomic():
+                CacheVersion.objects.create(name=name, version=1)
+        except IntegrityError:
+            # Criada por outro processo entre o UPDATE e o INSERT
+            CacheVersion.objects.filter(name=name).update(version=F('version') + 1)
+    transaction.on_commit(lambda: cache.delete(_local_key(name)))
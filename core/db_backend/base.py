@@ -0,0 +1,15 @@
+"""
+Backend do banco: django_cockroachdb com a abertura de conexões medida e
+tentada de novo em falhas transitórias (core/db_connections.py).
+"""
+from django_cockroachdb.base import DatabaseWrapper as CockroachDatabaseWrapper
+
+from .. import db_connections
+
+
+class DatabaseWrapper(CockroachDatabaseWrapper):
+
+    def get_new_connection(self, conn_params):
+        return db_connections.connect(
+            super().get_new_connection, conn_params, self.Database.OperationalError, self.alias,
+        )
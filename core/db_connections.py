@@ -0,0 +1,120 @@
+"""
+Conexões com o CockroachDB: abertura com nova tentativa e contadores.
+
+O banco fica em outra região (gcp-southamerica-east1), então abrir uma
+conexão custa vários round trips (TCP + TLS + autenticação). As conexões são
+persistentes (CONN_MAX_AGE) e verificadas antes do primeiro uso em cada
+request (CONN_HEALTH_CHECKS): uma conexão derrubada pelo balanceador enquanto
+estava parada é trocada por uma nova em vez de virar erro 500.
+
+O backend core.db_backend chama connect() para abrir cada conexão. Falhas
+transitórias (timeout, conexão recusada durante o restart de um nó) são
+tentadas de novo DB_CONNECT_RETRIES vezes com espera crescente; erros de
+autenticação e de configuração falham na hora. Queries e transações não são
+repetidas aqui: uma query pode ter sido executada antes de a conexão cair.
+
+Contadores por processo, expostos em /api/admin/request-metrics/:
+- novas: conexões abertas, com o tempo de abertura (p50/p95/max)
+- reutilizadas: requests que usaram uma conexão já aberta
+- tentativas_extras / falhas: novas tentativas e aberturas que falharam
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+from . import request_metrics
+
+logger = logging.getLogger(__name__)
+
+CONNECT_SAMPLES = 200
+# Trechos de mensagens de erro que não adianta tentar de novo
+PERMANENT_ERRORS = ('authentication', 'does not exist', 'permission denied', 'certificate')
+
+_lock = threading.Lock()
+_connect_ms = deque(maxlen=CONNECT_SAMPLES)
+_counters = {'novas': 0, 'reutilizadas': 0, 'tentativas_extras': 0, 'falhas': 0}
+_local = threading.local()
+
+
+def _increment(name):
+    with _lock:
+        _counters[name] += 1
+
+
+def is_transient(error):
+    message = str(error).lower()
+    return not any(marker in message for marker in PERMANENT_ERRORS)
+
+
+def connect(open_connection, conn_params, errors, alias='default'):
+    """
+    Abre uma conexão com open_connection(conn_params), tentando de novo nas
+    falhas transitórias (errors: classe de erro do driver).
+    """
+    retries = getattr(settings, 'DB_CONNECT_RETRIES', 2)
+    for attempt in range(retries + 1):
+        start = time.perf_counter()
+        try:
+            conn = open_connection(conn_params)
+        except errors as e:
+            if attempt == retries or not is_transient(e):
+                _increment('falhas')
+                logger.error('[DB_CONNECT] %s falhou após %d tentativa(s): %s', alias, attempt + 1, e)
+                raise
+            _increment('tentativas_extras')
+            wait = 0.2 * 2 ** attempt
+            logger.warning('[DB_CONNECT] %s falha transitória, nova tentativa em %.1fs: %s', alias, wait, e)
+            time.sleep(wait)
+            continue
+
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+        with _lock:
+            _counters['novas'] += 1
+            _connect_ms.append(elapsed_ms)
+        _local.connect_ms = (getattr(_local, 'connect_ms', None) or 0) + elapsed_ms
+        logger.info('[DB_CONNECT] %s nova conexão em %.1f ms', alias, elapsed_ms)
+        return conn
+
+
+def start_request():
+    _local.connect_ms = None
+
+
+def finish_request(queries):
+    """
+    Fecha a contagem do request: retorna o tempo gasto abrindo conexões (ms)
+    ou None se ele reutilizou uma conexão (ou não usou o banco).
+    """
+    connect_ms = getattr(_local, 'connect_ms', None)
+    _local.connect_ms = None
+    if connect_ms is not None:
+        return round(connect_ms, 1)
+    if queries:
+        _increment('reutilizadas')
+    return None
+
+
+def reset():
+    with _lock:
+        _connect_ms.clear()
+        for name in _counters:
+            _counters[name] = 0
+
+
+def snapshot():
+    with _lock:
+        counters = dict(_counters)
+        durations = sorted(_connect_ms)
+    used = counters['novas'] + counters['reutilizadas']
+    return {
+        **counters,
+        'taxa_reuso': round(100 * counters['reutilizadas'] / used, 1) if used else None,
+        'abertura_ms': {
+            'p50': request_metrics.percentile(durations, 50),
+            'p95': request_metrics.percentile(durations, 95),
+            'max': durations[-1] if durations else None,
+        },
+    }
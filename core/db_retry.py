@@ -0,0 +1,108 @@
+"""
+Nova tentativa de transações em conflitos de serialização do CockroachDB.
+
+O CockroachDB roda em SERIALIZABLE: quando duas transações disputam as mesmas
+linhas, uma delas recebe o erro 40001 ("restart transaction") e precisa ser
+refeita. Sem tratamento, o request inteiro falha.
+
+@retry_transaction roda a função dentro de transaction.atomic() e a refaz
+nesses conflitos, até MAX_RETRIES vezes, com espera exponencial (com jitter).
+No CockroachDB usa o protocolo de savepoint do próprio banco: SAVEPOINT
+cockroach_restart logo no início da transação e, no conflito, ROLLBACK TO
+SAVEPOINT cockroach_restart. A transação é a mesma a cada tentativa, o que
+aumenta sua prioridade e evita que ela perca sempre para as outras. Em outros
+bancos (SQLite em desenvolvimento) a transação inteira é refeita.
+
+    @retry_transaction
+    def registrar(...):
+        ...
+
+A função pode ser executada mais de uma vez: efeitos fora do banco (e-mails,
+uploads, caches) devem ficar depois dela. Chamada dentro de uma transação já
+aberta, apenas roda (o conflito só pode ser tratado na transação mais
+externa, que é quem deve ter o decorator).
+"""
+import functools
+import logging
+import random
+import time
+
+from django.db import DatabaseError, transaction
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRIES = 5
+BASE_DELAY = 0.05
+MAX_DELAY = 1.0
+RETRY_SQLSTATE = '40001'
+RESTART_SAVEPOINT = 'cockroach_restart'
+
+
+def is_retryable(error):
+    """Conflito de serialização (SQLSTATE 40001)"""
+    cause = getattr(error, '__cause__', None)
+    if getattr(cause, 'pgcode', None) == RETRY_SQLSTATE:
+        return True
+    return 'restart transaction' in str(error).lower()
+
+
+def backoff(attempt):
+    """Espera antes da tentativa seguinte: exponencial com jitter, limitada a MAX_DELAY"""
+    return random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempt))
+
+
+def _run_with_savepoint(conn, func, args, kwargs, max_retries):
+    with transaction.atomic(using=conn.alias):
+        with conn.cursor() as cursor:
+            cursor.execute(f'SAVEPOINT {RESTART_SAVEPOINT}')
+        for attempt in range(max_retries + 1):
+            try:
+                result = func(*args, **kwargs)
+                with conn.cursor() as cursor:
+                    cursor.execute(f'RELEASE SAVEPOINT {RESTART_SAVEPOINT}')
+                return result
+            except DatabaseError as e:
+                if attempt == max_retries or not is_retryable(e):
+                    raise
+                _log_retry(func, attempt, e)
+                # O erro marcou a transação para rollback (atomic interno ou
+                # mark_for_rollback_on_error de save/update/create): desmarca
+                # antes, senão o próprio ROLLBACK TO SAVEPOINT é recusado
+                transaction.set_rollback(False, using=conn.alias)
+                with conn.cursor() as cursor:
+                    cursor.execute(f'ROLLBACK TO SAVEPOINT {RESTART_SAVEPOINT}')
+                time.sleep(backoff(attempt))
+
+
+def _run_with_restart(conn, func, args, kwargs, max_retries):
+    for attempt in range(max_retries + 1):
+        try:
+            with transaction.atomic(using=conn.alias):
+                return func(*args, **kwargs)
+        except DatabaseError as e:
+            if attempt == max_retries or not is_retryable(e):
+                raise
+            _log_retry(func, attempt, e)
+            time.sleep(backoff(attempt))
+
+
+def _log_retry(func, attempt, error):
+    logger.warning('[DB_RETRY] %s conflito de serialização (tentativa %d): %s',
+                   func.__qualname__, attempt + 1, str(error).splitlines()[0][:200])
+
+
+def retry_transaction(func=None, *, max_retries=MAX_RETRIES, using=None):
+    """Decorator: roda func em uma transação refeita nos conflitos 40001"""
+    if func is None:
+        return functools.partial(retry_transaction, max_retries=max_retries, using=using)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        conn = transaction.get_connection(using)
+        if conn.in_atomic_block:
+            return func(*args, **kwargs)
+        if conn.vendor == 'cockroachdb':
+            return _run_with_savepoint(conn, func, args, kwargs, max_retries)
+        return _run_with_restart(conn, func, args, kwargs, max_retries)
+
+    return wrapper
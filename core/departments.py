@@ -0,0 +1,148 @@
+"""
+Departamentos em cache e o departamento em uso em cada request.
+
+A lista de departamentos muda raramente e é usada em quase todas as views
+(seletor do sidebar, departamento atual, regras do NRS Suporte). Ela fica no
+cache do processo e é apagada quando um Department é salvo ou excluído
+(signals). Com vários workers, os outros processos veem a mudança no máximo
+após CACHE_TIMEOUT; um id, nome ou slug que não está no cache recarrega a lista
+uma vez no request.
+
+O DepartmentMiddleware anexa request.departments (DepartmentResolver, com os
+mapas por id, nome e slug) e preenche request.user.department a partir do
+cache. Depois do aquecimento, resolver departamentos não faz query:
+
+    nrs = request.departments.nrs
+    dept = request.departments.by_id(dept_id)
+    request.departments.selected     # departamento em uso (seletor do admin)
+
+A sessão guarda apenas o id do departamento escolhido pelo administrador
+(selected_department_id).
+"""
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.utils.functional import SimpleLazyObject, cached_property
+
+from .models import Department, User
+
+CACHE_KEY = 'departments:all'
+CACHE_TIMEOUT = 60 * 10
+NRS_NAME = 'NRS Suporte'
+NRS_SLUG = 'nrs-suporte'
+
+
+def invalidate(**kwargs):
+    cache.delete(CACHE_KEY)
+
+
+post_save.connect(invalidate, sender=Department, dispatch_uid='departments_cache_save')
+post_delete.connect(invalidate, sender=Department, dispatch_uid='departments_cache_delete')
+
+
+def all_departments(refresh=False):
+    """Todos os departamentos, por nome"""
+    departments = None if refresh else cache.get(CACHE_KEY)
+    if departments is None:
+        departments = list(Department.objects.order_by('name'))
+        cache.set(CACHE_KEY, departments, CACHE_TIMEOUT)
+    return departments
+
+
+class DepartmentResolver:
+    """Departamentos de um request: lista, busca por id/nome/slug e o departamento em uso"""
+
+    def __init__(self, request, departments=None):
+        self.request = request
+        if departments is None:
+            departments = cache.get(CACHE_KEY)
+        # Lista recém-lida do banco: o que não está nela não existe
+        self._refreshed = departments is None
+        self._load(departments if departments is not None else all_departments(refresh=True))
+
+    def _load(self, departments):
+        self.all = departments
+        self._index = {
+            'id': {d.id: d for d in departments},
+            'name': {d.name: d for d in departments},
+            'slug': {d.slug: d for d in departments},
+        }
+
+    def _lookup(self, key, value):
+        department = self._index[key].get(value)
+        if department is None and not self._refreshed:
+            # Criado em outro processo depois que a lista entrou no cache
+            self._refreshed = True
+            self._load(all_departments(refresh=True))
+            department = self._index[key].get(value)
+        return department
+
+    def by_id(self, department_id):
+        try:
+            department_id = int(department_id)
+        except (TypeError, ValueError):
+            return None
+        return self._lookup('id', department_id)
+
+    def by_name(self, name):
+        return self._lookup('name', name) if name else None
+
+    def by_slug(self, slug):
+        return self._lookup('slug', slug) if slug else None
+
+    def first(self):
+        """Equivalente a Department.objects.first() (menor id)"""
+        return min(self.all, key=lambda d: d.id, default=None)
+
+    @cached_property
+    def nrs(self):
+        """NRS Suporte (pelo nome ou, se renomeado, pelo slug)"""
+        return self._index['name'].get(NRS_NAME) or self.by_slug(NRS_SLUG)
+
+    @cached_property
+    def selected(self):
+        """
+        Departamento em uso: o do usuário ou, para administradores, o escolhido
+        no seletor. Sem escolha, o administrador fica no NRS Suporte (o id é
+        gravado na sessão uma vez, como as views esperam).
+        """
+        request = self.request
+        user = request.user
+        if not user.is_authenticated:
+            return None
+        if not user.is_administrador():
+            return self.by_id(user.department_id)
+
+        department = self.by_id(request.session.get('selected_department_id'))
+        if department is None:
+            department = self._index['name'].get(NRS_NAME)
+            if department is not None:
+                request.session['selected_department_id'] = department.id
+        return department
+
+
+def selected_department(request):
+    return request.departments.selected
+
+
+class DepartmentMiddleware:
+    """
+    Anexa request.departments (criado no primeiro uso) e, se a lista já está
+    no cache, preenche o departamento do usuário autenticado com ela, para
+    que request.user.department não faça query. Com o cache vazio nada é
+    consultado aqui: quem precisar carrega a lista. Deve ficar após o
+    AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        departments = cache.get(CACHE_KEY)
+        request.departments = SimpleLazyObject(lambda: DepartmentResolver(request, departments))
+        user = getattr(request, 'user', None)
+        if departments is not None and user is not None and user.is_authenticated and user.department_id:
+            field = User._meta.get_field('department')
+            department = next((d for d in departments if d.id == user.department_id), None)
+            if department is not None and not field.is_cached(user):
+                field.set_cached_value(user, department)
+        return self.get_response(request)
@@ -0,0 +1,198 @@
+"""
+Comparativo de desempenho do time (NPS, TME e chats) mês a mês.
+
+Cada mês é um snapshot do time: os indicadores de todos os analistas, a meta
+global do mês, quem atingiu cada meta e os percentis do time. Os meses que
+faltam no cache são calculados juntos em uma única query (a meta global vem
+por subquery na mesma consulta).
+
+Cada mês fica em cache com a chave (departamento, mês, versão). Salvar ou
+excluir um indicador ou uma meta global incrementa a versão do departamento
+(signals). A versão fica no banco (core/cache_versions.py), então a mudança
+chega a todos os workers em no máximo VERSION_CHECK_SECONDS. A importação em
+massa usa bulk_create, que não dispara signals, e por isso chama invalidate
+diretamente.
+"""
+from functools import reduce
+from operator import or_
+
+from django.core.cache import cache
+from django.db.models import OuterRef, Q, Subquery
+from django.db.models.signals import post_delete, post_save
+
+from . import cache_versions
+from .models import IndicadorDesempenho, MetaMensalGlobal, User
+
+TEAM_CACHE_TIMEOUT = 60 * 60 * 24
+MAX_TEAM_MONTHS = 24
+PERCENTIS = (25, 50, 75)
+
+
+def kpi_usuarios(department):
+    """
+    Usuários que podem ter KPIs no departamento: os que pertencem a ele e os
+    que já têm indicadores nele (ex.: analista que mudou de departamento). É
+    o seletor da tela de desempenho e o que api_kpi_save aceita.
+    """
+    return User.objects.filter(
+        Q(department=department) |
+        Q(id__in=IndicadorDesempenho.objects.filter(department=department).values('analista_id'))
+    )
+
+
+def month_key(ano, mes):
+    return f'{ano:04d}-{mes:02d}'
+
+
+def _version_name(department_id):
+    return f'desempenho:{department_id}'
+
+
+def _cache_key(department_id, ano, mes, version):
+    return f'desempenho:team:{department_id}:{month_key(ano, mes)}:v{version}'
+
+
+def invalidate(department_id):
+    """Invalida os snapshots do departamento em todos os workers"""
+    cache_versions.bump(_version_name(department_id))
+
+
+def _invalidate_instance(sender, instance, **kwargs):
+    invalidate(instance.department_id)
+
+
+for _model in (IndicadorDesempenho, MetaMensalGlobal):
+    post_save.connect(_invalidate_instance, sender=_model, dispatch_uid=f'desempenho_team_save_{_model.__name__}')
+    post_delete.connect(_invalidate_instance, sender=_model, dispatch_uid=f'desempenho_team_delete_{_model.__name__}')
+
+
+def last_months(ano, mes, count):
+    """Os count meses terminando em (ano, mes), do mais antigo ao mais recente"""
+    months = []
+    for _ in range(count):
+        months.append((ano, mes))
+        ano, mes = (ano, mes - 1) if mes > 1 else (ano - 1, 12)
+    return months[::-1]
+
+
+def percentile(values, pct):
+    """Percentil com interpolação linear (mesma definição do Excel PERCENTIL)"""
+    if not values:
+        return None
+    values = sorted(values)
+    pos = (len(values) - 1) * pct / 100
+    low = int(pos)
+    high = min(low + 1, len(values) - 1)
+    return round(values[low] + (values[high] - values[low]) * (pos - low), 2)
+
+
+def _goal_status(row):
+    """Atingimento das metas globais: TME menor é melhor; NPS e chats maior é melhor"""
+    status = {
+        'tme_ok': row['tme'] <= row['meta_tme'] if row['tme'] is not None and row['meta_tme'] is not None else None,
+        'nps_ok': row['nps'] >= row['meta_nps'] if row['nps'] is not None and row['meta_nps'] is not None else None,
+        'chats_ok': row['chats'] >= row['meta_chats'] if row['chats'] is not None and row['meta_chats'] is not None else None,
+    }
+    status['score'] = sum(1 for ok in status.values() if ok)
+    return status
+
+
+def _compute_months(department_id, months):
+    """Snapshots dos meses informados, em uma query"""
+    meta = MetaMensalGlobal.objects.filter(
+        department_id=department_id, mes=OuterRef('mes'), ano=OuterRef('ano'),
+    )
+    rows = IndicadorDesempenho.objects.filter(department_id=department_id).filter(
+        reduce(or_, (Q(ano=ano, mes=mes) for ano, mes in months))
+    ).annotate(
+        global_meta_tme=Subquery(meta.values('meta_tme')[:1]),
+        global_meta_nps=Subquery(meta.values('meta_nps')[:1]),
+        global_meta_chats=Subquery(meta.values('meta_chats')[:1]),
+    ).order_by().values(
+        'ano', 'mes', 'analista_id', 'analista__username', 'analista__first_name', 'analista__last_name',
+        'nps', 'tme', 'chats', 'global_meta_tme', 'global_meta_nps', 'global_meta_chats',
+    )
+
+    snapshots = {
+        (ano, mes): {'metas': {'tme': None, 'nps': None, 'chats': None}, 'analistas': {}}
+        for ano, mes in months
+    }
+    for r in rows:
+        snap = snapshots[(r['ano'], r['mes'])]
+        # A meta global vem repetida em cada linha do mês
+        meta_nps = float(r['global_meta_nps']) if r['global_meta_nps'] is not None else None
+        snap['metas'] = {'tme': r['global_meta_tme'], 'nps': meta_nps, 'chats': r['global_meta_chats']}
+        values = {
+            'nps': float(r['nps']) if r['nps'] is not None else None,
+            'tme': r['tme'],
+            'chats': r['chats'],
+            'meta_tme': r['global_meta_tme'],
+            'meta_nps': meta_nps,
+            'meta_chats': r['global_meta_chats'],
+        }
+        snap['analistas'][r['analista_id']] = {
+            'nome': f"{r['analista__first_name']} {r['analista__last_name']}".strip() or r['analista__username'],
+            'nps': values['nps'],
+            'tme': values['tme'],
+            'chats': values['chats'],
+            **_goal_status(values),
+        }
+
+    for snap in snapshots.values():
+        analistas = snap['analistas'].values()
+        snap['percentis'] = {
+            metric: {
+                f'p{pct}': percentile([a[metric] for a in analistas if a[metric] is not None], pct)
+                for pct in PERCENTIS
+            }
+            for metric in ('nps', 'tme', 'chats')
+        }
+    return snapshots
+
+
+def team_months(department_id, months):
+    """Snapshots {(ano, mes): {...}} dos meses pedidos, do cache quando possível"""
+    version = cache_versions.get_version(_version_name(department_id))
+    keys = {_cache_key(department_id, ano, mes, version): (ano, mes) for ano, mes in months}
+    cached = cache.get_many(keys.keys())
+    snapshots = {keys[k]: v for k, v in cached.items()}
+
+    missing = [m for m in months if m not in snapshots]
+    if missing:
+        computed = _compute_months(department_id, missing)
+        cache.set_many(
+            {_cache_key(department_id, ano, mes, version): snap for (ano, mes), snap in computed.items()},
+            TEAM_CACHE_TIMEOUT,
+        )
+        snapshots.update(computed)
+    return snapshots
+
+
+def team_comparison(department_id, ano, mes, count):
+    """Comparativo do time nos count meses até (ano, mes), por analista"""
+    months = last_months(ano, mes, count)
+    snapshots = team_months(department_id, months)
+
+    analistas = {}
+    for ano_mes in months:
+        label = month_key(*ano_mes)
+        for analista_id, valores in snapshots[ano_mes]['analistas'].items():
+            analista = analistas.setdefault(analista_id, {
+                'id': analista_id, 'nome': valores['nome'], 'meses': {},
+            })
+            analista['meses'][label] = {k: v for k, v in valores.items() if k != 'nome'}
+
+    # Atingimento no período: metas batidas / metas avaliadas, por indicador
+    for analista in analistas.values():
+        atingimento = {}
+        for metric in ('nps', 'tme', 'chats'):
+            avaliados = [m[f'{metric}_ok'] for m in analista['meses'].values() if m[f'{metric}_ok'] is not None]
+            atingimento[metric] = round(100 * sum(avaliados) / len(avaliados), 1) if avaliados else None
+        analista['atingimento'] = atingimento
+
+    return {
+        'meses': [month_key(*m) for m in months],
+        'metas': {month_key(*m): snapshots[m]['metas'] for m in months},
+        'percentis': {month_key(*m): snapshots[m]['percentis'] for m in months},
+        'analistas': sorted(analistas.values(), key=lambda a: a['nome'].lower()),
+    }
@@ -0,0 +1,309 @@
+"""
+Cálculo da escala NRS (ciclo 6x2 + folgas manuais) no servidor.
+
+O motor (schedule_matrix) calcula o status de vários analistas em um
+intervalo de datas de uma vez, com as folgas manuais de uma única query. É a
+única implementação da regra 6x2: usado pela tela da escala, pela meta diária
+de auditorias (DailyAuditQuota), pelo calendário semanal do dashboard do
+analista e pela cobertura de turnos.
+
+A escala de cada mês é entregue como uma matriz compacta: para cada analista,
+uma string com um caractere por dia do mês (ver STATUS_CODES). As folgas
+manuais do mês seguem à parte (com id e motivo) para a edição das células.
+
+Cada mês calculado fica em cache com a chave (escopo, mês, versão). A versão é
+incrementada sempre que turnos, analistas da escala ou folgas mudam (signals),
+então o cache nunca precisa ser apagado explicitamente. Ela fica no banco
+(core/cache_versions.py): uma alteração feita em um worker chega aos outros
+em no máximo VERSION_CHECK_SECONDS.
+"""
+import calendar
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+
+from . import cache_versions
+from .models import AnalistaEscala, FolgaManual, Turno
+
+# Um caractere por dia na matriz de status
+STATUS_CODES = {
+    'trabalho': 'T',
+    'folga': 'F',
+    'ferias': 'V',
+    'atestado': 'A',
+}
+
+CYCLE_LENGTH = 8  # 6 dias de trabalho + 2 de folga
+MAX_WINDOW_MONTHS = 12
+MAX_COVERAGE_DAYS = 186
+SCHEDULE_CACHE_TIMEOUT = 60 * 60 * 24
+SCHEDULE_VERSION = 'escala'
+
+
+# ========================================
+# VERSÃO DA ESCALA (invalidação do cache)
+# ========================================
+
+def get_schedule_version():
+    return cache_versions.get_version(SCHEDULE_VERSION)
+
+
+def bump_schedule_version(**kwargs):
+    """Invalida todos os meses em cache, em todos os workers (usado também como receiver de signals)"""
+    cache_versions.bump(SCHEDULE_VERSION)
+
+
+for _model in (Turno, AnalistaEscala, FolgaManual):
+    post_save.connect(bump_schedule_version, sender=_model, dispatch_uid=f'escala_version_save_{_model.__name__}')
+    post_delete.connect(bump_schedule_version, sender=_model, dispatch_uid=f'escala_version_delete_{_model.__name__}')
+
+
+# ========================================
+# MOTOR DO CICLO 6x2
+# ========================================
+
+WORK = ord(STATUS_CODES['trabalho'])
+OFF = ord(STATUS_CODES['folga'])
+# Posições 0 e 1 do ciclo (a primeira folga e o dia seguinte) são folga
+CYCLE_PATTERN = bytes([OFF, OFF] + [WORK] * (CYCLE_LENGTH - 2))
+
+
+def default_first_day_off(today=None):
+    """Sem data_primeira_folga o ciclo começa no próximo domingo (mesma regra da tela)"""
+    today = today or date.today()
+    return today + timedelta(days=7 - (today.weekday() + 1) % 7)
+
+
+def cycle_row(data_primeira_folga, start, days):
+    """
+    Status automático (bytes de STATUS_CODES) de `days` dias a partir de
+    `start`: o padrão de 8 dias é rotacionado uma vez e repetido, sem
+    calcular dia a dia. Sem data de primeira folga, todos os dias são trabalho.
+    """
+    if data_primeira_folga is None:
+        return bytearray([WORK]) * days
+    offset = (start - data_primeira_folga).days % CYCLE_LENGTH
+    rotated = CYCLE_PATTERN[offset:] + CYCLE_PATTERN[:offset]
+    return bytearray((rotated * (days // CYCLE_LENGTH + 1))[:days])
+
+
+def schedule_matrix(profiles, start, end, fallback=None):
+    """
+    Status de cada dia entre `start` e `end` (inclusive) para os perfis
+    informados como pares (analista_id, data_primeira_folga).
+
+    As folgas manuais do intervalo vêm de uma única query e sobrescrevem o
+    ciclo. `fallback` é a data usada para perfis sem data_primeira_folga.
+
+    Retorna (status, overrides): status é {analista_id: bytearray} e
+    overrides é {analista_id: {date: {'id', 'tipo', 'motivo'}}}.
+    """
+    profiles = list(profiles)
+    days = (end - start).days + 1
+    status = {
+        analista_id: cycle_row(primeira_folga or fallback, start, days)
+        for analista_id, primeira_folga in profiles
+    }
+
+    overrides = {}
+    if status:
+        folgas = FolgaManual.objects.filter(
+            analista_id__in=list(status),
+            data__gte=start,
+            data__lte=end,
+        ).values_list('id', 'analista_id', 'data', 'tipo', 'motivo')
+        for folga_id, analista_id, data, tipo, motivo in folgas:
+            status[analista_id][(data - start).days] = ord(STATUS_CODES[tipo])
+            overrides.setdefault(analista_id, {})[data] = {'id': folga_id, 'tipo': tipo, 'motivo': motivo}
+
+    return status, overrides
+
+
+def working_days(user, start, days):
+    """
+    Lista de booleanos (dia de trabalho?) do usuário a partir de `start`.
+    Usuário sem perfil na escala trabalha todos os dias.
+    """
+    profile = (
+        AnalistaEscala.objects.filter(user=user)
+        .values_list('id', 'data_primeira_folga')
+        .first()
+    )
+    if profile is None:
+        return [True] * days
+    status, _ = schedule_matrix([profile], start, start + timedelta(days=days - 1))
+    return [code == WORK for code in status[profile[0]]]
+
+
+# ========================================
+# JANELA DE MESES
+# ========================================
+
+def parse_month(value):
+    """'AAAA-MM' -> date do dia 1 (ValueError se inválido)"""
+    year, month = value.split('-')
+    return date(int(year), int(month), 1)
+
+
+def month_window(start, months):
+    """Lista com o dia 1 de cada mês da janela"""
+    result = []
+    year, month = start.year, start.month
+    for _ in range(months):
+        result.append(date(year, month, 1))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return result
+
+
+def escala_analistas(only_nrs=False):
+    """Analistas ativos da escala; RH enxerga apenas os do NRS Suporte"""
+    queryset = AnalistaEscala.objects.filter(ativo=True)
+    if only_nrs:
+        queryset = queryset.filter(user__department__name='NRS Suporte')
+    return queryset
+
+
+def build_month(first_day, only_nrs=False, fallback=None):
+    """
+    Calcula a matriz de status do mês para os analistas ativos: duas queries
+    (analistas e folgas do mês), independentemente do histórico de folgas.
+    """
+    total_days = calendar.monthrange(first_day.year, first_day.month)[1]
+    profiles = escala_analistas(only_nrs).values_list('id', 'data_primeira_folga')
+    status, overrides = schedule_matrix(
+        profiles, first_day, first_day.replace(day=total_days),
+        fallback=fallback or default_first_day_off(),
+    )
+
+    return {
+        'month': first_day.strftime('%Y-%m'),
+        'days': total_days,
+        'status': {str(analista_id): row.decode() for analista_id, row in status.items()},
+        'overrides': {
+            str(analista_id): {str(data.day): v for data, v in days.items()}
+            for analista_id, days in overrides.items()
+        },
+    }
+
+
+def schedule_window(start, months, only_nrs=False):
+    """Meses da janela, cada um vindo do cache (escopo, mês, versão) ou calculado"""
+    version = get_schedule_version()
+    scope = 'nrs' if only_nrs else 'all'
+    # A regra padrão (próximo domingo) muda com o tempo, então entra na chave
+    fallback = default_first_day_off()
+    result = []
+    for first_day in month_window(start, months):
+        key = f'escala:month:{scope}:{first_day:%Y-%m}:v{version}:{fallback:%Y%m%d}'
+        month = cache.get(key)
+        if month is None:
+            month = build_month(first_day, only_nrs, fallback)
+            cache.set(key, month, SCHEDULE_CACHE_TIMEOUT)
+        result.append(month)
+    return version, result
+
+
+# ========================================
+# COBERTURA POR TURNO
+# ========================================
+
+OFF_TYPES = {ord(code): tipo for tipo, code in STATUS_CODES.items() if tipo != 'trabalho'}
+
+
+def build_coverage(start, end, only_nrs=False, fallback=None):
+    """
+    Cobertura dia a dia entre `start` e `end`, por turno: quantos analistas
+    trabalham e quem está de folga/férias/atestado. Uma query para analistas
+    (com o turno), uma para as folgas manuais do período inteiro.
+    Retorna {turno_id: {'working': [...], 'off': [[...], ...]}}.
+    """
+    analistas = list(
+        escala_analistas(only_nrs).values_list('id', 'data_primeira_folga', 'turno_id', 'nome')
+    )
+    status, _ = schedule_matrix(
+        [(a[0], a[1]) for a in analistas], start, end,
+        fallback=fallback or default_first_day_off(),
+    )
+    days = (end - start).days + 1
+
+    coverage = {}
+    for analista_id, _, turno_id, nome in analistas:
+        turno = coverage.setdefault(turno_id, {'working': [0] * days, 'off': [[] for _ in range(days)]})
+        for i, code in enumerate(status[analista_id]):
+            if code == WORK:
+                turno['working'][i] += 1
+            else:
+                turno['off'][i].append({'analista_id': analista_id, 'nome': nome, 'tipo': OFF_TYPES[code]})
+    return coverage
+
+
+def staffing_coverage(start, end, only_nrs=False):
+    """
+    Cobertura por turno e dia do intervalo. Cada mês fica em cache com a chave
+    (escopo, mês, versão); os meses ausentes são calculados juntos, com uma
+    única query de folgas para todos eles.
+    Retorna {'version', 'days': [...], 'turnos': [{'id', 'nome', 'horario', 'cor', 'working', 'off'}]}.
+    """
+    version = get_schedule_version()
+    scope = 'nrs' if only_nrs else 'all'
+    fallback = default_first_day_off()
+
+    months = month_window(start.replace(day=1), (end.year - start.year) * 12 + end.month - start.month + 1)
+    keys = {m: f'escala:coverage:{scope}:{m:%Y-%m}:v{version}:{fallback:%Y%m%d}' for m in months}
+    cached = cache.get_many(keys.values())
+
+    missing = [m for m in months if keys[m] not in cached]
+    if missing:
+        first = missing[0]
+        last = missing[-1].replace(day=calendar.monthrange(missing[-1].year, missing[-1].month)[1])
+        computed = build_coverage(first, last, only_nrs, fallback)
+        to_cache = {}
+        for m in missing:
+            offset = (m - first).days
+            total = calendar.monthrange(m.year, m.month)[1]
+            to_cache[keys[m]] = {
+                turno_id: {
+                    'working': data['working'][offset:offset + total],
+                    'off': data['off'][offset:offset + total],
+                }
+                for turno_id, data in computed.items()
+            }
+        cache.set_many(to_cache, SCHEDULE_CACHE_TIMEOUT)
+        cached.update(to_cache)
+
+    # Concatena os meses (turno ausente em um mês = ninguém trabalhando)
+    turno_ids = set().union(*(cached[keys[m]] for m in months))
+    merged = {turno_id: {'working': [], 'off': []} for turno_id in turno_ids}
+    for m in months:
+        total = calendar.monthrange(m.year, m.month)[1]
+        month = cached[keys[m]]
+        for turno_id, entry in merged.items():
+            data = month.get(turno_id)
+            entry['working'] += data['working'] if data else [0] * total
+            entry['off'] += data['off'] if data else [[] for _ in range(total)]
+
+    turnos_key = f'escala:turnos:v{version}'
+    turnos = cache.get(turnos_key)
+    if turnos is None:
+        turnos = list(Turno.objects.filter(ativo=True).order_by('ordem', 'nome').values('id', 'nome', 'horario', 'cor'))
+        cache.set(turnos_key, turnos, SCHEDULE_CACHE_TIMEOUT)
+    if None in merged:
+        turnos = turnos + [{'id': None, 'nome': 'Sem turno', 'horario': '', 'cor': '#64748b'}]
+
+    # Recorta o intervalo pedido dentro dos meses
+    skip = start.day - 1
+    days = (end - start).days + 1
+    empty = {'working': [0] * (skip + days), 'off': [[] for _ in range(skip + days)]}
+    return {
+        'version': version,
+        'days': [(start + timedelta(days=i)).isoformat() for i in range(days)],
+        'turnos': [
+            {
+                **t,
+                'working': merged.get(t['id'], empty)['working'][skip:skip + days],
+                'off': merged.get(t['id'], empty)['off'][skip:skip + days],
+            }
+            for t in turnos
+        ],
+    }
@@ -0,0 +1,127 @@
+"""
+Fan-out de atribuições ("atribuir a todos").
+
+Cria uma instância por destinatário (tarefas, rotinas, eventos, solicitações)
+com um único bulk_create dentro de uma transação e publica um
+NotificationEvent por destinatário, também em lote.
+
+Tarefas e rotinas criadas fora do fan_out (admin, comandos, shell) chegam
+com notified=False: o post_save publica o evento delas (notify_created). O
+polling de notificações lê apenas NotificationEvent, e os eventos antigos
+são removidos por prune_notification_events (comando
+prune_notification_events).
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from .models import NotificationEvent, Routine, Task, User
+
+# Tipo e mensagem do evento publicado pelo post_save
+CREATED_NOTIFICATIONS = {
+    Task: ('new_task', 'Nova tarefa atribuída'),
+    Routine: ('new_routine', 'Nova rotina atribuída'),
+}
+# Eventos entregues são mantidos por alguns dias; os nunca entregues, por mais tempo
+DELIVERED_RETENTION_DAYS = 7
+PENDING_RETENTION_DAYS = 30
+PRUNE_BATCH_SIZE = 1000
+
+
+def get_team_analysts(request):
+    """
+    Analistas ativos do time do gestor. Para administradores usa o departamento
+    selecionado na sessão (ou todos, se nenhum estiver selecionado).
+    """
+    analysts = User.objects.filter(ativo=True, role='analista')
+    if request.user.is_administrador():
+        selected_dept_id = request.session.get('selected_department_id')
+        if selected_dept_id:
+            return analysts.filter(department_id=selected_dept_id)
+        return analysts
+    if request.user.department_id:
+        return analysts.filter(department_id=request.user.department_id)
+    return User.objects.none()
+
+
+def fan_out(model, recipients, build, notify=None):
+    """
+    Cria em lote uma instância de `model` por destinatário e retorna os ids.
+    Os destinatários normalmente são usuários; sem `notify` podem ser qualquer
+    item (ex.: os chats de uma solicitação de inatividade).
+
+    - build(recipient): retorna a instância (não salva) para o destinatário
+    - notify(recipient, instance): opcional, retorna dict com type/title/message
+      do evento de notificação do destinatário (ou None para não notificar)
+    """
+    recipients = list(recipients)
+    if not recipients:
+        return []
+
+    with transaction.atomic():
+        instances = model.objects.bulk_create([build(r) for r in recipients])
+        if notify:
+            events = []
+            for recipient, instance in zip(recipients, instances):
+                payload = notify(recipient, instance)
+                if payload:
+                    events.append(NotificationEvent(user_id=recipient.pk, object_id=instance.pk, **payload))
+            NotificationEvent.objects.bulk_create(events)
+
+    return [instance.pk for instance in instances]
+
+
+def notify_created(sender, instance, created, raw=False, **kwargs):
+    """
+    Publica o evento de uma tarefa/rotina criada com notified=False e a marca
+    como notificada. O fan_out já cria com notified=True (e bulk_create não
+    dispara signals), então cada uma é notificada uma vez.
+    """
+    if raw or not created or instance.notified:
+        return
+    event_type, message = CREATED_NOTIFICATIONS[sender]
+    with transaction.atomic():
+        NotificationEvent.objects.create(
+            user_id=instance.assigned_to_id, object_id=instance.pk, type=event_type,
+            title=instance.title, message=f"{message}: {instance.title}",
+        )
+        sender.objects.filter(pk=instance.pk).update(notified=True)
+    instance.notified = True
+
+
+for _model in CREATED_NOTIFICATIONS:
+    post_save.connect(notify_created, sender=_model, dispatch_uid=f'fanout_notify_{_model.__name__}')
+
+
+def prune_notification_events(delivered_days=DELIVERED_RETENTION_DAYS, pending_days=PENDING_RETENTION_DAYS):
+    """
+    Remove os eventos entregues há mais de delivered_days e os não entregues
+    criados há mais de pending_days. Apaga em lotes de PRUNE_BATCH_SIZE (um
+    DELETE grande no CockroachDB vira uma transação longa). Retorna o total.
+    """
+    now = timezone.now()
+    expired = (
+        NotificationEvent.objects.filter(delivered_at__lt=now - timedelta(days=delivered_days)),
+        NotificationEvent.objects.filter(delivered_at__isnull=True, created_at__lt=now - timedelta(days=pending_days)),
+    )
+    total = 0
+    for queryset in expired:
+        while True:
+            ids = list(queryset.values_list('id', flat=True)[:PRUNE_BATCH_SIZE])
+            if not ids:
+                break
+            deleted, _ = NotificationEvent.objects.filter(id__in=ids).delete()
+            total += deleted
+    return total
+
+
+def pop_notification_events(user, limit=50):
+    """Retorna os eventos ainda não entregues ao usuário e os marca como entregues"""
+    events = list(
+        NotificationEvent.objects.filter(user=user, delivered_at__isnull=True).order_by('id')[:limit]
+    )
+    if events:
+        NotificationEvent.objects.filter(id__in=[e.id for e in events]).update(delivered_at=timezone.now())
+    return events
@@ -0,0 +1,61 @@
+"""
+Management command que verifica se o número de queries dos endpoints cresce
+com o volume de dados (N+1), passou da baseline (core/query_budget.json) ou
+do limite por request (settings.REQUEST_QUERY_BUDGET).
+
+Roda em um banco de teste próprio (o mesmo que o manage.py test usaria,
+criado e destruído aqui), com os dados sintéticos em dois tamanhos. Termina
+com erro se algum endpoint falhar:
+
+    python manage.py check_query_budget
+    python manage.py check_query_budget --update-baseline   # após uma otimização
+
+Com --update-baseline a baseline é regravada mesmo que algum endpoint ainda
+cresça com os dados.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core import query_budget
+
+
+class Command(BaseCommand):
+    help = 'Falha se as queries de algum endpoint crescem com o volume de dados ou passam da baseline ou do limite'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', nargs='+', metavar='NOME', help='Apenas estes endpoints (nome da URL)')
+        parser.add_argument('--update-baseline', action='store_true', help='Regrava core/query_budget.json')
+        parser.add_argument('--migrate', action='store_true',
+                            help='Cria o banco de teste com as migrations (padrão: direto dos models)')
+
+    def handle(self, *args, **options):
+        verbosity = options['verbosity']
+        if not options['migrate']:
+            connection.settings_dict['TEST']['MIGRATE'] = False
+        test_db = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            counts = query_budget.measure_sizes(names=options['only'], log=self.log if verbosity > 1 else None)
+        finally:
+            connection.creation.destroy_test_db(test_db, verbosity=0)
+
+        baseline = {} if options['update_baseline'] else query_budget.load_baseline()
+        results, failures = query_budget.compare(counts, baseline)
+        self.stdout.write(f'{len(results)} endpoint(s) medidos.')
+
+        if options['update_baseline']:
+            query_budget.save_baseline(results)
+            self.stdout.write(self.style.SUCCESS(f'✓ Baseline gravada em {query_budget.BASELINE_PATH}'))
+
+        if failures:
+            for failure in failures:
+                self.stdout.write(self.style.ERROR(f'  ✗ {failure}'))
+            raise CommandError(f'{len(failures)} endpoint(s) acima do orçamento de queries.')
+
+        self.stdout.write(self.style.SUCCESS('✓ Nenhum endpoint cresce com o volume de dados.'))
+
+    def log(self, name, result):
+        if result is None:
+            self.stdout.write(name)
+        else:
+            self.stdout.write(f'  {name:<45} {result["status"]}  {result["queries"]:>4} queries')
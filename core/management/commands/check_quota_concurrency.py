@@ -0,0 +1,129 @@
+"""
+Management command que dispara incrementos simultâneos na quota diária de
+auditorias (DailyAuditQuota.increment_audits) a partir de várias threads e
+confere se nenhum se perdeu.
+
+Cada thread usa a própria conexão e uma cópia da quota lida no início (como
+requests simultâneos do mesmo analista). No CockroachDB os conflitos de
+serialização são refeitos por core/db_retry.py. Roda em um banco de teste
+próprio (criado e destruído aqui) e termina com erro se o total não bater:
+
+    python manage.py check_quota_concurrency --threads 8 --increments 25
+
+Antes, confere os dois caminhos de nova tentativa (savepoint do CockroachDB
+e transação inteira) com um conflito 40001 simulado no UPDATE da quota: o
+incremento tem que ser refeito e contado uma vez só. Sem isso o caminho do
+savepoint nunca rodaria fora do CockroachDB.
+
+No SQLite o banco de teste em memória bloqueia escritas simultâneas ("database
+table is locked"): use um arquivo (DATABASES['default']['TEST']['NAME']).
+"""
+import threading
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.utils import timezone
+
+from core.db_retry import MAX_RETRIES, _run_with_restart, _run_with_savepoint
+from core.models import DailyAuditQuota, User
+
+RETRY_PATHS = {'savepoint': _run_with_savepoint, 'transação inteira': _run_with_restart}
+
+
+class Command(BaseCommand):
+    help = 'Falha se incrementos simultâneos da quota diária de auditorias se perdem'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--increments', type=int, default=25, help='Incrementos por thread')
+        parser.add_argument('--migrate', action='store_true',
+                            help='Cria o banco de teste com as migrations (padrão: direto dos models)')
+
+    def handle(self, *args, **options):
+        if not options['migrate']:
+            connection.settings_dict['TEST']['MIGRATE'] = False
+        test_db = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            analyst = User.objects.create_user('bench_concorrencia', password=None, role='analista')
+            retry_errors = self.check_retry_paths(analyst)
+            expected, total, errors, elapsed = self.hammer(analyst, options['threads'], options['increments'])
+        finally:
+            connection.creation.destroy_test_db(test_db, verbosity=0)
+
+        for name in RETRY_PATHS:
+            if name in retry_errors:
+                self.stdout.write(self.style.ERROR(f'  ✗ Nova tentativa ({name}): {retry_errors[name]}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'✓ Nova tentativa ({name}): conflito simulado refeito.'))
+        if retry_errors:
+            raise CommandError(f'{len(retry_errors)} caminho(s) de nova tentativa falharam.')
+
+        self.stdout.write(f'{options["threads"]} threads x {options["increments"]} incrementos em {elapsed:.2f}s')
+        for error in errors[:5]:
+            self.stdout.write(self.style.ERROR(f'  ✗ {error}'))
+        if errors or total != expected:
+            raise CommandError(f'audits_completed = {total}, esperado {expected} ({len(errors)} erro(s)).')
+        self.stdout.write(self.style.SUCCESS(f'✓ audits_completed = {total}: nenhum incremento perdido.'))
+
+    def check_retry_paths(self, analyst):
+        """
+        Roda increment_audits em cada caminho de core/db_retry com o primeiro
+        UPDATE falhando como um 40001. Retorna {caminho: erro} dos que falharam.
+        """
+        quota = DailyAuditQuota.objects.create(
+            analyst=analyst, date=timezone.localdate() - timedelta(days=1), daily_quota=10,
+        )
+        increment = DailyAuditQuota.increment_audits.__wrapped__
+        errors = {}
+        for name, run in RETRY_PATHS.items():
+            conflicts = []
+
+            def conflict_once(execute, sql, params, many, context):
+                if not conflicts and sql.lstrip().upper().startswith('UPDATE'):
+                    conflicts.append(sql)
+                    raise OperationalError('restart transaction: TransactionRetryWithProtoRefreshError (simulado)')
+                return execute(sql, params, many, context)
+
+            before = DailyAuditQuota.objects.get(pk=quota.pk).audits_completed
+            try:
+                with connection.execute_wrapper(conflict_once):
+                    run(connection, increment, (quota,), {}, MAX_RETRIES)
+            except Exception as e:
+                errors[name] = f'{type(e).__name__}: {e}'
+                continue
+            after = DailyAuditQuota.objects.get(pk=quota.pk).audits_completed
+            if not conflicts or after != before + 1:
+                errors[name] = f'audits_completed {before} -> {after}, esperado {before + 1}'
+        quota.delete()
+        return errors
+
+    def hammer(self, analyst, threads, increments):
+        quota = DailyAuditQuota.objects.create(
+            analyst=analyst, date=timezone.localdate(), daily_quota=threads * increments + 1,
+        )
+        barrier = threading.Barrier(threads)
+        errors = []
+
+        def worker():
+            try:
+                own = DailyAuditQuota.objects.get(pk=quota.pk)
+                barrier.wait()
+                for _ in range(increments):
+                    own.increment_audits()
+            except Exception as e:
+                errors.append(f'{type(e).__name__}: {e}')
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        quota.refresh_from_db()
+        return threads * increments, quota.audits_completed, errors, elapsed
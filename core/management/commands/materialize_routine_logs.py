@@ -0,0 +1,41 @@
+"""
+Management command para materializar os registros de rotinas (RoutineLog).
+
+Deve ser executado diariamente, logo após a meia-noite (via cron/scheduler), para:
+- Criar em lote o RoutineLog do período corrente de cada rotina ativa
+  (diária: o dia; semanal: a semana a partir de segunda; mensal: o mês)
+- Recalcular o prazo (next_deadline) de cada rotina, usado pelos alertas
+"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.routines import materialize_routine_logs
+
+
+class Command(BaseCommand):
+    help = 'Gera em lote os registros do período corrente de todas as rotinas ativas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            type=str,
+            help='Data de referência no formato AAAA-MM-DD (padrão: hoje)',
+        )
+
+    def handle(self, *args, **options):
+        if options['date']:
+            try:
+                day = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('Data inválida. Use o formato AAAA-MM-DD.')
+        else:
+            day = timezone.localtime().date()
+
+        count = materialize_routine_logs(day)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ Registros do período materializados para {count} rotina(s) ativa(s) em {day.strftime("%d/%m/%Y")}.')
+        )
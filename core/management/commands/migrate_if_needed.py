@@ -0,0 +1,163 @@
+"""
+Management command para o start do deploy: roda fix_permissions e migrate
+apenas quando as migrations ou as permissões mudaram desde o último deploy.
+
+O hash cobre os arquivos de migrations de todos os apps instalados e as
+permissões declaradas pelos models. Ele é comparado com o gravado na tabela
+core_deploy_stamp com uma query; se for igual, o comando termina sem
+carregar o grafo de migrations. Se mudou (ou a tabela ainda não existe), a
+instância pega a trava, roda fix_permissions e migrate e grava o novo hash:
+
+    python manage.py migrate_if_needed
+    python manage.py migrate_if_needed --force    # ignora o hash gravado
+
+A trava é uma linha da mesma tabela com prazo (locked_until): o CockroachDB
+não tem advisory locks (pg_advisory_lock não trava nada), e um UPDATE
+condicional funciona igual nele e no SQLite. Outra instância subindo ao mesmo
+tempo espera a trava ser liberada e, se o hash já estiver gravado, não roda
+nada. Se quem pegou a trava morrer no meio, ela expira após --lock-timeout.
+
+A tabela é criada por este comando (e não por uma migration) porque precisa
+existir antes do migrate.
+"""
+import hashlib
+import importlib.util
+import time
+from pathlib import Path
+
+from django.apps import apps
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+from django.db.migrations.loader import MigrationLoader
+
+TABLE = 'core_deploy_stamp'
+STAMP = 'schema'
+LOCK = 'lock'
+POLL_SECONDS = 2
+
+
+def schema_hash():
+    """sha256 dos arquivos de migrations dos apps instalados e das permissões dos models"""
+    digest = hashlib.sha256()
+    for app_config in sorted(apps.get_app_configs(), key=lambda a: a.label):
+        module_name, _ = MigrationLoader.migrations_module(app_config.label)
+        spec = importlib.util.find_spec(module_name) if module_name else None
+        if spec is None or not spec.submodule_search_locations:
+            continue
+        for path in sorted(Path(next(iter(spec.submodule_search_locations))).glob('*.py')):
+            digest.update(f'{app_config.label}/{path.name}\n'.encode())
+            digest.update(path.read_bytes())
+
+    for model in sorted(apps.get_models(), key=lambda m: m._meta.label_lower):
+        opts = model._meta
+        codenames = [f'{action}_{opts.model_name}' for action in opts.default_permissions]
+        codenames += [codename for codename, _ in opts.permissions]
+        digest.update(f'{opts.label_lower}:{",".join(sorted(codenames))}\n'.encode())
+    return digest.hexdigest()
+
+
+def stored_hash():
+    """Hash do último deploy, ou None se ainda não há (ou a tabela não existe)"""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT value FROM {TABLE} WHERE name = %s', [STAMP])
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    return row[0] if row else None
+
+
+def ensure_table():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS {TABLE} ('
+            'name VARCHAR(50) PRIMARY KEY, '
+            "value VARCHAR(64) NOT NULL DEFAULT '', "
+            'locked_until BIGINT NOT NULL DEFAULT 0)'
+        )
+        cursor.execute(f'INSERT INTO {TABLE} (name) VALUES (%s) ON CONFLICT (name) DO NOTHING', [LOCK])
+
+
+def acquire_lock(lease):
+    """Pega a trava se estiver livre ou expirada; True se conseguiu"""
+    now = int(time.time())
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {TABLE} SET locked_until = %s WHERE name = %s AND locked_until < %s',
+            [now + lease, LOCK, now],
+        )
+        return cursor.rowcount == 1
+
+
+def release_lock():
+    with connection.cursor() as cursor:
+        cursor.execute(f'UPDATE {TABLE} SET locked_until = 0 WHERE name = %s', [LOCK])
+
+
+def save_hash(value):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {TABLE} (name, value) VALUES (%s, %s) '
+            'ON CONFLICT (name) DO UPDATE SET value = excluded.value',
+            [STAMP, value],
+        )
+
+
+class Command(BaseCommand):
+    help = 'Roda fix_permissions e migrate apenas se as migrations ou permissões mudaram desde o último deploy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Roda mesmo com o hash em dia')
+        parser.add_argument('--lock-timeout', type=int, default=900,
+                            help='Segundos até a trava de outra instância expirar (e o máximo de espera)')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        current = schema_hash()
+        if not options['force'] and stored_hash() == current:
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ Migrations e permissões em dia ({current[:12]}), nada a fazer '
+                f'({(time.perf_counter() - start) * 1000:.0f} ms).'
+            ))
+            return
+
+        ensure_table()
+        if not self.wait_for_lock(options['lock_timeout'], None if options['force'] else current):
+            self.stdout.write(self.style.SUCCESS(f'✓ Migrado por outra instância ({current[:12]}).'))
+            return
+
+        try:
+            # Banco novo: ainda não há permissões para corrigir
+            if 'auth_permission' in connection.introspection.table_names():
+                call_command('fix_permissions', stdout=self.stdout, stderr=self.stderr)
+            call_command('migrate', interactive=False, verbosity=options['verbosity'],
+                         stdout=self.stdout, stderr=self.stderr)
+            save_hash(current)
+        finally:
+            release_lock()
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Migrations aplicadas, hash {current[:12]} gravado '
+            f'({time.perf_counter() - start:.1f} s).'
+        ))
+
+    def wait_for_lock(self, lease, current):
+        """
+        Espera a trava; False se, enquanto isso, outra instância gravou o
+        hash current (nada a fazer). Com a trava, confere o hash de novo.
+        """
+        deadline = time.monotonic() + lease
+        waiting = False
+        while not acquire_lock(lease):
+            if current and stored_hash() == current:
+                return False
+            if time.monotonic() > deadline:
+                raise CommandError(f'Trava de migração ocupada há mais de {lease}s.')
+            if not waiting:
+                self.stdout.write('Outra instância está migrando, aguardando...')
+                waiting = True
+            time.sleep(POLL_SECONDS)
+        if current and stored_hash() == current:
+            release_lock()
+            return False
+        return True
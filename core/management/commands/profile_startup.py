@@ -0,0 +1,137 @@
+"""
+Management command que mede o tempo de boot da aplicação (o que cada worker
+do gunicorn paga ao subir) e mostra quais imports pesam mais.
+
+Cada medição roda em um processo Python novo com -X importtime, nas mesmas
+etapas do worker: django.setup() (settings, apps e admin), criação do
+handler WSGI (middlewares) e o primeiro carregamento das URLs (views e
+api_*, feito no primeiro request). A saída do importtime é agrupada por
+pacote e pelos imports de primeiro nível que puxaram o resto:
+
+    python manage.py profile_startup
+    python manage.py profile_startup --runs 5 --top 15
+    python manage.py profile_startup --max-ms 1500    # falha acima disso
+
+Os tempos são a mediana das execuções; o detalhamento dos imports é o da
+execução mediana.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+PHASES = ('setup', 'wsgi', 'urls')
+
+# Roda no processo filho; imprime os tempos de cada etapa (ms) em JSON
+PROBE = """
+import json, time
+start = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+wsgi = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+urls = time.perf_counter()
+print(json.dumps({
+    'setup': (setup - start) * 1000,
+    'wsgi': (wsgi - setup) * 1000,
+    'urls': (urls - wsgi) * 1000,
+    'total': (urls - start) * 1000,
+}))
+"""
+
+
+def parse_importtime(output):
+    """
+    Linhas do -X importtime ("import time: self [us] | cumulative | pacote")
+    como (módulo, self_us, cumulativo_us, nível), na ordem da saída.
+    """
+    imports = []
+    for line in output.splitlines():
+        parts = line[len('import time:'):].split('|') if line.startswith('import time:') else []
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue  # cabeçalho
+        name = parts[2]
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((name.strip(), self_us, cumulative_us, level))
+    return imports
+
+
+def summarize(imports, top):
+    """Total de imports, tempo próprio por pacote e os imports de primeiro nível mais caros (ms)"""
+    packages = defaultdict(int)
+    for name, self_us, _, _ in imports:
+        packages[name.split('.')[0]] += self_us
+    roots = [(name, cumulative_us) for name, _, cumulative_us, level in imports if level == 0]
+    return {
+        'imports_ms': round(sum(us for _, us in roots) / 1000, 1),
+        'modulos': len(imports),
+        'pacotes': [(name, round(us / 1000, 1)) for name, us in sorted(packages.items(), key=lambda i: -i[1])[:top]],
+        'raizes': [(name, round(us / 1000, 1)) for name, us in sorted(roots, key=lambda i: -i[1])[:top]],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Mede o tempo de boot da aplicação e os imports mais caros (-X importtime)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=3, help='Execuções (usa a mediana)')
+        parser.add_argument('--top', type=int, default=10, help='Linhas em cada ranking')
+        parser.add_argument('--max-ms', type=float, help='Falha se o boot (mediana) passar disso')
+        parser.add_argument('--json', action='store_true', help='Saída em JSON')
+
+    def handle(self, *args, **options):
+        runs = sorted((self.run_probe() for _ in range(max(1, options['runs']))), key=lambda r: r[0]['total'])
+        phases = {
+            name: round(statistics.median(timings[name] for timings, _ in runs), 1)
+            for name in (*PHASES, 'total')
+        }
+        report = {'boot_ms': phases, **summarize(runs[len(runs) // 2][1], options['top'])}
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+        else:
+            self.write_report(report, len(runs))
+
+        if options['max_ms'] is not None and phases['total'] > options['max_ms']:
+            raise CommandError(f'Boot em {phases["total"]} ms, acima do limite de {options["max_ms"]} ms.')
+
+    def run_probe(self):
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(settings.BASE_DIR), env.get('PYTHONPATH')]))
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROBE],
+            capture_output=True, text=True, cwd=settings.BASE_DIR, env=env,
+        )
+        lines = result.stdout.strip().splitlines()
+        if result.returncode != 0 or not lines:
+            errors = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+            raise CommandError('Falha ao iniciar a aplicação:\n' + '\n'.join(errors[-20:]))
+        return json.loads(lines[-1]), parse_importtime(result.stderr)
+
+    def write_report(self, report, runs):
+        boot = report['boot_ms']
+        self.stdout.write(f'Boot (mediana de {runs} execução(ões)): {boot["total"]} ms')
+        self.stdout.write(f'  django.setup()   {boot["setup"]:>8} ms')
+        self.stdout.write(f'  handler WSGI     {boot["wsgi"]:>8} ms')
+        self.stdout.write(f'  URLs / views     {boot["urls"]:>8} ms')
+        self.stdout.write(f'Imports: {report["imports_ms"]} ms em {report["modulos"]} módulos')
+        self.stdout.write('\nTempo próprio por pacote:')
+        for name, ms in report['pacotes']:
+            self.stdout.write(f'  {name:<45} {ms:>8} ms')
+        self.stdout.write('\nImports de primeiro nível (cumulativo):')
+        for name, ms in report['raizes']:
+            self.stdout.write(f'  {name:<45} {ms:>8} ms')
+        self.stdout.write(self.style.SUCCESS('\n✓ Perfil de boot concluído.'))
@@ -0,0 +1,35 @@
+"""
+Management command que remove os eventos de notificação antigos
+(NotificationEvent), que de outra forma crescem para sempre.
+
+Deve ser executado diariamente (via cron/scheduler), junto com
+materialize_routine_logs:
+
+    python manage.py prune_notification_events
+    python manage.py prune_notification_events --delivered-days 3 --pending-days 15
+
+Os eventos entregues ao polling são removidos após --delivered-days; os que
+nunca foram entregues (usuário sem acessar) após --pending-days.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.fanout import DELIVERED_RETENTION_DAYS, PENDING_RETENTION_DAYS, prune_notification_events
+
+
+class Command(BaseCommand):
+    help = 'Remove os eventos de notificação entregues ou expirados'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delivered-days', type=int, default=DELIVERED_RETENTION_DAYS,
+                            help=f'Dias mantendo os eventos entregues (padrão: {DELIVERED_RETENTION_DAYS})')
+        parser.add_argument('--pending-days', type=int, default=PENDING_RETENTION_DAYS,
+                            help=f'Dias mantendo os eventos não entregues (padrão: {PENDING_RETENTION_DAYS})')
+
+    def handle(self, *args, **options):
+        if options['delivered_days'] < 0 or options['pending_days'] < 0:
+            raise CommandError('Os dias de retenção não podem ser negativos.')
+
+        total = prune_notification_events(options['delivered_days'], options['pending_days'])
+
+        self.stdout.write(self.style.SUCCESS(f'✓ {total} evento(s) de notificação removido(s).'))
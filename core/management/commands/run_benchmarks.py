@@ -0,0 +1,71 @@
+"""
+Management command para medir as telas e APIs principais com os dados de
+seed_benchmark_data.
+
+Cada URL é chamada pelo test client (middleware, sessão e templates como em
+produção). Para cada uma: p50/p95 da latência, número de queries, consultas
+repetidas (possível N+1, com a linha de origem) e pico de memória. O
+resultado pode ser salvo em JSON (--output) para comparar execuções:
+
+    python manage.py seed_benchmark_data --scale 0.1
+    python manage.py run_benchmarks --output antes.json
+
+Funciona com SQLite ou Postgres local. Não rode em produção.
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Mede latência, queries e memória das telas/APIs principais com os dados sintéticos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=10, help='Execuções medidas por URL (padrão: 10)')
+        parser.add_argument('--warmup', type=int, default=1, help='Execuções de aquecimento por URL (padrão: 1)')
+        parser.add_argument('--only', nargs='+', metavar='NOME', help='Apenas estes benchmarks')
+        parser.add_argument('--cold-cache', action='store_true', help='Limpa o cache antes de cada execução')
+        parser.add_argument('--output', help='Arquivo JSON com o resultado')
+        parser.add_argument('--list', action='store_true', help='Lista os benchmarks disponíveis e sai')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for name, url, role, _ in benchmarks.BENCHMARKS:
+                self.stdout.write(f'{name:<24} {role:<7} {url}')
+            return
+
+        if not benchmarks.is_seeded():
+            raise CommandError('Sem dados sintéticos. Rode antes: python manage.py seed_benchmark_data')
+        known = {name for name, *_ in benchmarks.BENCHMARKS}
+        unknown = set(options['only'] or []) - known
+        if unknown:
+            raise CommandError(f'Benchmark(s) desconhecido(s): {", ".join(sorted(unknown))}')
+
+        self.stdout.write(f'{"benchmark":<24} {"p50 ms":>9} {"p95 ms":>9} {"queries":>8} {"rep.":>5} {"memória":>10}')
+        results = benchmarks.run_suite(
+            names=options['only'], iterations=options['iterations'], warmup=options['warmup'],
+            cold_cache=options['cold_cache'], log=self.log_result,
+        )
+
+        if options['output']:
+            report = {
+                'meta': benchmarks.report_meta(options['iterations'], options['cold_cache']),
+                'resultados': results,
+            }
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'✓ Resultado salvo em {options["output"]}'))
+
+    def log_result(self, name, result):
+        line = (
+            f'{name:<24} {result["p50_ms"]:>9.1f} {result["p95_ms"]:>9.1f} {result["queries"]:>8d} '
+            f'{result["repeticoes_max"]:>5d} {result["pico_memoria_kb"]:>7d} KB'
+        )
+        if result['status'] != 200:
+            line += f'  (HTTP {result["status"]})'
+        self.stdout.write(line)
+        for item in result['n_plus_one']:
+            self.stdout.write(self.style.WARNING(f'    {item["vezes"]}x {", ".join(o or "?" for o in item["origem"])}'))
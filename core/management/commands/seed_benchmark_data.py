@@ -0,0 +1,44 @@
+"""
+Management command para gerar os dados sintéticos dos benchmarks.
+
+Com --scale 1 (padrão): 3 departamentos, 50 analistas, 1.000 lojas, 200.000
+reclamações, 100.000 auditorias de lojas, 50.000 estornos, 10 quadros Kanban
+e a escala 6x2. A semente é fixa (--seed), então duas execuções geram os
+mesmos dados. Use --scale 0.05 para um volume pequeno.
+
+Os registros ficam marcados com o prefixo bench/BENCH; --cleanup remove só
+eles. Não rode em produção.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Gera dados sintéticos reprodutíveis para os benchmarks (run_benchmarks)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0, help='Multiplicador dos volumes (padrão: 1.0)')
+        parser.add_argument('--seed', type=int, default=42, help='Semente do gerador (padrão: 42)')
+        parser.add_argument('--reset', action='store_true', help='Remove os dados sintéticos existentes antes de gerar')
+        parser.add_argument('--cleanup', action='store_true', help='Remove os dados sintéticos e sai')
+
+    def handle(self, *args, **options):
+        if options['cleanup'] or options['reset']:
+            deleted = benchmarks.cleanup()
+            self.stdout.write(self.style.SUCCESS(f'✓ {deleted} registro(s) sintético(s) removido(s).'))
+            if options['cleanup']:
+                return
+
+        if benchmarks.is_seeded():
+            raise CommandError('Os dados sintéticos já existem. Use --reset para gerar de novo.')
+        if options['scale'] <= 0:
+            raise CommandError('--scale deve ser maior que zero.')
+
+        start = time.perf_counter()
+        benchmarks.seed(options['scale'], options['seed'], log=lambda msg: self.stdout.write(f'  {msg}'))
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f'✓ Dados sintéticos gerados em {elapsed:.1f}s (scale={options["scale"]}).'))
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.2 on 2026-10-19 16:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0066_documentocolaborador'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cardactivity',
+            index=models.Index(fields=['card', '-created_at', '-id'], name='cardactivity_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cardcomment',
+            index=models.Index(fields=['card', '-created_at', '-id'], name='cardcomment_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-19 16:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0067_kanban_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='routine',
+            name='next_deadline',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1.2 on 2026-10-19 16:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def publish_pending_notifications(apps, schema_editor):
+    """Converte tarefas/rotinas ainda não notificadas (flag `notified`) em eventos"""
+    Task = apps.get_model('core', 'Task')
+    Routine = apps.get_model('core', 'Routine')
+    NotificationEvent = apps.get_model('core', 'NotificationEvent')
+
+    events = []
+    for t in Task.objects.filter(notified=False).only('id', 'title', 'assigned_to_id'):
+        events.append(NotificationEvent(
+            user_id=t.assigned_to_id, type='new_task', title=t.title,
+            message=f"Nova tarefa atribuída: {t.title}", object_id=t.id,
+        ))
+    for r in Routine.objects.filter(notified=False).only('id', 'title', 'assigned_to_id'):
+        events.append(NotificationEvent(
+            user_id=r.assigned_to_id, type='new_routine', title=r.title,
+            message=f"Nova rotina atribuída: {r.title}", object_id=r.id,
+        ))
+    NotificationEvent.objects.bulk_create(events, batch_size=500)
+    Task.objects.filter(notified=False).update(notified=True)
+    Routine.objects.filter(notified=False).update(notified=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0068_routine_next_deadline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(max_length=30)),
+                ('title', models.CharField(max_length=200)),
+                ('message', models.TextField()),
+                ('object_id', models.BigIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('delivered_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['user', 'delivered_at'], name='notifevent_user_pending_idx')],
+            },
+        ),
+        migrations.RunPython(publish_pending_notifications, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.2 on 2026-10-19 16:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0069_notificationevent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='refundrequest',
+            index=models.Index(fields=['-created_at', '-id'], name='refund_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='refundrequest',
+            index=models.Index(fields=['analyst', '-created_at', '-id'], name='refund_analyst_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='refundrequest',
+            index=models.Index(fields=['customer_cpf'], name='refund_cpf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='refundrequest',
+            index=models.Index(fields=['store_code'], name='refund_store_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.2 on 2026-10-19 16:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0070_refund_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RefundEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event', models.CharField(choices=[('created', 'Solicitação criada'), ('status_changed', 'Status alterado'), ('completed', 'Solicitação concluída'), ('cancellation_requested', 'Cancelamento solicitado')], max_length=30)),
+                ('status', models.CharField(choices=[('aberta', 'Aberta'), ('em_analise', 'Em Análise'), ('concluida', 'Concluída'), ('cancelada', 'Cancelada')], max_length=20)),
+                ('message', models.CharField(max_length=300)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='refund_events_authored', to=settings.AUTH_USER_MODEL)),
+                ('analyst', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='refund_events', to=settings.AUTH_USER_MODEL)),
+                ('refund', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='core.refundrequest')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['event', 'id'], name='refundevent_event_idx'), models.Index(fields=['analyst', 'event', 'id'], name='refundevent_analyst_idx')],
+            },
+        ),
+    ]
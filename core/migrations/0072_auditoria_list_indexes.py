@@ -0,0 +1,21 @@
+# Generated by Django 5.1.2 on 2026-10-19 16:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0071_refundevent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditoriaatendimento',
+            index=models.Index(fields=['department', '-created_at', '-id'], name='auditoria_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditoriaatendimento',
+            index=models.Index(fields=['analista_auditado', '-created_at', '-id'], name='auditoria_analista_list_idx'),
+        ),
+    ]
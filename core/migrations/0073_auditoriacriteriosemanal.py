@@ -0,0 +1,76 @@
+# Generated by Django 5.1.2 on 2026-10-19 16:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, Count, IntegerField, Sum, When
+from django.db.models.functions import TruncWeek
+
+CRITERIOS = (
+    'apresentou_corretamente', 'analisou_historico', 'entendeu_solicitacao',
+    'informacao_clara', 'acordo_espera', 'atendimento_respeitoso',
+    'portugues_correto', 'finalizacao_correta', 'procedimento_correto',
+)
+
+
+def backfill_criterios(apps, schema_editor):
+    """Consolida o histórico existente (uma query agrupada por analista e semana)"""
+    AuditoriaAtendimento = apps.get_model('core', 'AuditoriaAtendimento')
+    AuditoriaCriterioSemanal = apps.get_model('core', 'AuditoriaCriterioSemanal')
+
+    falhas = {
+        f'falha_{c}': Sum(Case(When(**{c: False}, then=1), default=0, output_field=IntegerField()))
+        for c in CRITERIOS
+    }
+    rows = AuditoriaAtendimento.objects.order_by().annotate(
+        semana=TruncWeek('data_atendimento'),
+    ).values('department_id', 'analista_auditado_id', 'semana').annotate(total=Count('id'), **falhas)
+
+    AuditoriaCriterioSemanal.objects.bulk_create([
+        AuditoriaCriterioSemanal(
+            department_id=row['department_id'],
+            analista_id=row['analista_auditado_id'],
+            semana=row['semana'],
+            total=row['total'],
+            **{f'falha_{c}': row[f'falha_{c}'] for c in CRITERIOS},
+        )
+        for row in rows
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0072_auditoria_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditoriaCriterioSemanal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('semana', models.DateField(verbose_name='Semana (segunda-feira)')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Auditorias')),
+                ('falha_apresentou_corretamente', models.PositiveIntegerField(default=0)),
+                ('falha_analisou_historico', models.PositiveIntegerField(default=0)),
+                ('falha_entendeu_solicitacao', models.PositiveIntegerField(default=0)),
+                ('falha_informacao_clara', models.PositiveIntegerField(default=0)),
+                ('falha_acordo_espera', models.PositiveIntegerField(default=0)),
+                ('falha_atendimento_respeitoso', models.PositiveIntegerField(default=0)),
+                ('falha_portugues_correto', models.PositiveIntegerField(default=0)),
+                ('falha_finalizacao_correta', models.PositiveIntegerField(default=0)),
+                ('falha_procedimento_correto', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('analista', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='auditoria_criterios_semanais', to=settings.AUTH_USER_MODEL)),
+                ('department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='auditoria_criterios_semanais', to='core.department')),
+            ],
+            options={
+                'verbose_name': 'Critérios de Auditoria por Semana',
+                'verbose_name_plural': 'Critérios de Auditoria por Semana',
+                'ordering': ['semana'],
+                'indexes': [models.Index(fields=['department', 'semana'], name='audit_crit_dept_semana_idx')],
+                'unique_together': {('department', 'analista', 'semana')},
+            },
+        ),
+        migrations.RunPython(backfill_criterios, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.2 on 2026-10-19 16:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0073_auditoriacriteriosemanal'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='colaborador',
+            index=models.Index(fields=['nome_completo', 'id'], name='colaborador_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='colaborador',
+            index=models.Index(fields=['status', 'nome_completo', 'id'], name='colaborador_status_nome_idx'),
+        ),
+    ]
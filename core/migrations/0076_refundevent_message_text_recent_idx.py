@@ -0,0 +1,26 @@
+# Generated by Django 5.1.2 on 2026-10-19 17:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0075_cacheversion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='refundevent',
+            name='message',
+            field=models.TextField(),
+        ),
+        migrations.AddIndex(
+            model_name='refundevent',
+            index=models.Index(fields=['event', 'created_at'], name='refundevent_event_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='refundevent',
+            index=models.Index(fields=['analyst', 'event', 'created_at'], name='refundevent_analyst_recent_idx'),
+        ),
+    ]
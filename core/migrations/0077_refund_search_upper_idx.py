@@ -0,0 +1,27 @@
+# Generated by Django 5.1.2 on 2026-10-19 17:43
+
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0076_refundevent_message_text_recent_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='refundrequest',
+            index=models.Index(django.db.models.functions.text.Upper(django.db.models.functions.comparison.Cast('customer_name', models.TextField())), name='refund_name_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='refundrequest',
+            index=models.Index(django.db.models.functions.text.Upper(django.db.models.functions.comparison.Cast('customer_email', models.TextField())), name='refund_email_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='refundrequest',
+            index=models.Index(django.db.models.functions.text.Upper(django.db.models.functions.comparison.Cast('store_code', models.TextField())), name='refund_store_upper_idx'),
+        ),
+    ]
@@ -1,8 +1,11 @@
 from django.db import models
+from django.db.models.functions import Cast, Upper
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 from datetime import datetime, timedelta
 
+from .db_retry import retry_transaction
+
 
 class Department(models.Model):
     name = models.CharField(max_length=100)
@@ -647,6 +650,8 @@ class Routine(models.Model):
     active = models.BooleanField(default=True)
     notified = models.BooleanField(default=False)
     time_limit = models.TimeField(null=True, blank=True)
+    # Prazo do período corrente (pré-calculado pelo materializador de logs)
+    next_deadline = models.DateTimeField(null=True, blank=True, db_index=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -670,6 +675,26 @@ class RoutineLog(models.Model):
         return f"Log {self.routine.title} - {self.date}"
 
 
+class NotificationEvent(models.Model):
+    """Evento de notificação publicado para um usuário (lido pelo polling de notificações)"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notification_events')
+    type = models.CharField(max_length=30)  # Ex: 'new_task', 'new_routine', 'new_event'
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    object_id = models.BigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['user', 'delivered_at'], name='notifevent_user_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.type} - {self.title}"
+
+
 class RefundRequest(models.Model):
     """Solicitações de estorno entre NRS Suporte e CS Clientes"""
     STATUS_CHOICES = [
@@ -734,12 +759,62 @@ class RefundRequest(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Listagem paginada por keyset (created_at, id)
+            models.Index(fields=['-created_at', '-id'], name='refund_list_idx'),
+            models.Index(fields=['analyst', '-created_at', '-id'], name='refund_analyst_list_idx'),
+            # Busca por CPF/loja exatos ou por prefixo
+            models.Index(fields=['customer_cpf'], name='refund_cpf_idx'),
+            models.Index(fields=['store_code'], name='refund_store_idx'),
+            # Busca por prefixo sem diferenciar maiúsculas: istartswith gera
+            # UPPER(coluna::text) LIKE UPPER('termo%'), a mesma expressão do índice
+            models.Index(Upper(Cast('customer_name', models.TextField())), name='refund_name_upper_idx'),
+            models.Index(Upper(Cast('customer_email', models.TextField())), name='refund_email_upper_idx'),
+            models.Index(Upper(Cast('store_code', models.TextField())), name='refund_store_upper_idx'),
+        ]
 
     def __str__(self):
         return f"Estorno #{self.id} - {self.customer_name} ({self.status})"
 
 
 
+class RefundEvent(models.Model):
+    """
+    Log append-only das transições das solicitações de estorno.
+    As notificações são lidas por cursor ("eventos com id maior que o último
+    visto") mais uma janela recente de created_at, sem escrita no polling e
+    com cada usuário vendo todos os eventos (ver api_refund_notifications).
+    """
+    EVENT_CHOICES = [
+        ('created', 'Solicitação criada'),
+        ('status_changed', 'Status alterado'),
+        ('completed', 'Solicitação concluída'),
+        ('cancellation_requested', 'Cancelamento solicitado'),
+    ]
+
+    refund = models.ForeignKey(RefundRequest, on_delete=models.CASCADE, related_name='events')
+    # Dono da solicitação (denormalizado para o filtro do NRS Suporte)
+    analyst = models.ForeignKey(User, on_delete=models.CASCADE, related_name='refund_events')
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='refund_events_authored')
+    event = models.CharField(max_length=30, choices=EVENT_CHOICES)
+    status = models.CharField(max_length=20, choices=RefundRequest.STATUS_CHOICES)
+    message = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['event', 'id'], name='refundevent_event_idx'),
+            models.Index(fields=['analyst', 'event', 'id'], name='refundevent_analyst_idx'),
+            # Janela de sobreposição do polling (eventos recentes)
+            models.Index(fields=['event', 'created_at'], name='refundevent_event_recent_idx'),
+            models.Index(fields=['analyst', 'event', 'created_at'], name='refundevent_analyst_recent_idx'),
+        ]
+
+    def __str__(self):
+        return f"Evento {self.event} - Estorno #{self.refund_id}"
+
+
 class RefundRequestAttachment(models.Model):
     """Anexos das solicitações de estorno"""
     refund_request = models.ForeignKey(RefundRequest, on_delete=models.CASCADE, related_name='attachments')
@@ -802,6 +877,9 @@ class StoreAudit(models.Model):
         return f"Auditoria {self.store.code} - {self.created_at.strftime('%d/%m/%Y %H:%M')}"
 
     def has_irregularities(self):
+        # Com prefetch_related('items') usa os itens já carregados
+        if 'items' in getattr(self, '_prefetched_objects_cache', {}):
+            return any(not item.is_compliant for item in self.items.all())
         return self.items.filter(is_compliant=False).exists()
 
 
@@ -1239,7 +1317,8 @@ class DailyAuditQuota(models.Model):
         # Recalculate if created OR if audits_completed is 0 (to catch up) OR purely to ensure up-to-date
         # Always recalculating is safer to catch assignment changes
         quota.daily_quota = quota.calculate_daily_target()
-        quota.save()
+        # Só a meta: gravar audits_completed aqui sobrescreveria incrementos concorrentes
+        quota.save(update_fields=['daily_quota', 'updated_at'])
         
         return quota
     
@@ -1248,43 +1327,10 @@ class DailyAuditQuota(models.Model):
         Verifica se é dia de trabalho para o analista, considerando:
         1. Folgas manuais (FolgaManual)
         2. Escala 6x2 (AnalistaEscala)
+        Sem perfil de escala, assume que trabalha todo dia.
         """
-        # Tentar buscar perfil de escala
-        try:
-           # O acesso reverso escala_perfil pode lançar exceção se não existir
-           escala_profile = self.analyst.escala_perfil
-        except Exception:
-           # Se não tiver perfil de escala, assume que trabalha todo dia
-           return True
-
-        # 1. Verificar se tem folga manual registrada (Folga, Férias, Atestado)
-        manual_folga = FolgaManual.objects.filter(
-            analista=escala_profile,
-            data=date_to_check
-        ).first()
-
-        if manual_folga:
-            # Se for marcado como 'trabalho', sobrescreve folga automática
-            if manual_folga.tipo == 'trabalho':
-                return True
-            return False # É folga/férias/atestado
-
-        # 2. Calcular Escala 6x2
-        if escala_profile.data_primeira_folga:
-            delta = (date_to_check - escala_profile.data_primeira_folga).days
-            
-            # Se delta for negativo (data anterior ao início), assumimos trabalho
-            if delta < 0:
-                return True
-            
-            # Ciclo de 8 dias (2 folga + 6 trabalho, já que data_primeira_folga marca o início das folgas)
-            cycle_pos = delta % 8
-            
-            # 0 e 1 são folgas (data_primeira_folga e o dia seguinte)
-            # 2 a 7 são dias de trabalho
-            return cycle_pos >= 2
-        
-        return True
+        from .escala import working_days
+        return working_days(self.analyst, date_to_check, 1)[0]
 
     def calculate_daily_target(self):
         """Calcula meta diária do analista baseado em lojas pendentes e dias DE TRABALHO restantes"""
@@ -1296,45 +1342,12 @@ class DailyAuditQuota(models.Model):
             # Determine today in Local Time
             today = self.date 
             
-            # Buscar perfil de escala uma única vez
-            try:
-                # O acesso reverso escala_perfil pode lançar exceção se não existir
-                escala_profile = self.analyst.escala_perfil
-            except Exception:
-                escala_profile = None
-
-            # 1. Buscar todas as folgas manuais da semana em uma única query
-            start_of_week = today - timedelta(days=today.weekday())
-            end_of_week = start_of_week + timedelta(days=6)
-            
-            manual_folgas_week = {}
-            if escala_profile:
-                folgas_qs = FolgaManual.objects.filter(
-                    analista=escala_profile,
-                    data__gte=start_of_week,
-                    data__lte=end_of_week
-                )
-                manual_folgas_week = {f.data: f.tipo for f in folgas_qs}
-
-            # Helper local otimizado para não fazer queries
-            def check_working_day_optimized(date_to_check):
-                # 1. Manual check
-                tipo_manual = manual_folgas_week.get(date_to_check)
-                if tipo_manual:
-                    return tipo_manual == 'trabalho'
-                
-                # 2. Escala check
-                if not escala_profile:
-                    return True
-                
-                if escala_profile.data_primeira_folga:
-                    delta = (date_to_check - escala_profile.data_primeira_folga).days
-                    if delta < 0: return True
-                    return (delta % 8) >= 2
-                return True
+            # Dias de trabalho de hoje até domingo (0=Seg ... 6=Dom), em uma única consulta
+            from .escala import working_days
+            week_schedule = working_days(self.analyst, today, 7 - today.weekday())
 
             # Se HOJE for folga, meta é 0
-            if not check_working_day_optimized(today):
+            if not week_schedule[0]:
                 return 0
 
             assignments = AnalystAssignment.objects.filter(analyst=self.analyst, active=True)
@@ -1376,17 +1389,7 @@ class DailyAuditQuota(models.Model):
                 return 0
 
             # Calcular dias ÚTEIS restantes na semana (Hoje até Domingo)
-            # 0=Seg, 1=Ter, ..., 4=Sex, 5=Sab, 6=Dom
-            
-            working_days_remaining = 0
-            # Check today and future days up to Sunday
-            # +1 because range is exclusive
-            days_to_check = (6 - today.weekday()) + 1 
-            
-            for i in range(days_to_check):
-                date_check = today + timedelta(days=i)
-                if check_working_day_optimized(date_check):
-                    working_days_remaining += 1
+            working_days_remaining = sum(week_schedule)
             
             # Garantir divisor mínimo de 1
             divisor = max(1, working_days_remaining)
@@ -1406,10 +1409,17 @@ class DailyAuditQuota(models.Model):
             print(f"Erro ao calcular meta diária: {e}")
             return 5 # Default safe value
     
+    @retry_transaction
     def increment_audits(self):
-        """Incrementa contador de auditorias realizadas hoje"""
-        self.audits_completed += 1
-        self.save()
+        """
+        Incrementa contador de auditorias realizadas hoje. O UPDATE com F() é
+        atômico no banco: auditorias simultâneas do mesmo analista não perdem
+        incrementos (ler, somar e gravar em Python perderia).
+        """
+        DailyAuditQuota.objects.filter(pk=self.pk).update(
+            audits_completed=models.F('audits_completed') + 1, updated_at=timezone.now(),
+        )
+        self.audits_completed = DailyAuditQuota.objects.values_list('audits_completed', flat=True).get(pk=self.pk)
         return not self.is_quota_reached  # Retorna True se ainda pode auditar
 
 
@@ -1599,6 +1609,9 @@ class KanbanCard(models.Model):
     @property
     def checklist_progress(self):
         """Retorna progresso dos checklists (completed, total)"""
+        if hasattr(self, 'checklist_total'):
+            # Já anotado na listagem (api_kanban.with_card_counts)
+            return {'completed': self.checklist_completed, 'total': self.checklist_total}
         items = ChecklistItem.objects.filter(checklist__card=self)
         total = items.count()
         completed = items.filter(is_completed=True).count()
@@ -1659,6 +1672,10 @@ class CardComment(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Comentário'
         verbose_name_plural = 'Comentários'
+        indexes = [
+            # Paginação por cursor (created_at, id) no feed do cartão
+            models.Index(fields=['card', '-created_at', '-id'], name='cardcomment_feed_idx'),
+        ]
     
     def __str__(self):
         return f"{self.author.username}: {self.content[:50]}..."
@@ -1708,6 +1725,10 @@ class CardActivity(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Atividade'
         verbose_name_plural = 'Atividades'
+        indexes = [
+            # Paginação por cursor (created_at, id) no feed do cartão
+            models.Index(fields=['card', '-created_at', '-id'], name='cardactivity_feed_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.action} - {self.card.title}"
@@ -1929,6 +1950,9 @@ class AuditoriaAtendimento(models.Model):
             models.Index(fields=['department', 'data_atendimento']),
             models.Index(fields=['classificacao']),
             models.Index(fields=['requer_acao']),
+            # Listagem paginada por keyset (created_at, id)
+            models.Index(fields=['department', '-created_at', '-id'], name='auditoria_list_idx'),
+            models.Index(fields=['analista_auditado', '-created_at', '-id'], name='auditoria_analista_list_idx'),
         ]
     
     def calcular_pontuacao(self):
@@ -1999,6 +2023,43 @@ class AuditoriaAtendimento(models.Model):
         return f"Auditoria #{self.id} - {self.analista_auditado.username} - {self.data_atendimento} (Nota: {self.nota})"
 
 
+class AuditoriaCriterioSemanal(models.Model):
+    """
+    Consolidação semanal das falhas por critério (analista x semana).
+    Mantida de forma incremental pelos signals de AuditoriaAtendimento
+    (ver core/auditoria_stats.py); cada campo falha_* conta as auditorias em
+    que o critério não foi atendido.
+    """
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, related_name='auditoria_criterios_semanais')
+    analista = models.ForeignKey('User', on_delete=models.CASCADE, related_name='auditoria_criterios_semanais')
+    semana = models.DateField(verbose_name="Semana (segunda-feira)")
+    total = models.PositiveIntegerField(default=0, verbose_name="Auditorias")
+
+    falha_apresentou_corretamente = models.PositiveIntegerField(default=0)
+    falha_analisou_historico = models.PositiveIntegerField(default=0)
+    falha_entendeu_solicitacao = models.PositiveIntegerField(default=0)
+    falha_informacao_clara = models.PositiveIntegerField(default=0)
+    falha_acordo_espera = models.PositiveIntegerField(default=0)
+    falha_atendimento_respeitoso = models.PositiveIntegerField(default=0)
+    falha_portugues_correto = models.PositiveIntegerField(default=0)
+    falha_finalizacao_correta = models.PositiveIntegerField(default=0)
+    falha_procedimento_correto = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['semana']
+        unique_together = ['department', 'analista', 'semana']
+        verbose_name = 'Critérios de Auditoria por Semana'
+        verbose_name_plural = 'Critérios de Auditoria por Semana'
+        indexes = [
+            models.Index(fields=['department', 'semana'], name='audit_crit_dept_semana_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.analista_id} - semana {self.semana} ({self.total})"
+
+
 # ==================================================
 # Modelos para Gestão de RH e Colaboradores
 # ==================================================
@@ -2067,12 +2128,21 @@ class Colaborador(models.Model):
         verbose_name = "Colaborador"
         verbose_name_plural = "Colaboradores"
         ordering = ['nome_completo']
+        indexes = [
+            # Diretório do RH: paginação por (nome, id) com e sem filtro de status
+            models.Index(fields=['nome_completo', 'id'], name='colaborador_nome_idx'),
+            models.Index(fields=['status', 'nome_completo', 'id'], name='colaborador_status_nome_idx'),
+        ]
 
     @property
     def tempo_empresa(self):
-        """Calcula o tempo de empresa em anos e meses"""
-        fim = self.data_desligamento or timezone.now().date()
-        delta = fim - self.data_admissao
+        return self.calcular_tempo_empresa(self.data_admissao, self.data_desligamento)
+
+    @staticmethod
+    def calcular_tempo_empresa(data_admissao, data_desligamento=None):
+        """Calcula o tempo de empresa em anos e meses (usado também pelas listagens com values())"""
+        fim = data_desligamento or timezone.now().date()
+        delta = fim - data_admissao
         anos = delta.days // 365
         meses = (delta.days % 365) // 30
         
@@ -2164,3 +2234,12 @@ class DocumentoColaborador(models.Model):
 
     def __str__(self):
         return f"{self.nome} - {self.colaborador.nome_completo}"
+
+
+class CacheVersion(models.Model):
+    """Versão de um grupo de chaves de cache, compartilhada entre os workers (ver core/cache_versions.py)"""
+    name = models.CharField(max_length=50, unique=True)
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
@@ -0,0 +1,84 @@
+"""
+Paginação por keyset (cursor) para listagens e feeds.
+
+Em vez de OFFSET, cada página continua a partir do último item da anterior,
+ordenando por (campo, id) - por padrão data decrescente. O custo de qualquer
+página é o mesmo, do início ao fim do histórico. O cursor é opaco para o
+cliente (base64 de "valor|id").
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Acima deste número a contagem é apenas um limite inferior ("mais de N")
+COUNT_CAP = 1000
+
+
+def encode_cursor(obj, field='created_at'):
+    """Gera cursor opaco a partir de (campo, id) do último item (instância ou dict de values())"""
+    if isinstance(obj, dict):
+        value, obj_id = obj[field], obj['id']
+    else:
+        value, obj_id = getattr(obj, field), obj.id
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    raw = f"{value}|{obj_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor, parse=datetime.fromisoformat):
+    """
+    Decodifica cursor em (valor do campo, id). parse converte o valor (padrão:
+    data/hora; use str para campos de texto). Lança ValueError se inválido.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        value, obj_id = raw.rsplit('|', 1)
+        return parse(value), int(obj_id)
+    except Exception:
+        raise ValueError('Cursor inválido')
+
+
+def page_size(request, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Tamanho de página do parâmetro ?limit=, limitado a [1, maximum]"""
+    try:
+        return max(1, min(int(request.GET.get('limit', default)), maximum))
+    except (TypeError, ValueError):
+        return default
+
+
+def keyset_page(queryset, cursor=None, limit=DEFAULT_PAGE_SIZE, field='created_at',
+                descending=True, parse=datetime.fromisoformat):
+    """
+    Retorna (itens, próximo cursor) ordenando por (field, id): por padrão o
+    mais recente primeiro; descending=False para ordem crescente (ex.: nome).
+    Busca limit + 1 linhas apenas para saber se há próxima página.
+    """
+    op = 'lt' if descending else 'gt'
+    if cursor:
+        value, last_id = decode_cursor(cursor, parse)
+        queryset = queryset.filter(
+            Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'id__{op}': last_id})
+        )
+
+    prefix = '-' if descending else ''
+    items = list(queryset.order_by(f'{prefix}{field}', f'{prefix}id')[:limit + 1])
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1], field)
+    return items, next_cursor
+
+
+def capped_count(queryset, cap=COUNT_CAP):
+    """
+    Contagem limitada: conta no máximo cap + 1 linhas (LIMIT dentro do COUNT),
+    então o custo não cresce com o histórico. Retorna (contagem, exata?).
+    """
+    count = queryset.order_by().values('id')[:cap + 1].count()
+    if count > cap:
+        return cap, False
+    return count, True
@@ -0,0 +1,196 @@
+"""
+Orçamento de queries por endpoint: o número de queries não pode crescer com
+o volume de dados.
+
+Cada endpoint de leitura de core/urls.py é chamado (GET, como administrador)
+com os dados sintéticos de benchmarks.seed() em dois tamanhos. As rotas por
+id usam a primeira loja, analista, quadro... dos dados sintéticos, que são
+justamente as entidades cujo volume cresce com o tamanho (ver _pick em
+benchmarks). Falha:
+- um endpoint com mais queries no tamanho grande (uma query por item, N+1);
+- mais queries que o registrado em query_budget.json (baseline);
+- mais queries que settings.REQUEST_QUERY_BUDGET em qualquer tamanho (o
+  mesmo limite que o QueryInspector avisa em produção), para um N+1 que
+  não aparece na diferença entre os tamanhos não passar só por estar na
+  baseline.
+Usado pelo comando check_query_budget.
+
+Ficam de fora as rotas de escrita (create, delete, save...), as rotas com
+parâmetros para os quais não há dados sintéticos e as respostas que não são
+200 nos dois tamanhos (ex.: 405 em views só POST).
+"""
+import json
+import os
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.urls import URLPattern
+
+from . import benchmarks
+from .models import (
+    AnalistaEscala, AuditoriaAtendimento, Colaborador, Complaint, Evento, KanbanBoard, KanbanCard, KanbanList,
+    RefundRequest, Store, Turno, User,
+)
+from .query_inspector import QueryInspector
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'query_budget.json')
+SIZES = {'pequeno': 0.02, 'grande': 0.1}
+
+# Rotas que alteram dados (ou a sessão) não são chamadas
+WRITE_ROUTE_RE = re.compile(
+    r'create|delete|excluir|save|update|move|reorder|toggle|assign|distribute|import|upload|cancel|'
+    r'logout|bulk|override|feedback|ciente|status/|resolve|resolver|notify|whatsapp|ticket|escalate|'
+    r'heartbeat|leave|check/|change|attachment'
+)
+PARAM_RE = re.compile(r'<(?:\w+:)?(\w+)>')
+
+# <pk> depende da rota: modelo do objeto usado em cada uma
+PK_MODELS = {
+    'complaint_detail': Complaint,
+    'complaint_edit': Complaint,
+    'user_edit': User,
+    'api_refund_detail': RefundRequest,
+    'api_refund_edit': RefundRequest,
+    'api_turno_detail': Turno,
+    'api_analista_detail': AnalistaEscala,
+    'api_auditoria_detail': AuditoriaAtendimento,
+    'api_evento_detail': Evento,
+    'rh_colaborador_perfil': Colaborador,
+    'api_rh_colaborador_detail': Colaborador,
+}
+
+# Filtro dos registros sintéticos, para os modelos em que o banco pode ter outros
+BENCH_FILTERS = {
+    User: {'username__startswith': 'bench_analista_'},
+    Complaint: {'id_ra__startswith': f'{benchmarks.BENCH_CODE}-'},
+    AuditoriaAtendimento: {'id_conversa__startswith': f'{benchmarks.BENCH_CODE}-'},
+    Evento: {'titulo__startswith': benchmarks.BENCH_NAME},
+    Colaborador: {'cpf__startswith': benchmarks.BENCH_CODE},
+}
+
+
+def _bench_ids():
+    """Valores dos parâmetros de rota a partir dos dados sintéticos"""
+    board = KanbanBoard.objects.filter(name__startswith=benchmarks.BENCH_NAME).order_by('id').first()
+    store = Store.objects.filter(code__startswith=benchmarks.BENCH_CODE).order_by('code').first()
+    return {
+        'board_id': board.id,
+        'list_id': KanbanList.objects.filter(board=board).order_by('position', 'id').values_list('id', flat=True).first(),
+        'card_id': KanbanCard.objects.filter(list__board=board).order_by('id').values_list('id', flat=True).first(),
+        'store_id': store.id,
+        'loja_cod': store.code,
+        'analista_id': User.objects.filter(username__startswith='bench_analista_').order_by('username').values_list('id', flat=True).first(),
+    }
+
+
+def _pk(name):
+    model = PK_MODELS.get(name)
+    if model is None:
+        return None
+    queryset = model.objects.filter(**BENCH_FILTERS.get(model, {})).order_by('id')
+    return queryset.values_list('id', flat=True).first()
+
+
+def endpoints():
+    """[(nome, rota)] das rotas de leitura de core/urls.py (sem duplicatas)"""
+    from .urls import urlpatterns
+
+    routes = {}
+    for pattern in urlpatterns:
+        if not isinstance(pattern, URLPattern) or not pattern.name:
+            continue
+        route = str(pattern.pattern)
+        if WRITE_ROUTE_RE.search(route) or pattern.name in routes:
+            continue
+        routes[pattern.name] = route
+    return list(routes.items())
+
+
+def _build_url(name, route, ids):
+    values = {}
+    for param in PARAM_RE.findall(route):
+        value = _pk(name) if param == 'pk' else ids.get(param)
+        if value is None:
+            return None
+        values[param] = value
+    return '/' + PARAM_RE.sub(lambda m: str(values[m.group(1)]), route)
+
+
+def count_queries(names=None, log=None):
+    """
+    {nome: {'url', 'status', 'queries'}} de cada endpoint com os dados atuais.
+    Cada URL é chamada uma vez para aquecer e medida com o cache vazio.
+    """
+    ids = _bench_ids()
+    results = {}
+    with benchmarks.client_environment():
+        client = benchmarks.bench_clients()['admin']
+        for name, route in endpoints():
+            if names and name not in names:
+                continue
+            url = _build_url(name, route, ids)
+            if url is None:
+                continue
+            cache.clear()
+            client.get(url)
+            cache.clear()
+            inspector = QueryInspector(url)
+            with connection.execute_wrapper(inspector):
+                response = client.get(url)
+            results[name] = {'url': route, 'status': response.status_code, 'queries': inspector.count}
+            if log:
+                log(name, results[name])
+    return results
+
+
+def measure_sizes(sizes=SIZES, names=None, log=None):
+    """Conta as queries em cada tamanho (gera e remove os dados sintéticos)"""
+    counts = {}
+    for label, scale in sizes.items():
+        benchmarks.cleanup()
+        benchmarks.seed(scale, log=lambda msg: None)
+        if log:
+            log(f'{label} (scale={scale})', None)
+        counts[label] = count_queries(names, log=log)
+    benchmarks.cleanup()
+    return counts
+
+
+def compare(counts, baseline):
+    """
+    Junta as contagens dos tamanhos e confere com a baseline. Retorna
+    (resultado por endpoint, falhas) - falhas são mensagens legíveis.
+    """
+    small, large = (counts[label] for label in SIZES)
+    known = baseline.get('endpoints', {})
+    limit = getattr(settings, 'REQUEST_QUERY_BUDGET', 50)
+    results, failures = {}, []
+    for name in sorted(set(small) & set(large)):
+        if small[name]['status'] != 200 or large[name]['status'] != 200:
+            continue
+        entry = {'url': small[name]['url'], **{label: counts[label][name]['queries'] for label in SIZES}}
+        results[name] = entry
+        n_small, n_large = entry['pequeno'], entry['grande']
+        if n_large > n_small:
+            failures.append(f'{name}: {n_small} -> {n_large} queries (cresce com o volume de dados)')
+        if max(n_small, n_large) > limit:
+            failures.append(f'{name}: {max(n_small, n_large)} queries (limite REQUEST_QUERY_BUDGET {limit})')
+        budget = known.get(name, {}).get('grande')
+        if budget is not None and n_large > budget:
+            failures.append(f'{name}: {n_large} queries (baseline {budget})')
+    return results, failures
+
+
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(results, path=BASELINE_PATH):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'tamanhos': SIZES, 'endpoints': results}, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write('\n')
@@ -0,0 +1,154 @@
+"""
+Inspetor de queries: queries lentas e padrões N+1, com a linha de origem.
+
+Cada SQL vira uma "impressão digital" (fingerprint) com os parâmetros
+normalizados: "WHERE id = 12" e "WHERE id = 57" são a mesma consulta. A mesma
+fingerprint repetida várias vezes em um request é o sinal típico de N+1 (FK
+acessada dentro de um loop). Cada query é atribuída à primeira linha de
+código do app core/ na pilha de chamadas, que é onde o loop está.
+
+Limites (settings, com os padrões):
+- SLOW_QUERY_MS = 300: query individual considerada lenta
+- N_PLUS_ONE_THRESHOLD = 5: repetições da mesma fingerprint no request
+- REQUEST_QUERY_BUDGET = 50: total de queries de um request
+
+Em produção o RequestMetricsMiddleware usa o inspetor e registra warnings
+acima dos limites. Em testes e benchmarks, query_budget() falha com
+AssertionError mostrando as consultas repetidas e suas origens:
+
+    with query_budget(max_queries=6):
+        client.get('/api/refunds/list/')
+"""
+import logging
+import os
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+CORE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Frames destes arquivos não contam como origem da query
+_IGNORED_FILES = {
+    os.path.join(CORE_DIR, 'query_inspector.py'),
+    os.path.join(CORE_DIR, 'request_metrics.py'),
+}
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_RE = re.compile(r'%s|\$\d+|\?')
+_IN_LIST_RE = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_SPACE_RE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """SQL com literais e parâmetros trocados por ? e listas IN (...) colapsadas"""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _PLACEHOLDER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+def caller():
+    """Primeira linha do app core/ na pilha ("core/arquivo.py:linha em funcao")"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(CORE_DIR) and filename not in _IGNORED_FILES:
+            relative = os.path.relpath(filename, os.path.dirname(CORE_DIR))
+            return f'{relative}:{frame.f_lineno} em {frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class QueryInspector:
+    """
+    execute_wrapper que conta as queries, soma o tempo de banco e agrupa por
+    fingerprint com as linhas de origem. Queries lentas são registradas na hora.
+    """
+
+    def __init__(self, label=''):
+        self.label = label
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        self.callers = defaultdict(Counter)
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            key = fingerprint(sql)
+            origin = caller()
+            self.fingerprints[key] += 1
+            self.callers[key][origin] += 1
+
+            elapsed_ms = elapsed * 1000
+            if elapsed_ms >= _setting('SLOW_QUERY_MS', 300):
+                logger.warning(
+                    '[SLOW_QUERY] %s %.1f ms em %s: %s',
+                    self.label, elapsed_ms, origin or '?', key[:500],
+                )
+
+    def repeated(self, threshold=None):
+        """[(fingerprint, vezes, origens)] repetidas pelo menos threshold vezes"""
+        if threshold is None:
+            threshold = _setting('N_PLUS_ONE_THRESHOLD', 5)
+        return [
+            (key, times, self.callers[key].most_common(3))
+            for key, times in self.fingerprints.most_common()
+            if times >= threshold
+        ]
+
+    def report(self, threshold=None):
+        """Texto com as consultas repetidas e suas origens"""
+        lines = []
+        for key, times, origins in self.repeated(threshold):
+            where = ', '.join(f'{origin or "?"} ({n}x)' for origin, n in origins)
+            lines.append(f'{times}x {key[:200]}\n    origem: {where}')
+        return '\n'.join(lines)
+
+    def warn(self):
+        """Registra warnings de N+1 e de orçamento de queries estourado"""
+        for key, times, origins in self.repeated():
+            logger.warning(
+                '[N_PLUS_ONE] %s %dx em %s: %s',
+                self.label, times, ', '.join(origin or '?' for origin, _ in origins), key[:500],
+            )
+        budget = _setting('REQUEST_QUERY_BUDGET', 50)
+        if self.count > budget:
+            logger.warning('[QUERY_BUDGET] %s %d queries (limite %d)', self.label, self.count, budget)
+
+
+@contextmanager
+def query_budget(max_queries=None, max_repeats=None, using=connection):
+    """
+    Falha (AssertionError) se o bloco fizer mais que max_queries queries ou
+    repetir alguma fingerprint max_repeats vezes ou mais (padrão:
+    N_PLUS_ONE_THRESHOLD). Retorna o inspetor para inspeção adicional.
+    """
+    inspector = QueryInspector('query_budget')
+    with using.execute_wrapper(inspector):
+        yield inspector
+
+    problems = []
+    if max_queries is not None and inspector.count > max_queries:
+        problems.append(f'{inspector.count} queries (limite {max_queries})')
+    if inspector.repeated(max_repeats):
+        problems.append('consultas repetidas (possível N+1)')
+    if problems:
+        raise AssertionError('; '.join(problems) + '\n' + inspector.report(2))
@@ -0,0 +1,150 @@
+"""
+Instrumentação por request: view resolvida, tempo total, número de queries,
+tempo de banco e tamanho da resposta.
+
+O RequestMetricsMiddleware conta as queries com connection.execute_wrapper
+(QueryInspector, que também avisa sobre queries lentas e N+1),
+devolve o header Server-Timing (visível no DevTools do navegador, com o tempo
+de abertura de conexão quando o request precisou de uma nova), registra
+uma linha de log estruturada ([REQUEST_METRICS] + JSON) e guarda as últimas
+amostras de cada view em memória. O resumo (percentis e histograma de
+latência por view) fica em /api/admin/request-metrics/.
+
+As amostras são por processo: com vários workers do gunicorn, cada um
+responde com o que ele mesmo atendeu.
+"""
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.db import connection
+
+from . import db_connections
+from .query_inspector import QueryInspector
+
+logger = logging.getLogger(__name__)
+
+# Últimas N amostras guardadas por view
+SAMPLES_PER_VIEW = getattr(settings, 'REQUEST_METRICS_SAMPLES', 500)
+# Limites (ms) das faixas do histograma de latência
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000)
+UNRESOLVED_VIEW = '<nao_resolvida>'
+
+_lock = threading.Lock()
+_samples = defaultdict(lambda: deque(maxlen=SAMPLES_PER_VIEW))
+
+
+def view_name(request):
+    """Nome da view resolvida (namespace:nome ou caminho da função)"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return UNRESOLVED_VIEW
+    return match.view_name or match._func_path
+
+
+def record(view, duration_ms, queries, db_ms, size):
+    with _lock:
+        _samples[view].append((duration_ms, queries, db_ms, size))
+
+
+def reset():
+    with _lock:
+        _samples.clear()
+
+
+def percentile(sorted_values, pct):
+    """Percentil por posição mais próxima (lista já ordenada)"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _histogram(durations):
+    buckets = {f'<={limit}ms': 0 for limit in LATENCY_BUCKETS_MS}
+    buckets[f'>{LATENCY_BUCKETS_MS[-1]}ms'] = 0
+    for value in durations:
+        for limit in LATENCY_BUCKETS_MS:
+            if value <= limit:
+                buckets[f'<={limit}ms'] += 1
+                break
+        else:
+            buckets[f'>{LATENCY_BUCKETS_MS[-1]}ms'] += 1
+    return buckets
+
+
+def snapshot():
+    """Resumo por view, ordenado pelo tempo total gasto (mais caras primeiro)"""
+    with _lock:
+        data = {view: list(samples) for view, samples in _samples.items()}
+
+    views = []
+    for view, samples in data.items():
+        durations = sorted(s[0] for s in samples)
+        queries = [s[1] for s in samples]
+        db_times = [s[2] for s in samples]
+        sizes = [s[3] for s in samples if s[3] is not None]
+        views.append({
+            'view': view,
+            'amostras': len(samples),
+            'tempo_ms': {
+                'p50': percentile(durations, 50),
+                'p95': percentile(durations, 95),
+                'p99': percentile(durations, 99),
+                'max': durations[-1],
+                'total': round(sum(durations), 1),
+            },
+            'queries': {
+                'media': round(sum(queries) / len(queries), 1),
+                'max': max(queries),
+            },
+            'db_ms_media': round(sum(db_times) / len(db_times), 1),
+            'bytes_media': round(sum(sizes) / len(sizes)) if sizes else None,
+            'histograma': _histogram(durations),
+        })
+    views.sort(key=lambda v: v['tempo_ms']['total'], reverse=True)
+    return views
+
+
+class RequestMetricsMiddleware:
+    """
+    Mede cada request. Deve ficar logo após o WhiteNoise (arquivos estáticos
+    não são medidos) e antes do GZip, para que o tamanho seja o enviado.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        inspector = QueryInspector(f'{request.method} {request.path}')
+        db_connections.start_request()
+        start = time.perf_counter()
+        with connection.execute_wrapper(inspector):
+            response = self.get_response(request)
+        duration_ms = round((time.perf_counter() - start) * 1000, 1)
+        db_ms = round(inspector.duration * 1000, 1)
+        size = None if response.streaming else len(response.content)
+        view = view_name(request)
+        connect_ms = db_connections.finish_request(inspector.count)
+        inspector.warn()
+
+        record(view, duration_ms, inspector.count, db_ms, size)
+        server_timing = f'db;dur={db_ms};desc="{inspector.count} queries", app;dur={duration_ms}'
+        if connect_ms is not None:
+            server_timing += f', dbconn;dur={connect_ms};desc="nova conexao"'
+        response['Server-Timing'] = server_timing
+        logger.info('[REQUEST_METRICS] %s', json.dumps({
+            'view': view,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'ms': duration_ms,
+            'queries': inspector.count,
+            'db_ms': db_ms,
+            'db_connect_ms': connect_ms,
+            'bytes': size,
+        }))
+        return response
@@ -0,0 +1,170 @@
+"""
+Serviço de rotinas (Routine / RoutineLog).
+
+Concentra o agendamento das rotinas por frequência (diária, semanal, mensal),
+a materialização em lote dos RoutineLog de cada período e a leitura do status
+das rotinas em consultas agrupadas. As APIs de leitura não criam logs: eles
+são gerados uma vez por período pelo comando `materialize_routine_logs` (ou,
+na falta dele, pela primeira leitura do dia via `ensure_materialized`).
+"""
+import calendar
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db.models import Case, DateField, OuterRef, Subquery, Value, When
+from django.utils import timezone
+
+from .models import Routine, RoutineLog
+
+
+def period_bounds(frequency, day):
+    """Retorna (início, fim) do período da rotina que contém `day`"""
+    if frequency == 'semanal':
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    if frequency == 'mensal':
+        last_day = calendar.monthrange(day.year, day.month)[1]
+        return day.replace(day=1), day.replace(day=last_day)
+    return day, day
+
+
+def period_start_expression(day, field='frequency'):
+    """Expressão SQL com o início do período de cada rotina (RoutineLog.date)"""
+    return Case(
+        When(**{field: 'semanal'}, then=Value(period_bounds('semanal', day)[0])),
+        When(**{field: 'mensal'}, then=Value(period_bounds('mensal', day)[0])),
+        default=Value(day),
+        output_field=DateField(),
+    )
+
+
+def period_deadline(routine, day):
+    """Prazo do período corrente: último dia do período no time_limit (ou fim do dia)"""
+    _, end = period_bounds(routine.frequency, day)
+    return timezone.make_aware(datetime.combine(end, routine.time_limit or time.max))
+
+
+def materialize_routine_logs(day, routines=None):
+    """
+    Gera em um único INSERT os RoutineLog do período que contém `day` para
+    todas as rotinas ativas (ou só para `routines`) e atualiza `next_deadline`.
+    Idempotente: logs existentes são ignorados (ignore_conflicts).
+    """
+    if routines is None:
+        routines = Routine.objects.all()
+    routines = list(routines.filter(active=True).only('id', 'frequency', 'time_limit', 'next_deadline'))
+    if not routines:
+        return 0
+
+    RoutineLog.objects.bulk_create(
+        [RoutineLog(routine_id=r.id, date=period_bounds(r.frequency, day)[0], completed=False) for r in routines],
+        ignore_conflicts=True,
+    )
+
+    changed = []
+    for r in routines:
+        deadline = period_deadline(r, day)
+        if r.next_deadline != deadline:
+            r.next_deadline = deadline
+            changed.append(r)
+    if changed:
+        Routine.objects.bulk_update(changed, ['next_deadline'], batch_size=500)
+    return len(routines)
+
+
+def ensure_materialized(day):
+    """
+    Garante que os logs do dia já foram materializados, rodando o
+    materializador no máximo uma vez por dia por processo. Normalmente o
+    comando agendado já fez esse trabalho e aqui é só uma leitura de cache.
+    """
+    key = f'routine_logs_materialized:{day.isoformat()}'
+    if cache.add(key, True, timeout=60 * 60 * 26):
+        try:
+            materialize_routine_logs(day)
+        except Exception:
+            cache.delete(key)
+            raise
+
+
+def routine_status(day, routines):
+    """
+    Retorna o status das rotinas ativas de `routines` (queryset) no período
+    que contém `day`. O log do período vem anotado na mesma query das rotinas;
+    rotinas sem log materializado aparecem com `log_id` None e pendentes.
+    """
+    period_log = RoutineLog.objects.filter(routine=OuterRef('pk'), date=OuterRef('period_start'))
+    rows = list(
+        routines.filter(active=True)
+        .annotate(period_start=period_start_expression(day))
+        .annotate(
+            log_id=Subquery(period_log.values('id')[:1]),
+            log_completed=Subquery(period_log.values('completed')[:1]),
+        )
+        .order_by('id')
+        .values(
+            'id', 'title', 'description', 'frequency', 'time_limit', 'next_deadline',
+            'log_id', 'log_completed',
+            'assigned_to_id', 'assigned_to__first_name', 'assigned_to__last_name',
+        )
+    )
+    for r in rows:
+        r['completed'] = bool(r.pop('log_completed'))
+    return rows
+
+
+def team_routine_overview(day, analysts):
+    """
+    Status das rotinas de todo o time em `day`: uma query para os analistas e
+    uma para rotinas + logs, agrupadas em memória por analista.
+    """
+    analysts = list(analysts.values('id', 'first_name', 'last_name', 'username'))
+    rows = routine_status(day, Routine.objects.filter(assigned_to_id__in=[a['id'] for a in analysts]))
+
+    by_analyst = defaultdict(list)
+    for r in rows:
+        by_analyst[r['assigned_to_id']].append({'title': r['title'], 'completed': r['completed']})
+
+    return [
+        {
+            'analyst_name': f"{a['first_name']} {a['last_name']}".strip() or a['username'],
+            'analyst_id': str(a['id']),
+            'routines': by_analyst.get(a['id'], []),
+        }
+        for a in analysts
+    ]
+
+
+def missed_routines(day, analysts):
+    """
+    Rotinas do time cujo período terminou em `day` sem cumprimento,
+    incluindo as que nunca tiveram log gerado.
+    """
+    frequencies = ['diaria']
+    if period_bounds('semanal', day)[1] == day:
+        frequencies.append('semanal')
+    if period_bounds('mensal', day)[1] == day:
+        frequencies.append('mensal')
+
+    routines = Routine.objects.filter(
+        assigned_to__in=analysts,
+        frequency__in=frequencies,
+        created_at__date__lte=day,
+    )
+    return [r for r in routine_status(day, routines) if not r['completed']]
+
+
+def due_routine_logs(user, now, window):
+    """Logs pendentes do usuário cujo prazo (next_deadline) vence dentro de `window`"""
+    today = timezone.localtime(now).date()
+    return RoutineLog.objects.filter(
+        routine__assigned_to=user,
+        routine__active=True,
+        routine__time_limit__isnull=False,
+        routine__next_deadline__gt=now,
+        routine__next_deadline__lte=now + window,
+        date=period_start_expression(today, 'routine__frequency'),
+        completed=False,
+        warning_sent=False,
+    ).select_related('routine')
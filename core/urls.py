@@ -15,6 +15,7 @@ from . import api_store_verification
 from . import api_auditoria
 from . import api_chat_inactivity
 from . import api_rh
+from . import api_monitoramento
 from .api_quadro import api_quadro_data, api_cartao_create, api_cartao_move, api_cartao_update, api_cartao_delete, api_cartao_details, api_comentario_add, api_anexo_add, api_anexo_delete, api_lista_create, api_lista_delete
 
 
@@ -127,6 +128,8 @@ urlpatterns = [
     path('api/escala/analistas/reorder/', api_escala.api_analistas_reorder, name='api_analistas_reorder'),
     path('api/escala/analistas/<int:pk>/', api_escala.api_analista_detail, name='api_analista_detail'),
     path('api/escala/folgas/', api_escala.api_folgas_list, name='api_folgas_list'),
+    path('api/escala/schedule/', api_escala.api_escala_schedule, name='api_escala_schedule'),
+    path('api/escala/coverage/', api_escala.api_escala_coverage, name='api_escala_coverage'),
     path('api/escala/folgas/save/', api_escala.api_folga_save, name='api_folga_save'),
     path('api/escala/folgas/<int:pk>/delete/', api_escala.api_folga_delete, name='api_folga_delete'),
     
@@ -145,12 +148,14 @@ urlpatterns = [
     # API Desempenho
     path('api/desempenho/kpis/', api_desempenho.api_kpis_list, name='api_kpis_list'),
     path('api/desempenho/kpis/save/', api_desempenho.api_kpi_save, name='api_kpi_save'),
+    path('api/desempenho/kpis/import/', api_desempenho.api_kpis_import, name='api_kpis_import'),
     path('api/desempenho/kpis/<int:pk>/delete/', api_desempenho.api_kpi_delete, name='api_kpi_delete'),
     path('api/desempenho/metas/global/', api_desempenho.api_global_metas_list, name='api_global_metas_list'),
     path('api/desempenho/metas/global/save/', api_desempenho.api_global_meta_save, name='api_global_meta_save'),
     path('api/desempenho/metas/global/<int:pk>/delete/', api_desempenho.api_global_meta_delete, name='api_global_meta_delete'),
     path('api/desempenho/ranking/', api_desempenho.api_ranking, name='api_ranking'),
     path('api/desempenho/podium/', api_desempenho.api_podium, name='api_podium'),
+    path('api/desempenho/time/', api_desempenho.api_team_comparison, name='api_team_comparison'),
 
 
     # API Tarefas e Rotinas
@@ -231,6 +236,7 @@ urlpatterns = [
     path('api/kanban/cards/<int:card_id>/checklists/', api_kanban.api_card_checklists, name='api_kanban_card_checklists'),
     path('api/kanban/checklists/<int:checklist_id>/items/', api_kanban.api_checklist_items, name='api_kanban_checklist_items'),
     path('api/kanban/cards/<int:card_id>/comments/', api_kanban.api_card_comments, name='api_kanban_card_comments'),
+    path('api/kanban/cards/<int:card_id>/activities/', api_kanban.api_card_activities, name='api_kanban_card_activities'),
     path('api/kanban/cards/<int:card_id>/members/', api_kanban.api_card_members, name='api_kanban_card_members'),
     path('api/kanban/cards/<int:card_id>/attachments/', api_kanban.api_card_attachments, name='api_kanban_card_attachments'),
     path('api/kanban/cards/<int:card_id>/attachments/<int:attachment_id>/', api_kanban.api_card_attachment_delete, name='api_kanban_card_attachment_delete'),
@@ -251,6 +257,7 @@ urlpatterns = [
     path('api/auditoria/<int:pk>/delete/', api_auditoria.api_auditoria_delete, name='api_auditoria_delete'),
     path('api/auditoria/ranking/', api_auditoria.api_ranking_analistas, name='api_ranking_analistas'),
     path('api/auditoria/analista/<int:analista_id>/', api_auditoria.api_estatisticas_analista, name='api_estatisticas_analista'),
+    path('api/auditoria/criterios/', api_auditoria.api_criterios_auditoria, name='api_criterios_auditoria'),
     path('api/auditoria/dashboard/', api_auditoria.api_dashboard_auditoria, name='api_dashboard_auditoria'),
     path('api/auditoria/config/', api_auditoria.api_configuracao_get, name='api_configuracao_get'),
     path('api/auditoria/config/update/', api_auditoria.api_configuracao_update, name='api_configuracao_update'),
@@ -277,5 +284,8 @@ urlpatterns = [
     path('api/rh/colaboradores/documentos/upload/', api_rh.api_upload_documento, name='api_rh_upload_documento'),
     path('api/rh/colaboradores/documentos/<int:pk>/delete/', api_rh.api_delete_documento, name='api_rh_delete_documento'),
     path('api/rh/auxiliar/', api_rh.api_rh_auxiliar_data, name='api_rh_auxiliar_data'),
+
+    # Monitoramento (administradores)
+    path('api/admin/request-metrics/', api_monitoramento.api_request_metrics, name='api_request_metrics'),
 ]
 
@@ -7,18 +7,17 @@ from django.views.decorators.csrf import ensure_csrf_cookie
 from django.contrib import messages
 from django.core.paginator import Paginator
 from django.db.models import Count, Avg, Q, Max
-from django.http import JsonResponse, HttpResponse
+from django.http import Http404, JsonResponse, HttpResponse
 from django.utils import timezone
 from django.contrib.auth.forms import UserCreationForm
 from django import forms
 from datetime import timedelta
-import csv
 import re
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
 from datetime import datetime
-from .models import Complaint, Store, User, Department, Escala, IndicadorDesempenho, ObservacaoDesempenho, Lista, Activity, AuditLog, StoreAudit, StoreAuditItem, StoreAuditIssue, MetaMensalGlobal, SystemNotification, Cargo, Colaborador, HistoricoProfissional, PerformanceRH
+from .models import Complaint, Store, User, Escala, IndicadorDesempenho, ObservacaoDesempenho, Lista, Activity, AuditLog, StoreAudit, StoreAuditItem, StoreAuditIssue, MetaMensalGlobal, SystemNotification, Cargo, Colaborador, HistoricoProfissional, PerformanceRH
 from .forms import ComplaintForm, StoreForm
+from .db_retry import retry_transaction
+from .desempenho_stats import kpi_usuarios
 
 
 def login_view_custom(request):
@@ -83,9 +82,10 @@ def change_department(request, dept_id):
     if dept_id == 0:
         return redirect('dashboard')
 
+    dept = request.departments.by_id(dept_id)
+    if dept is None:
+        raise Http404('Departamento não encontrado')
     request.session['selected_department_id'] = dept_id
-    from .models import Department
-    dept = get_object_or_404(Department, id=dept_id)
     messages.success(request, f"Departamento alterado para: {dept.name}")
     
     # Redirecionar para a página principal de cada departamento
@@ -111,16 +111,14 @@ def dashboard(request):
     else:
         # Se houver depto na sessão, verificar se é o NRS Suporte, RH ou NRP para redirecionar
         if selected_dept_id:
-            from .models import Department
-            current_dept = Department.objects.filter(id=selected_dept_id).first()
+            current_dept = request.departments.by_id(selected_dept_id)
             if current_dept and current_dept.name in ['NRS Suporte', 'RH', 'NRP']:
                 return redirect('escala')
             queryset = Complaint.objects.filter(department_id=selected_dept_id)
         else:
             # Se é admin mas não tem depto na sessão (primeiro acesso), 
             # tenta buscar o NRS Suporte e redirecionar
-            from .models import Department
-            nrs_dept = Department.objects.filter(name='NRS Suporte').first()
+            nrs_dept = request.departments.by_name('NRS Suporte')
             if nrs_dept:
                 request.session['selected_department_id'] = nrs_dept.id
                 return redirect('escala')
@@ -740,12 +738,10 @@ def complaint_create(request):
             if request.user.is_administrador():
                 selected_dept_id = request.session.get('selected_department_id')
                 if selected_dept_id:
-                    from .models import Department
-                    complaint.department = Department.objects.filter(id=selected_dept_id).first()
+                    complaint.department = request.departments.by_id(selected_dept_id)
                 else:
                     # Se for admin e não tiver depto na sessão, buscar o padrão NRS
-                    from .models import Department
-                    complaint.department = Department.objects.filter(name='NRS Suporte').first()
+                    complaint.department = request.departments.by_name('NRS Suporte')
             else:
                 # Outros usuários usam seu departamento fixo
                 complaint.department = request.user.department
@@ -1047,15 +1043,14 @@ def user_list(request):
         messages.error(request, 'Você não tem permissão para ver a lista de usuários.')
         return redirect('dashboard')
     
-    from .models import Department
-    departments = Department.objects.all().order_by('name')
+    departments = request.departments.all
     
     # Filtro base por departamento
     if request.user.is_administrador():
-        users = User.objects.all().order_by('first_name', 'username')
+        users = User.objects.select_related('department').order_by('first_name', 'username')
     else:
         # Gestor só vê usuários do seu departamento
-        users = User.objects.filter(department=request.user.department).order_by('first_name', 'username')
+        users = User.objects.filter(department=request.user.department).select_related('department').order_by('first_name', 'username')
     
     search = request.GET.get('search', '')
     role_filter = request.GET.get('role', '')
@@ -1101,8 +1096,7 @@ def user_create(request):
         messages.error(request, 'Você não tem permissão para criar usuários.')
         return redirect('dashboard')
     
-    from .models import Department
-    departments = Department.objects.all()
+    departments = request.departments.all
     
     if request.method == 'POST':
         username = request.POST.get('username')
@@ -1120,12 +1114,7 @@ def user_create(request):
             role = 'analista' # Gestor só cria analista
             department_id = str(request.user.department_id) if request.user.department_id else None
             
-        department = None
-        if department_id:
-            try:
-                department = Department.objects.get(id=department_id)
-            except (Department.DoesNotExist, ValueError):
-                department = None
+        department = request.departments.by_id(department_id)
             
         if User.objects.filter(username=username).exists():
             messages.error(request, 'Este nome de usuário já existe.')
@@ -1212,8 +1201,7 @@ def user_edit(request, pk):
         messages.error(request, 'Você não tem permissão para editar usuários.')
         return redirect('dashboard')
     
-    from .models import Department
-    departments = Department.objects.all()
+    departments = request.departments.all
     user_to_edit = get_object_or_404(User, pk=pk)
     
     # Gestor só edita usuários do seu depto e apenas analistas (ou a si mesmo)
@@ -1232,13 +1220,7 @@ def user_edit(request, pk):
         # Administrador pode mudar tudo, Gestor não muda role nem depto
         if request.user.is_administrador():
             user_to_edit.role = role
-            if department_id:
-                try:
-                    user_to_edit.department = Department.objects.get(id=department_id)
-                except (Department.DoesNotExist, ValueError):
-                    user_to_edit.department = None
-            else:
-                user_to_edit.department = None
+            user_to_edit.department = request.departments.by_id(department_id)
         
         user_to_edit.ativo = request.POST.get('is_active') == 'on'
         user_to_edit.first_name = request.POST.get('first_name', '')
@@ -1405,6 +1387,7 @@ def export_complaints_csv(request):
     response = HttpResponse(content_type='text/csv; charset=utf-8')
     response['Content-Disposition'] = f'attachment; filename="reclamacoes_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv"'
     
+    import csv
     writer = csv.writer(response)
     writer.writerow([
         'ID RA', 'CPF', 'Nome', 'Sobrenome', 'E-mail', 'Telefone',
@@ -1480,6 +1463,9 @@ def export_complaints_xlsx(request):
     
     complaints = complaints.order_by('-created_at')
     
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment
+
     wb = Workbook()
     ws = wb.active
     ws.title = "Reclamações"
@@ -1557,6 +1543,7 @@ def export_stores_csv(request):
     response = HttpResponse(content_type='text/csv; charset=utf-8')
     response['Content-Disposition'] = f'attachment; filename="lojas_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv"'
     
+    import csv
     writer = csv.writer(response)
     writer.writerow(['Código da Loja', 'Total', 'Pendentes', 'Em Andamento', 'Aguardando Avaliação', 'Resolvidas'])
     
@@ -1595,6 +1582,9 @@ def export_stores_xlsx(request):
         aguardando=Count('id', filter=Q(status='aguardando_avaliacao'))
     ).order_by('-count')
     
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment
+
     wb = Workbook()
     ws = wb.active
     ws.title = "Lojas"
@@ -1648,6 +1638,7 @@ def export_users_csv(request):
     response = HttpResponse(content_type='text/csv; charset=utf-8')
     response['Content-Disposition'] = f'attachment; filename="usuarios_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv"'
     
+    import csv
     writer = csv.writer(response)
     writer.writerow(['Username', 'E-mail', 'Nome', 'Sobrenome', 'Perfil', 'Ativo', 'Último Login', 'Data de Criação'])
     
@@ -1679,6 +1670,9 @@ def export_users_xlsx(request):
     else:
         users = User.objects.filter(department=request.user.department).order_by('username')
     
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment
+
     wb = Workbook()
     ws = wb.active
     ws.title = "Usuários"
@@ -1724,15 +1718,14 @@ def import_complaints_xlsx(request):
         messages.error(request, 'Você não tem permissão para importar dados.')
         return redirect('dashboard')
     
-    from .models import Department
     # Se for gestor, usa o depto dele. Se for admin, tenta pegar do POST ou padrão CS Clientes
     target_dept = request.user.department
     if request.user.is_administrador():
         dept_id = request.POST.get('department')
         if dept_id:
-            target_dept = Department.objects.filter(id=dept_id).first()
+            target_dept = request.departments.by_id(dept_id)
         if not target_dept:
-            target_dept = Department.objects.filter(slug='cs-clientes').first()
+            target_dept = request.departments.by_slug('cs-clientes')
 
     if request.method == 'POST':
         if 'xlsx_file' not in request.FILES:
@@ -1932,11 +1925,10 @@ def import_complaints_batch(request):
         rows = data.get('rows', [])
         
         # Determinar departamento (mesma lógica do import normal)
-        from .models import Department
         target_dept = request.user.department
         if request.user.is_administrador():
             # Tentar pegar dept do body se enviado, ou usar padrão
-             target_dept = Department.objects.filter(slug='cs-clientes').first()
+             target_dept = request.departments.by_slug('cs-clientes')
 
         results = {
             'created': 0,
@@ -2043,7 +2035,7 @@ def escala_view(request):
             messages.error(request, 'Você não tem permissão para acessar as ferramentas de NRS Suporte.')
             return redirect('dashboard')
             
-    from .models import Turno, AnalistaEscala, FolgaManual
+    from .models import Turno, AnalistaEscala
     
     turnos = Turno.objects.filter(ativo=True).order_by('ordem', 'nome')
     
@@ -2074,20 +2066,7 @@ def escala_view(request):
         'ordem': a.ordem
     } for a in analistas]
     
-    # Folgas manuais como dicionário
-    folgas_qs = FolgaManual.objects.select_related('analista')
-    if not user.is_administrador() and user.department and user.department.name == 'RH':
-        folgas_qs = folgas_qs.filter(analista__user__department__name='NRS Suporte')
-        
-    folgas = folgas_qs.all()
-    folgas_data = {}
-    for f in folgas:
-        key = f"{f.analista.id}-{f.data.year}-{f.data.month}-{f.data.day}"
-        folgas_data[key] = {
-            'id': f.id,
-            'tipo': f.tipo,
-            'motivo': f.motivo
-        }
+    # Folgas manuais e a matriz 6x2 são carregadas por mês via /api/escala/schedule/
     
     import json
     # RH SEMPRE é modo leitura, mesmo que o usuário tenha role de gestor no RH
@@ -2100,7 +2079,6 @@ def escala_view(request):
     context = {
         'turnos_json': json.dumps(turnos_data),
         'analistas_json': json.dumps(analistas_data),
-        'folgas_json': json.dumps(folgas_data),
         'is_admin': is_admin,
         'is_admin_json': 'true' if is_admin else 'false',
         'can_export': can_export
@@ -2141,19 +2119,15 @@ def knowledge_base_view(request):
 @login_required
 def performance_view(request):
     """Página de Desempenho do Time"""
-    from .models import Department, IndicadorDesempenho
+    from .models import IndicadorDesempenho
+    from functools import reduce
+    from operator import or_
     import json
     
     user = request.user
     
     # Obter departamento (prioridade: 'NRS Suporte', senão o do usuário, senão o primeiro disponível)
-    nrs_dept = Department.objects.filter(name='NRS Suporte').first()
-    if not nrs_dept:
-        nrs_dept = Department.objects.filter(slug='nrs-suporte').first()
-    if not nrs_dept and user.department:
-        nrs_dept = user.department
-    if not nrs_dept:
-        nrs_dept = Department.objects.first()
+    nrs_dept = request.departments.nrs or user.department or request.departments.first()
     
     # Determinar se é analista ou gestor/admin
     is_analista = user.role == 'analista'
@@ -2168,11 +2142,10 @@ def performance_view(request):
     # Lista de analistas (para dropdown do gestor)
     if can_edit and nrs_dept:
         # Pega analistas que pertencem ao departamento OU que possuem KPIs registrados nele
-        analistas_query = User.objects.filter(
-            Q(department=nrs_dept) | 
-            Q(indicadores_desempenho__department=nrs_dept)
-        ).distinct().order_by('first_name', 'username')
-        analistas = analistas_query
+        # (os mesmos que api_kpi_save aceita)
+        analistas = list(kpi_usuarios(nrs_dept).order_by('first_name', 'username').only(
+            'id', 'username', 'first_name', 'last_name',
+        ))
     else:
         analistas = []
     
@@ -2181,7 +2154,7 @@ def performance_view(request):
     if is_analista:
         selected_analista_id = user.id
     elif not selected_analista_id and analistas:
-        selected_analista_id = analistas.first().id if analistas.exists() else None
+        selected_analista_id = analistas[0].id
     
     # Evitar cast para int se for UUID ou outro tipo não-inteiro
     if selected_analista_id:
@@ -2205,22 +2178,22 @@ def performance_view(request):
         kpis_query = IndicadorDesempenho.objects.filter(
             analista_id=selected_analista_id,
             department=nrs_dept
-        ).order_by('ano', 'mes')
+        ).order_by('-ano', '-mes')
         
-        # Se houver limite de período, pegar os últimos N meses
+        # Se houver limite de período, pegar os últimos N meses (LIMIT no banco)
         if period_int:
-            # Pegamos todos e depois fatiamos os últimos period_int para garantir que pegamos os mais recentes cronologicamente
-            kpis = list(kpis_query)
-            if len(kpis) > period_int:
-                kpis = kpis[-period_int:]
-        else:
-            kpis = list(kpis_query)
-        
-        # Obter metas globais para o departamento
-        metas_globais = {
-            f"{m.mes:02d}/{m.ano}": m 
-            for m in MetaMensalGlobal.objects.filter(department=nrs_dept)
-        }
+            kpis_query = kpis_query[:period_int]
+        kpis = list(kpis_query)[::-1]
+        
+        # Obter metas globais apenas dos meses exibidos
+        metas_globais = {}
+        if kpis:
+            metas_globais = {
+                f"{m.mes:02d}/{m.ano}": m
+                for m in MetaMensalGlobal.objects.filter(department=nrs_dept).filter(
+                    reduce(or_, (Q(mes=k.mes, ano=k.ano) for k in kpis))
+                )
+            }
         
         for kpi in kpis:
             label = f"{kpi.mes:02d}/{kpi.ano}"
@@ -2246,10 +2219,9 @@ def performance_view(request):
     
     selected_analista = None
     if selected_analista_id:
-        try:
-            selected_analista = User.objects.get(id=selected_analista_id)
-        except User.DoesNotExist:
-            pass
+        selected_analista = next((a for a in analistas if a.id == selected_analista_id), None)
+        if selected_analista is None:
+            selected_analista = User.objects.filter(id=selected_analista_id).first()
 
 
     # Lista de analistas formatada com flag de seleção
@@ -2283,7 +2255,7 @@ def performance_view(request):
 @login_required
 def quadro_view(request):
     """Visualização do Quadro Kanban"""
-    from .models import KanbanBoard, KanbanList, CardLabel, Department
+    from .models import KanbanBoard, KanbanList, KanbanCard, CardLabel
     import json
     
     # Get or create board for user
@@ -2321,14 +2293,18 @@ def quadro_view(request):
         for name, color in default_labels:
             CardLabel.objects.create(board=board, name=name, color=color)
     
-    # Get lists and prefetch cards with labels
-    listas = board.lists.filter(is_archived=False).prefetch_related('cards__labels').order_by('position')
+    # Get lists and prefetch cards with labels and checklist progress
+    from django.db.models import Prefetch
+    from .api_kanban import with_card_counts
+    listas = board.lists.filter(is_archived=False).prefetch_related(
+        Prefetch('cards', queryset=with_card_counts(KanbanCard.objects.all()))
+    ).order_by('position')
     labels = board.labels.all()
     
     labels_data = [{'id': l.id, 'name': l.name, 'color': l.color} for l in labels]
     
     # Get NRS Suporte department users for members assignment
-    nrs_dept = Department.objects.filter(name='NRS Suporte').first()
+    nrs_dept = request.departments.by_name('NRS Suporte')
     members = []
     if nrs_dept:
         nrs_users = User.objects.filter(department=nrs_dept, ativo=True).order_by('first_name', 'username')
@@ -2587,7 +2563,8 @@ def verificacao_lojas(request):
     weekly_total_items_count = weekly_total_items.count()
     compliance_rate = 100
     if weekly_total_items_count > 0:
-        compliant_items_count = weekly_total_items.filter(is_compliant=True).count()
+        # Mesmo filtro dos irregulares: o resto é conforme (sem outra contagem)
+        compliant_items_count = weekly_total_items_count - weekly_irregularities_count
         compliance_rate = (compliant_items_count / weekly_total_items_count) * 100
 
     context = {
@@ -2649,6 +2626,96 @@ def api_store_detail(request, store_id):
         return JsonResponse({'success': False, 'error': f'Erro interno: {str(e)}'}, status=500)
 
 
+STORE_AUDIT_ITEM_SLUGS = ['cameras', 'estofados', 'cestos_medidas', 'layout', 'tv', 'totem', 'limpeza', 'marketing']
+
+
+def _save_store_audit_photos(request):
+    """
+    Grava as fotos enviadas no storage e retorna {slug: nome do arquivo}.
+    Fica fora da transação de _save_store_audit: refeita em um conflito, ela
+    enviaria as fotos de novo e deixaria as da tentativa anterior órfãs.
+    """
+    field = StoreAuditItem._meta.get_field('photo')
+    photos = {}
+    for slug in STORE_AUDIT_ITEM_SLUGS:
+        photo = request.FILES.get(f'photo_{slug}')
+        if photo:
+            photos[slug] = field.storage.save(field.generate_filename(None, photo.name), photo)
+    return photos
+
+
+def _delete_store_audit_photos(photos):
+    field = StoreAuditItem._meta.get_field('photo')
+    for name in photos.values():
+        field.storage.delete(name)
+
+
+@retry_transaction
+def _save_store_audit(request, store, photos):
+    """
+    Grava a auditoria, seus itens, a pendência e o resultado na loja em uma
+    transação. Duas auditorias simultâneas da mesma loja irregular disputam a
+    mesma pendência aberta: a que perde o conflito é refeita e encontra a
+    pendência criada pela outra, em vez de abrir uma duplicada. As fotos já
+    estão no storage (photos, de _save_store_audit_photos): os itens só
+    recebem o nome do arquivo.
+    """
+    audit = StoreAudit.objects.create(analyst=request.user, store=store)
+    
+    has_irregularity = False
+    issue = None
+    items = []
+    
+    for slug in STORE_AUDIT_ITEM_SLUGS:
+        status = request.POST.get(f'status_{slug}')
+        is_compliant = (status == 'conformidade')
+        photo = photos.get(slug)
+        description = request.POST.get(f'desc_{slug}', '')
+        
+        # Campos específicos de Câmeras
+        cameras_recording = None
+        cameras_recording_mode = None
+        
+        if slug == 'cameras' and not is_compliant:
+            # Capturar dados apenas se for câmera e estiver irregular
+            rec_val = request.POST.get('cameras_recording')
+            if rec_val == 'yes':
+                cameras_recording = True
+                cameras_recording_mode = request.POST.get('cameras_mode')
+            elif rec_val == 'no':
+                cameras_recording = False
+        
+        if not is_compliant:
+            has_irregularity = True
+            if issue is None:
+                # Busca se já existe uma pendência aberta para esta loja; se não existe, cria uma nova
+                issue = StoreAuditIssue.objects.filter(store=store, status='aberta').first()
+                if not issue:
+                    issue = StoreAuditIssue.objects.create(store=store)
+        
+        items.append(StoreAuditItem(
+            audit=audit,
+            item_name=slug,
+            is_compliant=is_compliant,
+            photo=photo,
+            description=description,
+            cameras_recording=cameras_recording,
+            cameras_recording_mode=cameras_recording_mode,
+            # Vincula o item irregular à pendência (existente ou nova)
+            issue=None if is_compliant else issue,
+        ))
+    
+    StoreAuditItem.objects.bulk_create(items)
+    
+    # Atualizar campos de reverificação da loja
+    store.last_audit_date = timezone.now()
+    store.last_audit_result = 'irregular' if has_irregularity else 'conforme'
+    store.needs_reverification = False  # Resetar flag de reverificação
+    store.save()
+
+    return has_irregularity
+
+
 @login_required
 def store_audit_create(request, store_id):
     """Cria uma nova auditoria para a loja"""
@@ -2668,60 +2735,13 @@ def store_audit_create(request, store_id):
                 )
                 return redirect('verificacao_lojas')
         
-        audit = StoreAudit.objects.create(analyst=request.user, store=store)
-        
-        items_slugs = ['cameras', 'estofados', 'cestos_medidas', 'layout', 'tv', 'totem', 'limpeza', 'marketing']
-        has_irregularity = False
-        
-        for slug in items_slugs:
-            status = request.POST.get(f'status_{slug}')
-            is_compliant = (status == 'conformidade')
-            photo = request.FILES.get(f'photo_{slug}')
-            description = request.POST.get(f'desc_{slug}', '')
-            
-            # Campos específicos de Câmeras
-            cameras_recording = None
-            cameras_recording_mode = None
-            
-            if slug == 'cameras' and not is_compliant:
-                # Capturar dados apenas se for câmera e estiver irregular
-                rec_val = request.POST.get('cameras_recording')
-                if rec_val == 'yes':
-                    cameras_recording = True
-                    cameras_recording_mode = request.POST.get('cameras_mode')
-                elif rec_val == 'no':
-                    cameras_recording = False
-            
-            audit_item = StoreAuditItem.objects.create(
-                audit=audit,
-                item_name=slug,
-                is_compliant=is_compliant,
-                photo=photo,
-                description=description,
-                cameras_recording=cameras_recording,
-                cameras_recording_mode=cameras_recording_mode
-            )
-            
-            if not is_compliant:
-                has_irregularity = True
-                # Busca se já existe uma pendência aberta para esta loja
-                issue = StoreAuditIssue.objects.filter(store=store, status='aberta').first()
-                
-                if not issue:
-                    # Se não existe, cria uma nova
-                    issue = StoreAuditIssue.objects.create(store=store)
-                
-                # Vincula o item irregular à pendência (existente ou nova)
-                audit_item.issue = issue
-                audit_item.save()
-        
-        # Atualizar campos de reverificação da loja
-        from django.utils import timezone
-        store.last_audit_date = timezone.now()
-        store.last_audit_result = 'irregular' if has_irregularity else 'conforme'
-        store.needs_reverification = False  # Resetar flag de reverificação
-        store.save()
-        
+        photos = _save_store_audit_photos(request)
+        try:
+            has_irregularity = _save_store_audit(request, store, photos)
+        except Exception:
+            _delete_store_audit_photos(photos)
+            raise
+
         # NOVO: Incrementar contador de auditorias diárias
         if request.user.role == 'analista':
             from .models import DailyAuditQuota
@@ -2756,14 +2776,15 @@ def store_audit_create(request, store_id):
         ('marketing', 'Marketing'),
     ]
 
-    # Histórico de auditorias da loja
-    history = StoreAudit.objects.filter(store=store).order_by('-created_at')[:10]
+    # Histórico de auditorias da loja (itens e analista carregados junto, sem query por auditoria)
+    history = list(StoreAudit.objects.filter(store=store).select_related('analyst').prefetch_related('items')
+                   .order_by('-created_at')[:10])
     
     # Dados da última auditoria para exibir no formulário
-    last_audit = history.first() if history else None
+    last_audit = history[0] if history else None
     last_audit_items = []
     if last_audit:
-        last_audit_items = last_audit.items.filter(is_compliant=False)  # Apenas itens irregulares
+        last_audit_items = [item for item in last_audit.items.all() if not item.is_compliant]  # Apenas itens irregulares
     
     context = {
         'store': store,
@@ -3081,7 +3102,7 @@ def rh_colaboradores_view(request):
 def rh_colaborador_perfil_view(request, pk):
     """Página de perfil detalhado do colaborador (Dossiê)"""
     colaborador = get_object_or_404(Colaborador, pk=pk)
-    departments_all = Department.objects.all().order_by('name')
+    departments_all = request.departments.all
     return render(request, 'core/rh/colaborador_perfil.html', {
         'colaborador': colaborador,
         'departments_all': departments_all,
@@ -3,9 +3,7 @@ Django settings for gestao_reclame_aqui project.
 """
 
 import os
-import sys
 from pathlib import Path
-import dj_database_url
 
 # ==============================
 # BASE DIR
@@ -57,7 +55,6 @@ INSTALLED_APPS = [
     "crispy_forms",
     "crispy_bootstrap5",
     "django_filters",
-    "import_export",
     "django.contrib.humanize",
 
     # apps locais
@@ -70,11 +67,13 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "core.request_metrics.RequestMetricsMiddleware",
     "django.middleware.gzip.GZipMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.departments.DepartmentMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -118,23 +117,43 @@ WSGI_APPLICATION = "gestao_reclame_aqui.wsgi.application"
 # ==============================
 # DATABASE (POSTGRESQL - Render & Supabase Config)
 # ==============================
+# O backend core.db_backend é o django_cockroachdb com a abertura de conexões
+# medida e tentada de novo em falhas transitórias (core/db_connections.py).
+DB_CONNECT_TIMEOUT = int(get_env("DB_CONNECT_TIMEOUT", "5"))
+DB_CONNECT_RETRIES = int(get_env("DB_CONNECT_RETRIES", "2"))
+# Limite de cada statement, bem abaixo do timeout de 120s do gunicorn (0 desliga)
+DB_STATEMENT_TIMEOUT_MS = int(get_env("DB_STATEMENT_TIMEOUT_MS", "30000"))
+
+_db_options = {
+    "sslmode": "require",
+    "connect_timeout": DB_CONNECT_TIMEOUT,
+    # Detecta conexões mortas (WAN) sem esperar o timeout do TCP
+    "keepalives": 1,
+    "keepalives_idle": 30,
+    "keepalives_interval": 10,
+    "keepalives_count": 3,
+}
+if DB_STATEMENT_TIMEOUT_MS:
+    # Variável de sessão enviada na abertura da conexão (sem round trip extra)
+    _db_options["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+
 DATABASES = {
     "default": {
-        "ENGINE": "django_cockroachdb",
+        "ENGINE": "core.db_backend",
         "NAME": get_env("DB_NAME", "defaultdb"),
         "USER": get_env("DB_USER", "jeferson"),
         "PASSWORD": get_env("DB_PASSWORD", ""),
         "HOST": get_env("DB_HOST", "ageing-phantom-12866.jxf.gcp-southamerica-east1.cockroachlabs.cloud"),
         "PORT": get_env("DB_PORT", "26257"),
-        "CONN_MAX_AGE": 300,  # 5 minutos — reduz overhead de conexão com CockroachDB
-        "OPTIONS": {
-            "sslmode": "require",
-        },
+        "CONN_MAX_AGE": int(get_env("DB_CONN_MAX_AGE", "300")),  # reduz overhead de conexão com CockroachDB
+        # Verifica a conexão persistente antes do primeiro uso em cada request
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": _db_options,
     }
 }
 
-
-print("✓ Banco PostgreSQL configurado", file=sys.stderr)
+# Query de telemetria do django_cockroachdb: um round trip a mais na primeira conexão
+DISABLE_COCKROACHDB_TELEMETRY = True
 
 # ==============================
 # AUTH / PASSWORDS
@@ -245,10 +264,23 @@ CSRF_COOKIE_HTTPONLY = False  # MUST be False to allow JavaScript to read CSRF t
 # ==============================
 # SESSION
 # ==============================
+# Sessão assinada no próprio cookie: nenhum acesso ao banco (django_session) por
+# request. O cache padrão é por processo (LocMemCache), então cached_db deixaria
+# cada worker do gunicorn com a sua cópia da sessão (ex.: logout em um worker e
+# sessão ainda válida no outro). Com um cache compartilhado (Redis), usar
+# SESSION_ENGINE=django.contrib.sessions.backends.cached_db.
+SESSION_ENGINE = get_env("SESSION_ENGINE", "django.contrib.sessions.backends.signed_cookies")
 SESSION_COOKIE_AGE = 86400  # 24h
 SESSION_SAVE_EVERY_REQUEST = False
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 
+# ==============================
+# MONITORAMENTO DE QUERIES (core/query_inspector.py)
+# ==============================
+SLOW_QUERY_MS = int(get_env("SLOW_QUERY_MS", "300"))
+N_PLUS_ONE_THRESHOLD = int(get_env("N_PLUS_ONE_THRESHOLD", "5"))
+REQUEST_QUERY_BUDGET = int(get_env("REQUEST_QUERY_BUDGET", "50"))
+
 # ==============================
 # UPLOAD LIMITS
 # ==============================
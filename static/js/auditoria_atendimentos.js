@@ -17,7 +17,9 @@ document.addEventListener('DOMContentLoaded', function () {
     const state = {
         analistas: [],
         currentPage: 1,
-        totalPages: 1,
+        // Cursor de início de cada página já visitada (paginação por keyset)
+        cursors: [null],
+        hasNext: false,
         filters: {},
         config: null,
         editingId: null
@@ -509,20 +511,27 @@ document.addEventListener('DOMContentLoaded', function () {
         const tbody = document.getElementById('lista-auditorias');
         tbody.innerHTML = '<tr><td colspan="8" class="text-center py-4"><div class="spinner-border text-primary"></div></td></tr>';
 
+        // Só é possível ir para páginas cujo cursor já é conhecido
+        if (page < 1 || page > state.cursors.length) page = 1;
+        if (page === 1) state.cursors = [null];
+
         const params = new URLSearchParams({
-            page: page,
-            per_page: 20,
+            limit: 20,
             ...state.filters
         });
+        const cursor = state.cursors[page - 1];
+        if (cursor) params.append('cursor', cursor);
 
         fetch(`/api/auditoria/list/?${params}`)
             .then(response => response.json())
             .then(data => {
                 if (data.success) {
+                    state.currentPage = page;
+                    state.cursors = state.cursors.slice(0, page);
+                    if (data.next_cursor) state.cursors.push(data.next_cursor);
+                    state.hasNext = !!data.next_cursor;
                     renderAuditorias(data.auditorias);
-                    renderPagination(data.page, data.total_pages);
-                    state.currentPage = data.page;
-                    state.totalPages = data.total_pages;
+                    renderPagination(page, state.hasNext, data.total, data.total_exact);
                 }
             })
             .catch(error => {
@@ -604,37 +613,29 @@ document.addEventListener('DOMContentLoaded', function () {
         });
     }
 
-    function renderPagination(currentPage, totalPages) {
+    function renderPagination(currentPage, hasNext, total, totalExact) {
         const container = document.getElementById('paginacao');
-        if (totalPages <= 1) {
+        if (currentPage === 1 && !hasNext) {
             container.innerHTML = '';
             return;
         }
 
-        let html = '<nav><ul class="pagination pagination-sm mb-0">';
+        const totalLabel = totalExact ? total : `${total}+`;
+        let html = '<nav class="d-flex align-items-center gap-2"><ul class="pagination pagination-sm mb-0">';
 
         // Botão anterior
         html += `<li class="page-item ${currentPage === 1 ? 'disabled' : ''}">
             <a class="page-link" href="#" onclick="loadAuditorias(${currentPage - 1}); return false;">Anterior</a>
         </li>`;
 
-        // Páginas
-        for (let i = 1; i <= totalPages; i++) {
-            if (i === 1 || i === totalPages || (i >= currentPage - 2 && i <= currentPage + 2)) {
-                html += `<li class="page-item ${i === currentPage ? 'active' : ''}">
-                    <a class="page-link" href="#" onclick="loadAuditorias(${i}); return false;">${i}</a>
-                </li>`;
-            } else if (i === currentPage - 3 || i === currentPage + 3) {
-                html += '<li class="page-item disabled"><span class="page-link">...</span></li>';
-            }
-        }
+        html += `<li class="page-item active"><span class="page-link">${currentPage}</span></li>`;
 
         // Botão próximo
-        html += `<li class="page-item ${currentPage === totalPages ? 'disabled' : ''}">
+        html += `<li class="page-item ${hasNext ? '' : 'disabled'}">
             <a class="page-link" href="#" onclick="loadAuditorias(${currentPage + 1}); return false;">Próximo</a>
         </li>`;
 
-        html += '</ul></nav>';
+        html += `</ul><small class="text-muted">${totalLabel} auditorias</small></nav>`;
 
         container.innerHTML = html;
     }
@@ -1257,7 +1258,7 @@ document.addEventListener('DOMContentLoaded', function () {
         // Buscar auditorias do analista
         const params = new URLSearchParams({
             analista_id: analistaId,
-            per_page: 100
+            limit: 100
         });
 
         fetch(`/api/auditoria/list/?${params}`, { credentials: 'include' })
@@ -1486,7 +1487,7 @@ document.addEventListener('DOMContentLoaded', function () {
         // Usar API de lista com filtro
         const params = new URLSearchParams({
             classificacao: classificacao,
-            per_page: 50
+            limit: 50
         });
 
         // Adicionar filtros de data se existirem